@@ -1 +1,37 @@
-from accumulate.methods import Accumulate
+import importlib
+
+# exported name: module defining it. Modules are imported on first access, so
+# `import accumulate` stays cheap and requests is only loaded with HttpTransport.
+EXPORTS = {
+    "Accumulate": "accumulate.methods",
+    "AsyncAccumulate": "accumulate.aio",
+    "ResponseCache": "accumulate.cache",
+    "ResultStore": "accumulate.store",
+    "Hook": "accumulate.hooks",
+    "MetricsCollector": "accumulate.hooks",
+    "EndpointPool": "accumulate.endpoints",
+    "RetryPolicy": "accumulate.retry",
+    "Coalescer": "accumulate.coalesce",
+    "TxTracker": "accumulate.tracker",
+    "Submitter": "accumulate.submitter",
+    "Limiter": "accumulate.limiter",
+    "HistoryMirror": "accumulate.mirror",
+    "DataSetExporter": "accumulate.dataset",
+    "Crawler": "accumulate.crawler",
+    "MetricsSampler": "accumulate.sampler",
+}
+
+__all__ = list(EXPORTS)
+
+
+def __getattr__(name):
+    module = EXPORTS.get(name)
+    if module is None:
+        raise AttributeError("module 'accumulate' has no attribute %r" % name)
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(EXPORTS))
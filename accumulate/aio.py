@@ -0,0 +1,387 @@
+import asyncio
+import time
+
+from .batch import Batch
+from .cache import MISSING
+from .columnar import RawPage
+from .fanout import afan_out, afan_out_as_completed, DEFAULT_MAX_WORKERS
+from .hooks import BATCH_METHOD
+from .limiter import OVERLOAD_STATUSES
+from .pagination import aiter_items
+from .transport import HttpTransport, Response
+from .methods import (
+    Accumulate,
+    URL_Methods,
+    Token,
+    KeyManagementMethods,
+    ExecuteMethods,
+    RAW_BYTES,
+)
+
+DEFAULT_MAX_CONCURRENCY = 100
+
+
+class AsyncHttpTransport:
+    def __init__(
+        self,
+        pool_size: int = DEFAULT_MAX_CONCURRENCY,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        keep_alive: bool = True,
+        timeout=None,
+    ) -> None:
+        """
+        aiohttp based transport with one shared connection pool and a limit
+        on the number of requests in flight. The aiohttp session is created
+        on first use, inside the running event loop.
+
+        Args:
+            pool_size: maximum number of pooled connections
+            max_concurrency: maximum number of requests in flight at once
+            keep_alive: set to False to close the connection after every call
+            timeout: total timeout of a call in seconds
+        """
+        self.pool_size = pool_size
+        self.max_concurrency = max_concurrency
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.session = None
+        self.semaphore = None
+
+    def get_session(self):
+        if self.session is None:
+            try:
+                import aiohttp
+            except ImportError as e:
+                raise ImportError(
+                    "AsyncAccumulate requires aiohttp: pip install py_accumulate[async]"
+                ) from e
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size, force_close=not self.keep_alive
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self.session
+
+    async def post(self, url: str, headers=None, data=None):
+        session = self.get_session()
+        async with self.semaphore:
+            async with session.post(url, headers=headers, data=data) as res:
+                return Response(res.status, await res.read())
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+class AsyncBaseClass:
+    async def request(self, id, method: str, params: dict = None, model=None):
+        if self.hooks:
+            return await self.traced_request(id, method, params, model)
+        result = self.get_cached(method, params)
+        if result is MISSING:
+            result = await self.coalesced_fetch(id, method, params)
+        return self.build_model(result, model)
+
+    async def traced_request(self, id, method: str, params: dict = None, model=None):
+        call = self.start_call(method, id, params)
+        try:
+            result = self.get_cached(method, params)
+            if result is not MISSING:
+                call.cached = True
+            else:
+                result = await self.coalesced_fetch(id, method, params, call)
+                # only the call that went to the node has its stages timed
+                call.coalesced = call.encode_time is None
+            call.lap()
+            value = self.build_model(result, model)
+            call.model_time = call.lap()
+            return value
+        except Exception as e:
+            call.failed(e)
+            raise
+        finally:
+            self.end_call(call)
+
+    async def coalesced_fetch(self, id, method: str, params: dict = None, call=None):
+        coalescer = self.coalescer
+        if coalescer is None or not coalescer.applies(method):
+            return await self.fetch(id, method, params, call)
+        return await coalescer.acall(
+            self.fetch, id, method, params, call, raw=self.raw == RAW_BYTES
+        )
+
+    async def fetch(self, id, method: str, params: dict = None, call=None):
+        """
+        Encodes, sends and decodes one call, timing each stage into the
+        CallInfo of a traced call
+        """
+        data = self.encode_request(id, method, params)
+        if call is not None:
+            call.encode_time = call.lap()
+            call.request_bytes = len(data)
+        res = await self.post(method, data, self.get_headers())
+        if call is not None:
+            call.network_time = call.lap()
+            call.response_bytes = len(res.content)
+        result = self.decode_result(method, params, res)
+        if call is not None:
+            call.decode_time = call.lap()
+        return result
+
+    async def post(self, method: str, data: bytes, headers: dict):
+        retry = self.retry
+        if retry is None or not retry.applies(method):
+            return await self.post_once(method, data, headers)
+        return await retry.acall(self.post_once, method, data, headers)
+
+    async def post_once(self, method: str, data: bytes, headers: dict):
+        endpoints = self.endpoints
+        limiter = self.limiter
+        if endpoints is None and limiter is None:
+            return await self.transport.post(
+                url=self.endpoint, headers=headers, data=data
+            )
+        endpoint = endpoints.acquire(method) if endpoints is not None else None
+        url = endpoint.url if endpoint is not None else self.endpoint
+        limit = None
+        latency = None
+        status = None
+        cancelled = False
+        try:
+            if limiter is not None:
+                limit = await limiter.aacquire(url, method)
+            start = time.perf_counter()
+            res = await self.transport.post(url=url, headers=headers, data=data)
+            status = res.status_code
+            if status < 500:
+                latency = time.perf_counter() - start
+            return res
+        except asyncio.CancelledError:
+            # e.g. the losing copy of a hedged call, not a node failure
+            cancelled = True
+            raise
+        finally:
+            if limit is not None:
+                overloaded = status in OVERLOAD_STATUSES
+                limit.release(None if overloaded else latency, cancelled)
+            if endpoint is not None:
+                endpoints.release(endpoint, latency, cancelled)
+
+
+def sync_only(name: str):
+    """
+    Returns a method raising TypeError, for Accumulate helpers that drive a
+    sync client from threads and cannot await an AsyncAccumulate
+    """
+
+    def method(self, *args, **kwargs):
+        raise TypeError(
+            "%s needs a sync client: use Accumulate(endpoint).%s()" % (name, name)
+        )
+
+    method.__name__ = name
+    method.__doc__ = "Not available on AsyncAccumulate; raises TypeError"
+    return method
+
+
+class AsyncURL_Methods(AsyncBaseClass, URL_Methods):
+    pass
+
+
+class AsyncToken(AsyncBaseClass, Token):
+    pass
+
+
+class AsyncKeyManagementMethods(AsyncBaseClass, KeyManagementMethods):
+    pass
+
+
+class AsyncExecuteMethods(AsyncBaseClass, ExecuteMethods):
+    pass
+
+
+class AsyncBatch(Batch):
+    post = AsyncBaseClass.post
+    post_once = AsyncBaseClass.post_once
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            await self.send()
+
+    async def send(self):
+        items = self.items
+        self.items = list()
+        if not items:
+            return list()
+        call = self.start_call(BATCH_METHOD, None)
+        try:
+            data = self.encode_batch(items)
+            call.encode_time = call.lap()
+            call.request_bytes = len(data)
+            res = await self.post(BATCH_METHOD, data, self.get_headers())
+            call.network_time = call.lap()
+            call.response_bytes = len(res.content)
+            values = self.handle_batch_response(items, res)
+            call.decode_time = call.lap()
+            return values
+        except Exception as e:
+            call.failed(e)
+            raise
+        finally:
+            self.end_call(call)
+
+
+class AsyncAccumulate(AsyncBaseClass, Accumulate):
+    def __init__(
+        self,
+        endpoint,
+        transport=None,
+        pool_size: int = DEFAULT_MAX_CONCURRENCY,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        keep_alive: bool = True,
+        timeout=None,
+        cache=None,
+        store=None,
+        codec=None,
+        raw=False,
+        hooks=None,
+        retry=None,
+        coalescer=None,
+        limiter=None,
+    ) -> None:
+        """
+        asyncio version of Accumulate with the same methods, each of which
+        must be awaited. All calls share one connection pool and at most
+        `max_concurrency` of them are in flight at once.
+
+        Usage:
+            async with AsyncAccumulate(endpoint) as accumulate:
+                res = await accumulate.Query(url)
+
+        Args:
+            endpoint: the node endpoint URL, a list of URLs or an EndpointPool
+            transport: optional transport to use instead of a new AsyncHttpTransport
+            pool_size: maximum number of pooled connections to the node
+            max_concurrency: maximum number of requests in flight at once
+            keep_alive: set to False to close the connection after every call
+            timeout: total timeout of a call in seconds
+            cache: optional ResponseCache for read results
+            store: optional ResultStore for final transactions and data entries
+            codec: JSON codec or codec name ("orjson", "ujson", "json"); defaults
+                to the fastest one installed
+            raw: True or "result" to return the decoded result dicts instead of
+                models, "bytes" to return the undecoded response bytes
+            hooks: optional list of Hook objects called around every call
+            retry: optional RetryPolicy retrying, and optionally hedging, reads
+            coalescer: optional Coalescer sharing one call between identical
+                concurrent reads
+            limiter: optional Limiter, which may also be used by sync clients
+        """
+        if transport is None:
+            transport = AsyncHttpTransport(
+                pool_size=pool_size,
+                max_concurrency=max_concurrency,
+                keep_alive=keep_alive,
+                timeout=timeout,
+            )
+        super().__init__(
+            endpoint,
+            transport=transport,
+            cache=cache,
+            store=store,
+            codec=codec,
+            raw=raw,
+            hooks=hooks,
+            retry=retry,
+            coalescer=coalescer,
+            limiter=limiter,
+        )
+        self.token_class = self.sub_client(AsyncToken)
+        self.url_method_class = self.sub_client(AsyncURL_Methods)
+        self.keyManagementMethods = self.sub_client(AsyncKeyManagementMethods)
+        self.executeMethods = self.sub_client(AsyncExecuteMethods)
+
+    def __enter__(self):
+        raise TypeError("use 'async with' with AsyncAccumulate")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def probe_transport(self, transport):
+        # the prober runs on a thread, so it cannot use the async transport
+        return HttpTransport()
+
+    async def close(self):
+        """
+        Closes the pooled connections to the node
+        """
+        if self.endpoints is not None:
+            self.endpoints.close()
+        if self.retry is not None:
+            self.retry.close()
+        await self.transport.close()
+
+    def paginate(self, fetch, page_size: int, start: int):
+        # iter_tx_history, iter_directory and iter_data_set become async iterators
+        if self.raw:
+            self.check_pageable()
+
+            async def fetch_raw(start, count):
+                return RawPage(await fetch(start, count))
+
+            return aiter_items(fetch_raw, page_size, start)
+        return aiter_items(fetch, page_size, start)
+
+    def batch(self):
+        """
+        Returns an AsyncBatch, used with `async with` or `await batch.send()`
+        """
+        return AsyncBatch(self)
+
+    def query_many(
+        self, urls, max_workers: int = DEFAULT_MAX_WORKERS, as_completed: bool = False
+    ):
+        """
+        asyncio version of Accumulate.query_many, with at most `max_workers`
+        calls in flight:
+            res = await accumulate.query_many(urls)
+            async for index, res in accumulate.query_many(urls, as_completed=True):
+                ...
+        """
+        args_list = [(url,) for url in urls]
+        if as_completed:
+            return afan_out_as_completed(self.Query, args_list, max_workers)
+        return afan_out(self.Query, args_list, max_workers)
+
+    def query_tx_many(
+        self,
+        txids,
+        wait=None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        as_completed: bool = False,
+    ):
+        """
+        asyncio version of Accumulate.query_tx_many; see query_many
+        """
+        args_list = [(txid, wait) for txid in txids]
+        if as_completed:
+            return afan_out_as_completed(self.QueryTx, args_list, max_workers)
+        return afan_out(self.QueryTx, args_list, max_workers)
+
+    # helpers built on a sync client
+    tx_tracker = sync_only("tx_tracker")
+    submitter = sync_only("submitter")
+    history_mirror = sync_only("history_mirror")
+    crawler = sync_only("crawler")
+    metrics_sampler = sync_only("metrics_sampler")
+    data_set_exporter = sync_only("data_set_exporter")
+    export_tx_history = sync_only("export_tx_history")
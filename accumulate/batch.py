@@ -0,0 +1,203 @@
+from .exception import ServerError
+from .constants import ACCUMULATE_METHODS
+from .methods import BaseClass, URL_Methods, KeyManagementMethods
+from .hooks import BATCH_METHOD
+from .models import QueryResponse
+
+# JSON-RPC 2.0 "Internal error", used when the node left a call out of the reply
+MISSING_RESPONSE_CODE = -32603
+
+
+class BatchItem:
+    def __init__(self, id, method: str, model=None) -> None:
+        """
+        Placeholder for one call of a Batch, filled in when the batch is sent.
+        """
+        self.id = id
+        self.method = method
+        self.model = model
+        self.done = False
+        self.value = None
+        self.error = None
+
+    def result(self):
+        """
+        Returns the model built from this call's result, or raises the
+        ServerError the node returned for this call.
+        """
+        if not self.done:
+            raise RuntimeError("batch has not been sent yet")
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class BatchRecorder:
+    def __init__(self, batch) -> None:
+        super().__init__(batch.endpoint, batch.transport, codec=batch.codec)
+        self.batch = batch
+
+    def request(self, id, method: str, params: dict = None, model=None):
+        return self.batch.request(id, method, params, model)
+
+
+class BatchURL_Methods(BatchRecorder, URL_Methods):
+    pass
+
+
+class BatchKeyManagementMethods(BatchRecorder, KeyManagementMethods):
+    pass
+
+
+class Batch(BaseClass):
+    def __init__(self, client) -> None:
+        """
+        Collects read calls and sends them as one JSON-RPC 2.0 batch array.
+        Every call returns a BatchItem at once; the items are resolved by id
+        when the batch is sent, either explicitly with send() or on leaving
+        the with block. On a raw client, items hold the decoded result dicts.
+        Hooks see the whole batch as one call with method "batch".
+
+        Args:
+            client: the Accumulate client whose endpoint, transport and ids are used
+        """
+        self.client = client
+        super().__init__(
+            client.endpoint,
+            client.transport,
+            codec=client.codec,
+            raw=client.raw,
+            hooks=client.hooks,
+            endpoints=client.endpoints,
+            retry=client.retry,
+            limiter=client.limiter,
+        )
+        self.items = list()
+        self.url_method_class = BatchURL_Methods(self)
+        self.keyManagementMethods = BatchKeyManagementMethods(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.send()
+
+    def __len__(self):
+        return len(self.items)
+
+    def request(self, id, method: str, params: dict = None, model=None):
+        payload = self.generate_payload(id=id, method=method, params=params)
+        item = BatchItem(id, method, model)
+        self.items.append((payload, item))
+        return item
+
+    def send(self):
+        """
+        Sends all collected calls in one POST and resolves their BatchItems.
+        A call that failed on the node gets its own ServerError; the other
+        calls of the batch are not affected.
+
+        Returns:
+            list of the BatchItems in the order the calls were made
+        """
+        items = self.items
+        self.items = list()
+        if not items:
+            return list()
+        call = self.start_call(BATCH_METHOD, None)
+        try:
+            data = self.encode_batch(items)
+            call.encode_time = call.lap()
+            call.request_bytes = len(data)
+            res = self.post(BATCH_METHOD, data, self.get_headers())
+            call.network_time = call.lap()
+            call.response_bytes = len(res.content)
+            values = self.handle_batch_response(items, res)
+            call.decode_time = call.lap()
+            return values
+        except Exception as e:
+            call.failed(e)
+            raise
+        finally:
+            self.end_call(call)
+
+    def encode_batch(self, items: list):
+        return self.codec.dumps([payload for payload, item in items])
+
+    def handle_batch_response(self, items: list, res):
+        res_text = self.load_response(res)
+        if isinstance(res_text, dict):
+            # the node rejected the batch as a whole
+            self.get_result(res_text)
+            if res.status_code >= 400:
+                raise self.http_error(res)
+            res_text = [res_text]
+        responses = {response.get("id"): response for response in res_text}
+        for payload, item in items:
+            self.resolve(item, responses.get(item.id))
+        return [item for payload, item in items]
+
+    def resolve(self, item: BatchItem, response: dict):
+        item.done = True
+        if response is None:
+            item.error = ServerError(
+                {
+                    "code": MISSING_RESPONSE_CODE,
+                    "message": "no response for call in batch",
+                    "id": item.id,
+                }
+            )
+            return
+        try:
+            result = self.get_result(response)
+            item.value = self.build_model(result, item.model)
+        except ServerError as e:
+            item.error = e
+
+    def Version(self):
+        return self.request(
+            self.client.__id__(), ACCUMULATE_METHODS.VERSION, model=QueryResponse
+        )
+
+    def Metrics(self, metric: str, duration):
+        params = {"metric": metric, "duration": duration}
+        return self.request(
+            self.client.__id__(), ACCUMULATE_METHODS.Metrics, params, QueryResponse
+        )
+
+    def Query(self, url: str):
+        return self.url_method_class.Query(self.client.__id__(), url)
+
+    def QueryTx(self, txid, wait=None):
+        return self.url_method_class.QueryTx(self.client.__id__(), txid, wait)
+
+    def QueryTxHistory(self, url: str, count, start=None):
+        return self.url_method_class.QueryTxHistory(
+            self.client.__id__(), url, count=count, start=start
+        )
+
+    def QueryChain(self, chainId):
+        return self.url_method_class.QueryChain(self.client.__id__(), chainId)
+
+    def QueryData(self, url, entryHash=None):
+        return self.url_method_class.QueryData(self.client.__id__(), url, entryHash)
+
+    def QueryDataSet(self, url: str, queryPagination, queryOptions):
+        return self.url_method_class.QueryDataSet(
+            self.client.__id__(), url, queryPagination, queryOptions
+        )
+
+    def QueryDirectory(self, url: str, count=None, start=None, expandChains=None):
+        return self.url_method_class.QueryDirectory(
+            self.client.__id__(),
+            url,
+            count=count,
+            start=start,
+            expandChains=expandChains,
+        )
+
+    def QueryKeyPageIndex(self, url, key=None):
+        return self.keyManagementMethods.QueryKeyPageIndex(
+            self.client.__id__(), url, key
+        )
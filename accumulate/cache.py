@@ -0,0 +1,185 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from .constants import ACCUMULATE_METHODS
+
+DEFAULT_TTL = 5
+DEFAULT_MAX_ENTRIES = 1024
+
+# read methods whose results are cached, with their default TTL in seconds;
+# None means the cache's own ttl
+CACHED_METHODS = {
+    ACCUMULATE_METHODS.VERSION: 3600,
+    ACCUMULATE_METHODS.Query: None,
+    ACCUMULATE_METHODS.QueryChain: None,
+    ACCUMULATE_METHODS.QueryData: None,
+    ACCUMULATE_METHODS.QueryDataSet: None,
+    ACCUMULATE_METHODS.QueryDirectory: None,
+    ACCUMULATE_METHODS.QueryKeyPageIndex: None,
+    ACCUMULATE_METHODS.QueryTxHistory: None,
+}
+
+WRITE_METHODS = frozenset(
+    (
+        ACCUMULATE_METHODS.Execute,
+        ACCUMULATE_METHODS.ExecuteAddCredits,
+        ACCUMULATE_METHODS.ExecuteCreateAdi,
+        ACCUMULATE_METHODS.ExecuteCreateDataAccount,
+        ACCUMULATE_METHODS.ExecuteCreateKeyBook,
+        ACCUMULATE_METHODS.ExecuteCreateKeyPage,
+        ACCUMULATE_METHODS.ExecuteCreateToken,
+        ACCUMULATE_METHODS.ExecuteCreateTokenAccount,
+        ACCUMULATE_METHODS.ExecuteSendTokens,
+        ACCUMULATE_METHODS.ExecuteUpdateKeyPage,
+        ACCUMULATE_METHODS.ExecuteWriteData,
+        ACCUMULATE_METHODS.Faucet,
+    )
+)
+
+MISSING = object()
+
+
+def normalize_url(url: str):
+    url = url.lower().rstrip("/")
+    if url.startswith("acc://"):
+        url = url[len("acc://") :]
+    return url
+
+
+def collect_strings(value, strings: set):
+    if isinstance(value, str):
+        strings.add(normalize_url(value))
+    elif isinstance(value, dict):
+        for item in value.values():
+            collect_strings(item, strings)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            collect_strings(item, strings)
+    return strings
+
+
+class CacheEntry:
+    def __init__(self, url, result, size: int, expires: float) -> None:
+        self.url = url
+        self.result = result
+        self.size = size
+        self.expires = expires
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = None,
+        ttls: dict = None,
+    ) -> None:
+        """
+        In-memory TTL cache of read results, keyed by method and params, with
+        LRU eviction. Any write call (Execute*, Faucet) drops the cached
+        entries of every URL found in its params.
+
+        Args:
+            ttl: default time to live of an entry, in seconds
+            max_entries: maximum number of cached entries
+            max_bytes: optional limit on the summed response size of the entries
+            ttls: per-method TTLs overriding the defaults in CACHED_METHODS
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttls = dict(CACHED_METHODS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def key(self, method: str, params: dict = None):
+        return method, json.dumps(params, sort_keys=True)
+
+    def get(self, method: str, params: dict = None):
+        """
+        Returns the cached result, or MISSING
+        """
+        if method not in self.ttls:
+            return MISSING
+        key = self.key(method, params)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry.expires <= time.monotonic():
+                if entry is not None:
+                    self.remove(key)
+                self.misses += 1
+                return MISSING
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry.result
+
+    def set(self, method: str, params: dict, result, size: int):
+        """
+        Stores the result of a read call; results of other methods are ignored
+        """
+        ttl = self.ttls.get(method, MISSING)
+        if ttl is MISSING:
+            return
+        if ttl is None:
+            ttl = self.ttl
+        url = params.get("url") if params else None
+        if url is not None:
+            url = normalize_url(url)
+        key = self.key(method, params)
+        with self.lock:
+            if key in self.entries:
+                self.remove(key)
+            self.entries[key] = CacheEntry(url, result, size, time.monotonic() + ttl)
+            self.size += size
+            while self.entries and (
+                len(self.entries) > self.max_entries
+                or (self.max_bytes is not None and self.size > self.max_bytes)
+            ):
+                self.remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def remove(self, key):
+        entry = self.entries.pop(key)
+        self.size -= entry.size
+
+    def invalidate_write(self, method: str, params: dict = None):
+        """
+        Drops the cached entries of every URL in the params of a write call
+        """
+        if method in WRITE_METHODS:
+            self.invalidate(*collect_strings(params, set()))
+
+    def invalidate(self, *urls: str):
+        """
+        Drops every cached entry of the given URLs
+        """
+        urls = {normalize_url(url) for url in urls}
+        with self.lock:
+            for key in [k for k, entry in self.entries.items() if entry.url in urls]:
+                self.remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.size,
+            }
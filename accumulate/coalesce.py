@@ -0,0 +1,111 @@
+import json
+import threading
+
+from .retry import READ_METHODS
+
+
+class Flight:
+    def __init__(self) -> None:
+        """
+        One outstanding call shared by every thread asking for the same thing
+        """
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Coalescer:
+    def __init__(self, methods=READ_METHODS) -> None:
+        """
+        Single-flight coalescing of identical reads. While a call with a given
+        method and params is outstanding, identical calls from other threads
+        or tasks wait for it instead of sending their own, and all of them get
+        the same decoded result, or the same exception. Each caller still
+        builds its own model. Calls returning raw response bytes are only
+        shared with each other.
+
+        Usage:
+            accumulate = Accumulate(endpoint, coalescer=Coalescer())
+            accumulate.query_many([url] * 100)  # one call to the node
+            accumulate.coalescer.stats()  # {"calls": 1, "saved": 99}
+
+        Args:
+            methods: methods that are coalesced; writes never are
+        """
+        self.methods = frozenset(methods) & READ_METHODS
+        self.flights = dict()
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.saved = 0
+
+    def applies(self, method: str):
+        return method in self.methods
+
+    def key(self, method: str, params: dict = None, raw: bool = False):
+        return raw, method, json.dumps(params, sort_keys=True)
+
+    def call(self, fetch, id, method: str, params: dict = None, *args, raw=False):
+        """
+        Returns fetch(id, method, params, *args), or the result of the
+        identical call already in flight. `raw` is True when fetch returns
+        the undecoded response bytes.
+        """
+        key = self.key(method, params, raw)
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is None:
+                flight = self.flights[key] = Flight()
+                self.calls += 1
+                leader = True
+            else:
+                self.saved += 1
+                leader = False
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = fetch(id, method, params, *args)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+
+    async def acall(
+        self, fetch, id, method: str, params: dict = None, *args, raw=False
+    ):
+        """
+        asyncio version of call(), where fetch is a coroutine function
+        """
+        import asyncio
+
+        # futures belong to one event loop, so flights are kept per loop
+        key = (asyncio.get_running_loop(), self.key(method, params, raw))
+        with self.lock:
+            future = self.flights.get(key)
+            if future is None:
+                future = self.flights[key] = asyncio.ensure_future(
+                    fetch(id, method, params, *args)
+                )
+                future.add_done_callback(lambda f: self.land(key))
+                self.calls += 1
+            else:
+                self.saved += 1
+        # a cancelled waiter must not cancel the call the others wait for
+        return await asyncio.shield(future)
+
+    def land(self, key):
+        with self.lock:
+            del self.flights[key]
+
+    def stats(self):
+        """
+        Returns the number of calls sent and of calls saved by coalescing
+        """
+        with self.lock:
+            return {"calls": self.calls, "saved": self.saved}
@@ -0,0 +1,67 @@
+import json
+
+
+class JsonCodec:
+    """
+    Standard library codec, used when no faster JSON library is installed
+    """
+
+    name = "json"
+
+    def dumps(self, obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, data):
+        # json.loads detects the encoding of bytes itself
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    name = "orjson"
+
+    def __init__(self) -> None:
+        import orjson
+
+        self.dumps = orjson.dumps
+        self.loads = orjson.loads
+
+
+class UjsonCodec:
+    name = "ujson"
+
+    def __init__(self) -> None:
+        import ujson
+
+        self.loads = ujson.loads
+        self.encode = ujson.dumps
+
+    def dumps(self, obj) -> bytes:
+        return self.encode(obj).encode("utf-8")
+
+
+CODECS = (OrjsonCodec, UjsonCodec, JsonCodec)
+
+default = None
+
+
+def get_codec(name: str = None):
+    """
+    Returns a codec by name ("orjson", "ujson" or "json"), or by default the
+    fastest one installed. Codecs encode to and decode from bytes.
+    """
+    global default
+    if name is None and default is not None:
+        return default
+    for codec in CODECS:
+        if name is not None and codec.name != name:
+            continue
+        try:
+            instance = codec()
+        except ImportError:
+            if name is not None:
+                raise
+            continue
+        if name is None:
+            default = instance
+        return instance
+    raise ValueError("unknown codec %r" % name)
@@ -0,0 +1,196 @@
+from .pagination import iter_pages, DEFAULT_PAGE_SIZE
+
+# ACME amounts are integers in units of 10^-8 ACME
+ACME_PRECISION = 8
+ACME_URL = "acc://ACME"
+
+FORMATS = ("auto", "numpy", "arrow", "columns")
+COLUMNS = (
+    "index",
+    "txid",
+    "type",
+    "sponsor",
+    "recipient",
+    "token",
+    "amount",
+    "delivered",
+    "pending",
+    "code",
+)
+
+
+class RawPage:
+    __slots__ = ("items", "total")
+
+    def __init__(self, result: dict) -> None:
+        """
+        A raw QueryTxHistory, QueryDirectory or QueryDataSet result dict seen
+        as a page by iter_pages
+        """
+        self.items = result.get("items") or list()
+        self.total = result.get("total")
+
+
+def get_transfer(data):
+    """
+    Returns the (recipient, token, amount in base units) of a transaction's
+    data; a send to several recipients counts as one transfer of the sum
+    """
+    if not isinstance(data, dict):
+        return "", "", 0
+    token = data.get("token") or data.get("tokenUrl") or ""
+    recipient = data.get("to")
+    if isinstance(recipient, list):
+        amount = sum(int(to.get("amount") or 0) for to in recipient)
+        urls = [to.get("url") or "" for to in recipient]
+        return (urls[0] if len(urls) == 1 else ""), token, amount
+    return recipient or "", token, int(data.get("amount") or 0)
+
+
+def get_scale(precision, token: str):
+    if isinstance(precision, dict):
+        precision = precision.get(token, ACME_PRECISION)
+    return 10.0**precision
+
+
+def page_columns(items: list, start: int, precision=ACME_PRECISION):
+    """
+    Turns the raw items of a QueryTxHistory page into a dict of column lists
+    """
+    columns = {name: list() for name in COLUMNS}
+    for i, item in enumerate(items):
+        recipient, token, amount = get_transfer(item.get("data"))
+        status = item.get("status") or dict()
+        columns["index"].append(start + i)
+        columns["txid"].append(item.get("txid") or "")
+        columns["type"].append(item.get("type") or "")
+        columns["sponsor"].append(item.get("sponsor") or "")
+        columns["recipient"].append(recipient)
+        columns["token"].append(token)
+        columns["amount"].append(amount / get_scale(precision, token or ACME_URL))
+        columns["delivered"].append(bool(status.get("delivered")))
+        columns["pending"].append(bool(status.get("pending")))
+        columns["code"].append(int(status.get("code") or 0))
+    return columns
+
+
+def iter_tx_columns(
+    client,
+    url: str,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    start: int = 0,
+    precision=ACME_PRECISION,
+):
+    """
+    Yields an account's history one page at a time as a dict of column lists,
+    decoded from the raw result dicts without building any model
+
+    Args:
+        client: a sync Accumulate client
+        url: account URL
+        page_size: number of transactions requested per page
+        start: index of the first transaction
+        precision: decimal places of the token amounts, or a dict of them by
+            token URL, ACME's for tokens not in it
+    """
+    raw = client.as_raw()
+
+    def fetch(start, count):
+        return RawPage(raw.QueryTxHistory(url, count, start))
+
+    for page in iter_pages(fetch, page_size, start):
+        yield page_columns(page.items, start, precision)
+        start += len(page.items)
+
+
+def to_numpy(pages):
+    """
+    Concatenates pages of column lists into a NumPy structured array, with
+    string columns as wide as their longest value
+    """
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError(
+            "NumPy export requires numpy: pip install py_accumulate[numpy]"
+        ) from e
+    types = {"index": numpy.int64, "amount": numpy.float64, "code": numpy.int64}
+    types.update(delivered=numpy.bool_, pending=numpy.bool_)
+    chunks = {name: list() for name in COLUMNS}
+    for columns in pages:
+        for name in COLUMNS:
+            chunks[name].append(numpy.array(columns[name], dtype=types.get(name, str)))
+    arrays = [
+        (
+            numpy.concatenate(chunks[name])
+            if chunks[name]
+            else numpy.array([], dtype=types.get(name, str))
+        )
+        for name in COLUMNS
+    ]
+    dtype = [(name, array.dtype) for name, array in zip(COLUMNS, arrays)]
+    result = numpy.empty(len(arrays[0]), dtype=dtype)
+    for name, array in zip(COLUMNS, arrays):
+        result[name] = array
+    return result
+
+
+def to_arrow(pages):
+    """
+    Turns pages of column lists into a pyarrow Table with one record batch
+    per page
+    """
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError(
+            "Arrow export requires pyarrow: pip install py_accumulate[arrow]"
+        ) from e
+    types = {
+        "index": pyarrow.int64(),
+        "amount": pyarrow.float64(),
+        "delivered": pyarrow.bool_(),
+        "pending": pyarrow.bool_(),
+        "code": pyarrow.int64(),
+    }
+    schema = pyarrow.schema(
+        [(name, types.get(name, pyarrow.string())) for name in COLUMNS]
+    )
+    batches = [pyarrow.RecordBatch.from_pydict(columns, schema) for columns in pages]
+    return pyarrow.Table.from_batches(batches, schema)
+
+
+def has_module(name: str):
+    try:
+        __import__(name)
+    except ImportError:
+        return False
+    return True
+
+
+def export_tx_history(
+    client,
+    url: str,
+    format: str = "auto",
+    page_size: int = DEFAULT_PAGE_SIZE,
+    start: int = 0,
+    precision=ACME_PRECISION,
+):
+    """
+    Exports an account's whole history into columnar arrays; see
+    Accumulate.export_tx_history
+    """
+    if format not in FORMATS:
+        raise ValueError("format must be one of %s" % ", ".join(FORMATS))
+    if format == "auto":
+        format = "arrow" if has_module("pyarrow") else "numpy"
+    pages = iter_tx_columns(client, url, page_size, start, precision)
+    if format == "arrow":
+        return to_arrow(pages)
+    if format == "numpy":
+        return to_numpy(pages)
+    columns = {name: list() for name in COLUMNS}
+    for page in pages:
+        for name in COLUMNS:
+            columns[name].extend(page[name])
+    return columns
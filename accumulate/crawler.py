@@ -0,0 +1,227 @@
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .columnar import RawPage
+from .constants import ACCUMULATE_TYPES
+from .fanout import DEFAULT_MAX_WORKERS
+from .models import QUERY_RESPONSE_TYPES
+from .pagination import iter_pages, DEFAULT_PAGE_SIZE
+
+# account fields holding the URL of another account
+DEFAULT_FOLLOW = ("keyBook", "managerKeyBook", "pages")
+
+
+def url_key(url: str):
+    # Accumulate URLs are case-insensitive
+    return url.lower().rstrip("/")
+
+
+class CrawlResult:
+    __slots__ = ("url", "depth", "parent", "result", "error", "_data")
+
+    def __init__(self, url: str, depth: int, parent, result=None, error=None):
+        """
+        One crawled URL: its raw Query result, or the error querying it
+        """
+        self.url = url
+        self.depth = depth
+        self.parent = parent
+        self.result = result
+        self.error = error
+        self._data = None
+
+    @property
+    def type(self):
+        return self.result.get("type") if self.result else None
+
+    @property
+    def data(self):
+        """
+        The account as its model (Identity, KeyPage, LiteTokenAccount, ...),
+        or as the raw dict for account types without one
+        """
+        data = self._data
+        if data is None and self.result:
+            data = self.result.get("data")
+            dispatch = QUERY_RESPONSE_TYPES.get(self.type)
+            if dispatch is not None and isinstance(data, dict):
+                data = dispatch[1](**data)
+            self._data = data
+        return data
+
+
+class Crawler:
+    def __init__(
+        self,
+        client,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_depth: int = None,
+        max_per_level: int = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        follow=DEFAULT_FOLLOW,
+    ) -> None:
+        """
+        Walks the URL graph below one or more ADIs: the directory of every
+        identity, and the accounts named by each account's `follow` fields.
+        Directories are read with expandChains, so their entries come with
+        their Query result and are not queried again. Every URL is visited
+        once, with at most `max_workers` calls in flight.
+
+        Usage:
+            for res in accumulate.crawler(max_depth=2).crawl(["acc://adi"]):
+                print(res.url, res.type, res.error or res.data)
+
+        Args:
+            client: a sync Accumulate client
+            max_workers: maximum number of URLs fetched at once
+            max_depth: depth of the deepest URLs visited, roots being at 0
+            max_per_level: maximum number of URLs visited at each depth
+            page_size: number of entries requested per directory page
+            follow: account fields whose URLs are visited too
+        """
+        self.client = client.as_raw()
+        self.max_workers = max_workers
+        self.max_depth = max_depth
+        self.max_per_level = max_per_level
+        self.page_size = page_size
+        self.follow = tuple(follow)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # every crawl starts from an empty visited set and zero counts
+        self.visited = set()
+        self.levels = dict()
+        self.queries = 0
+        self.skipped = 0
+        self.errors = 0
+
+    def schedule(self, queue: deque, url: str, depth: int, parent, known=None):
+        if not url or not isinstance(url, str):
+            return
+        key = url_key(url)
+        if key in self.visited:
+            return
+        if self.max_depth is not None and depth > self.max_depth:
+            return
+        if self.max_per_level is not None:
+            if self.levels.get(depth, 0) >= self.max_per_level:
+                self.skipped += 1
+                return
+        self.visited.add(key)
+        self.levels[depth] = self.levels.get(depth, 0) + 1
+        queue.append((url, depth, parent, known))
+
+    def has_children(self, result: dict, depth: int):
+        # only identities have a directory to read
+        if self.max_depth is not None and depth >= self.max_depth:
+            return False
+        return result.get("type") == ACCUMULATE_TYPES.IDENTITY
+
+    def count_query(self):
+        # called from the worker threads
+        with self.lock:
+            self.queries += 1
+
+    def fetch(self, url: str, depth: int, known=None):
+        """
+        Returns the Query result of a URL and, for an identity, its directory
+        as (url, expanded Query result or None) pairs
+        """
+        result = known
+        if result is None:
+            self.count_query()
+            result = self.client.Query(url)
+        entries = list()
+        if not self.has_children(result, depth):
+            return result, entries
+
+        def fetch_page(start, count):
+            self.count_query()
+            return RawPage(
+                self.client.QueryDirectory(
+                    url, count=count, start=start, expandChains=True
+                )
+            )
+
+        for page in iter_pages(fetch_page, self.page_size):
+            for item in page.items:
+                urls = item.get("entries") or ()
+                expanded = item.get("expandedEntries") or ()
+                if len(expanded) != len(urls):
+                    expanded = (None,) * len(urls)
+                entries.extend(zip(urls, expanded))
+        return result, entries
+
+    def visit(self, queue: deque, url: str, depth: int, result: dict, entries):
+        """
+        Schedules the directory entries and followed URLs of a fetched URL
+        """
+        for child, known in entries:
+            self.schedule(queue, child, depth + 1, url, known)
+        data = result.get("data") if result else None
+        if not isinstance(data, dict):
+            return
+        for field in self.follow:
+            value = data.get(field)
+            for child in value if isinstance(value, list) else (value,):
+                self.schedule(queue, child, depth + 1, url)
+
+    def crawl(self, roots):
+        """
+        Crawls from the root URLs and yields a CrawlResult for every URL
+        visited, in completion order. A failed URL is yielded with its error
+        and the crawl goes on. stats() describes the latest crawl.
+        """
+        if isinstance(roots, str):
+            roots = [roots]
+        self.reset()
+        queue = deque()
+        for url in roots:
+            self.schedule(queue, url, 0, None)
+        inflight = dict()
+        executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="accumulate-crawl"
+        )
+        try:
+            while queue or inflight:
+                while queue and len(inflight) < self.max_workers:
+                    url, depth, parent, known = queue.popleft()
+                    if known is not None and not self.has_children(known, depth):
+                        # an expanded directory entry: nothing left to fetch
+                        self.visit(queue, url, depth, known, ())
+                        yield CrawlResult(url, depth, parent, known)
+                        continue
+                    future = executor.submit(self.fetch, url, depth, known)
+                    inflight[future] = (url, depth, parent)
+                if not inflight:
+                    continue
+                done, pending = wait(inflight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url, depth, parent = inflight.pop(future)
+                    try:
+                        result, entries = future.result()
+                    except Exception as e:
+                        self.errors += 1
+                        yield CrawlResult(url, depth, parent, error=e)
+                        continue
+                    self.visit(queue, url, depth, result, entries)
+                    yield CrawlResult(url, depth, parent, result)
+        finally:
+            # the caller may stop iterating early
+            for future in inflight:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def stats(self):
+        """
+        Returns the number of URLs visited, calls made, URLs skipped by
+        max_per_level and failed URLs
+        """
+        return {
+            "visited": len(self.visited),
+            "queries": self.queries,
+            "skipped": self.skipped,
+            "errors": self.errors,
+        }
@@ -0,0 +1,341 @@
+"""
+Streams every entry of a data account to a JSONL or length-prefixed binary
+file, with checkpoints to resume an interrupted export.
+
+    python -m accumulate.dataset ENDPOINT acc://adi/data entries.bin --format binary
+"""
+
+import argparse
+import base64
+import binascii
+import json
+import os
+import shutil
+import struct
+import sys
+import threading
+
+from .columnar import RawPage
+from .fanout import fan_out
+from .pagination import iter_pages, DEFAULT_PAGE_SIZE
+
+FORMATS = ("jsonl", "binary")
+ENCODINGS = ("hex", "base64", "utf-8", "auto")
+# the v2 API returns data and extIds hex encoded
+DEFAULT_ENCODING = "hex"
+# start of a binary export file, followed by one record per entry
+MAGIC = b"ACCDSET1"
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+HASH_LENGTH = struct.Struct("<B")
+DATA_LENGTH = struct.Struct("<I")
+EXT_COUNT = struct.Struct("<H")
+
+
+def decode_field(value, encoding: str = DEFAULT_ENCODING):
+    """
+    Returns the bytes of a hex, base64 or text encoded field. "auto" takes
+    even-length hex as hex, then valid base64 as base64, then UTF-8 text;
+    it guesses every field on its own, so text that happens to be valid hex
+    is decoded, and is only meant for sources mixing encodings.
+    """
+    if value is None:
+        return b""
+    if encoding == "hex":
+        return binascii.a2b_hex(value)
+    if encoding == "base64":
+        return base64.b64decode(value, validate=True)
+    if encoding == "auto":
+        try:
+            return binascii.a2b_hex(value)
+        except (binascii.Error, ValueError):
+            pass
+        try:
+            return base64.b64decode(value, validate=True)
+        except (binascii.Error, ValueError):
+            pass
+    return value.encode("utf-8")
+
+
+def write_record(write, item: dict, encoding: str = DEFAULT_ENCODING):
+    """
+    Writes one entry as a binary record: the entry hash behind a 1 byte
+    length, the data behind a 4 byte length, the number of extIds in 2 bytes
+    and every extId behind a 4 byte length, all little-endian
+    """
+    entry = item.get("entry") or dict()
+    entryHash = decode_field(item.get("entryHash"), "hex")
+    write(HASH_LENGTH.pack(len(entryHash)))
+    write(entryHash)
+    data = decode_field(entry.get("data"), encoding)
+    write(DATA_LENGTH.pack(len(data)))
+    write(data)
+    extIds = entry.get("extIds") or ()
+    write(EXT_COUNT.pack(len(extIds)))
+    for extId in extIds:
+        extId = decode_field(extId, encoding)
+        write(DATA_LENGTH.pack(len(extId)))
+        write(extId)
+
+
+def read_exact(f, size: int):
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("truncated record")
+    return data
+
+
+def iter_records(path: str):
+    """
+    Yields (entryHash, data, extIds) for every record of a binary export,
+    with the entry hash as hex and the rest as bytes
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("%s is not a data set export" % path)
+        while True:
+            head = f.read(HASH_LENGTH.size)
+            if not head:
+                return
+            entryHash = read_exact(f, HASH_LENGTH.unpack(head)[0]).hex()
+            size = DATA_LENGTH.unpack(read_exact(f, DATA_LENGTH.size))[0]
+            data = read_exact(f, size)
+            extIds = list()
+            for _ in range(EXT_COUNT.unpack(read_exact(f, EXT_COUNT.size))[0]):
+                size = DATA_LENGTH.unpack(read_exact(f, DATA_LENGTH.size))[0]
+                extIds.append(read_exact(f, size))
+            yield entryHash, data, extIds
+
+
+def split_range(start: int, end: int, parts: int):
+    """
+    Splits [start, end) into at most `parts` contiguous ranges of nearly equal size
+    """
+    parts = max(1, min(parts, end - start))
+    size, extra = divmod(end - start, parts)
+    ranges = list()
+    for i in range(parts):
+        stop = start + size + (i < extra)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+class DataSetExporter:
+    def __init__(
+        self,
+        client,
+        url: str,
+        path: str,
+        format: str = "jsonl",
+        encoding: str = DEFAULT_ENCODING,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        workers: int = 1,
+        resume: bool = True,
+        start: int = 0,
+    ) -> None:
+        """
+        Streams every entry of a data account to a file. Pages are fetched as
+        raw results and written out one at a time, so memory use does not
+        grow with the size of the account. After every page the position is
+        saved to `path`.checkpoint; a new run of an interrupted export drops
+        whatever was written after it and carries on from there.
+
+        "jsonl" writes one {"index", "entryHash", "data", "extIds"} object per
+        line, with the fields as the node returned them. "binary" decodes the
+        fields and writes length-prefixed records; see write_record and
+        iter_records.
+
+        With several workers, the entries known when the export starts are
+        split into page ranges, each written to its own part file and joined
+        at the end.
+
+        Usage:
+            exporter = DataSetExporter(accumulate, url, "entries.bin", "binary")
+            exporter.run()  # number of entries written
+
+        Args:
+            client: a sync Accumulate client
+            url: data account URL
+            path: output file
+            format: "jsonl" or "binary"
+            encoding: encoding of data and extIds for the binary format: "hex",
+                as the v2 API returns them, "base64", "utf-8", or "auto" to
+                guess every field separately
+            page_size: number of entries requested per page
+            workers: number of page ranges exported in parallel
+            resume: continue from an existing checkpoint instead of starting over
+            start: index of the first entry
+        """
+        if format not in FORMATS:
+            raise ValueError("format must be one of %s" % ", ".join(FORMATS))
+        if encoding not in ENCODINGS:
+            raise ValueError("encoding must be one of %s" % ", ".join(ENCODINGS))
+        self.client = client.as_raw()
+        self.codec = client.codec
+        self.url = url
+        self.path = path
+        self.format = format
+        self.encoding = encoding
+        self.page_size = page_size
+        self.workers = workers
+        self.resume = resume
+        self.start = start
+        self.checkpoint_path = path + ".checkpoint"
+        self.lock = threading.Lock()
+        self.state = None
+
+    def fetch(self, start: int, count: int):
+        queryPagination = {"start": start, "count": count}
+        return RawPage(self.client.QueryDataSet(self.url, queryPagination, None))
+
+    def part_path(self, index: int):
+        if len(self.state["ranges"]) == 1:
+            return self.path
+        return "%s.part%d" % (self.path, index)
+
+    def load_state(self):
+        if self.resume and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                state = json.load(f)
+            if state["url"] == self.url and state["format"] == self.format:
+                return state
+        # the entries present now are exported; later ones are left out
+        total = self.fetch(self.start, 1).total or 0
+        ranges = split_range(self.start, max(self.start, total), self.workers)
+        return {
+            "url": self.url,
+            "format": self.format,
+            "ranges": [
+                {"start": start, "end": end, "next": start, "offset": 0}
+                for start, end in ranges
+            ],
+        }
+
+    def save_state(self):
+        # caller holds self.lock; replaced atomically so a crash leaves a
+        # complete checkpoint behind
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    def run(self):
+        """
+        Runs or resumes the export and returns the number of entries written
+        """
+        self.state = self.load_state()
+        with self.lock:
+            self.save_state()
+        ranges = self.state["ranges"]
+        args_list = [(index,) for index in range(len(ranges))]
+        for result in fan_out(self.export_range, args_list, max(1, self.workers)):
+            if isinstance(result, Exception):
+                raise result
+        if len(ranges) > 1:
+            self.join_parts()
+        elif not os.path.exists(self.path):
+            # an empty data account
+            with open(self.path, "wb") as f:
+                f.write(MAGIC if self.format == "binary" else b"")
+        os.remove(self.checkpoint_path)
+        return sum(part["end"] - part["start"] for part in ranges)
+
+    def export_range(self, index: int):
+        part = self.state["ranges"][index]
+        if part["next"] >= part["end"]:
+            return
+        path = self.part_path(index)
+        header = self.format == "binary" and len(self.state["ranges"]) == 1
+        mode = "r+b" if part["offset"] and os.path.exists(path) else "wb"
+        with open(path, mode, buffering=DEFAULT_BUFFER_SIZE) as f:
+            if mode == "r+b":
+                # drop what was written after the last checkpoint
+                f.truncate(part["offset"])
+                f.seek(part["offset"])
+            elif header:
+                f.write(MAGIC)
+            end = part["end"]
+
+            def fetch(start, count):
+                page = self.fetch(start, min(count, end - start))
+                page.total = end if page.total is None else min(page.total, end)
+                return page
+
+            for page in iter_pages(fetch, self.page_size, part["next"]):
+                self.write_page(f, page.items, part["next"])
+                f.flush()
+                os.fsync(f.fileno())
+                with self.lock:
+                    part["next"] += len(page.items)
+                    part["offset"] = f.tell()
+                    self.save_state()
+            with self.lock:
+                # entries removed from the node since the export started
+                part["end"] = part["next"]
+                self.save_state()
+
+    def write_page(self, f, items: list, start: int):
+        write = f.write
+        if self.format == "binary":
+            for item in items:
+                write_record(write, item, self.encoding)
+            return
+        dumps = self.codec.dumps
+        for i, item in enumerate(items):
+            entry = item.get("entry") or dict()
+            record = {
+                "index": start + i,
+                "entryHash": item.get("entryHash"),
+                "data": entry.get("data"),
+                "extIds": entry.get("extIds"),
+            }
+            write(dumps(record))
+            write(b"\n")
+
+    def join_parts(self):
+        with open(self.path, "wb", buffering=DEFAULT_BUFFER_SIZE) as out:
+            if self.format == "binary":
+                out.write(MAGIC)
+            for index in range(len(self.state["ranges"])):
+                with open(self.part_path(index), "rb") as part:
+                    shutil.copyfileobj(part, out, DEFAULT_BUFFER_SIZE)
+        for index in range(len(self.state["ranges"])):
+            os.remove(self.part_path(index))
+
+
+def main(argv=None):
+    from .methods import Accumulate
+
+    parser = argparse.ArgumentParser(
+        description="Export every entry of an Accumulate data account to a file"
+    )
+    parser.add_argument("endpoint", help="node endpoint URL")
+    parser.add_argument("url", help="data account URL")
+    parser.add_argument("output", help="output file")
+    parser.add_argument("--format", choices=FORMATS, default="jsonl")
+    parser.add_argument("--encoding", choices=ENCODINGS, default=DEFAULT_ENCODING)
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--restart", action="store_true", help="ignore an existing checkpoint"
+    )
+    args = parser.parse_args(argv)
+    with Accumulate(args.endpoint) as accumulate:
+        exporter = DataSetExporter(
+            accumulate,
+            args.url,
+            args.output,
+            format=args.format,
+            encoding=args.encoding,
+            page_size=args.page_size,
+            workers=args.workers,
+            resume=not args.restart,
+        )
+        count = exporter.run()
+    print("%d entries written to %s" % (count, args.output))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
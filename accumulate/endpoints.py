@@ -0,0 +1,180 @@
+import random
+import threading
+import time
+
+from .cache import WRITE_METHODS
+
+DEFAULT_ALPHA = 0.3
+DEFAULT_MAX_FAILURES = 3
+DEFAULT_PROBE_INTERVAL = 5.0
+
+PROBE_PAYLOAD = b'{"jsonrpc":"2.0","id":0,"method":"version"}'
+
+
+class Endpoint:
+    def __init__(self, url: str) -> None:
+        """
+        One node of an EndpointPool with its routing state
+        """
+        self.url = url
+        self.ewma = None
+        self.inflight = 0
+        self.failures = 0
+        self.healthy = True
+        self.calls = 0
+        self.errors = 0
+
+    def score(self):
+        # expected wait: observed latency times the calls already queued on
+        # this node, so load spreads once the fastest node gets busy
+        if self.ewma is None:
+            return 0.0
+        return self.ewma * (self.inflight + 1)
+
+
+class EndpointPool:
+    def __init__(
+        self,
+        endpoints,
+        alpha: float = DEFAULT_ALPHA,
+        max_failures: int = DEFAULT_MAX_FAILURES,
+        probe_interval: float = DEFAULT_PROBE_INTERVAL,
+        pin_writes: bool = True,
+        transport=None,
+    ) -> None:
+        """
+        Routes calls over several node endpoints. Reads go to the healthy
+        endpoint with the lowest EWMA latency, weighted by its calls in
+        flight. An endpoint failing `max_failures` times in a row is ejected
+        and probed in the background with `version` until it answers again.
+
+        Args:
+            endpoints: node endpoint URLs
+            alpha: EWMA weight of the latest latency sample
+            max_failures: consecutive failures before an endpoint is ejected
+            probe_interval: seconds between probes of ejected endpoints
+            pin_writes: send every Execute* and faucet call to one node, the
+                first healthy endpoint, so they are seen in submission order
+            transport: sync transport used by the prober; Accumulate sets its
+                own when none is given
+        """
+        if isinstance(endpoints, str):
+            endpoints = [endpoints]
+        self.endpoints = [Endpoint(url) for url in endpoints]
+        if not self.endpoints:
+            raise ValueError("EndpointPool needs at least one endpoint")
+        self.alpha = alpha
+        self.max_failures = max_failures
+        self.probe_interval = probe_interval
+        self.pin_writes = pin_writes
+        self.transport = transport
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.prober = None
+
+    def acquire(self, method: str):
+        """
+        Picks the endpoint for a call and counts it as in flight; every
+        acquire must be followed by a release
+        """
+        with self.lock:
+            healthy = [endpoint for endpoint in self.endpoints if endpoint.healthy]
+            if not healthy:
+                # all ejected: keep trying the one that failed least
+                endpoint = min(self.endpoints, key=lambda e: e.failures)
+            elif self.pin_writes and method in WRITE_METHODS:
+                endpoint = healthy[0]
+            else:
+                best = min(endpoint.score() for endpoint in healthy)
+                endpoint = random.choice(
+                    [endpoint for endpoint in healthy if endpoint.score() == best]
+                )
+            endpoint.inflight += 1
+            endpoint.calls += 1
+            return endpoint
+
+    def release(self, endpoint: Endpoint, latency: float = None, cancelled=False):
+        """
+        Ends a call started with acquire; latency is None when the call failed.
+        A cancelled call counts as neither a success nor a failure.
+        """
+        with self.lock:
+            endpoint.inflight -= 1
+            if cancelled:
+                return
+            if latency is not None:
+                self.observe(endpoint, latency)
+                return
+            endpoint.errors += 1
+            endpoint.failures += 1
+            if endpoint.healthy and endpoint.failures >= self.max_failures:
+                endpoint.healthy = False
+                self.start_prober()
+
+    def observe(self, endpoint: Endpoint, latency: float):
+        endpoint.failures = 0
+        if endpoint.ewma is None:
+            endpoint.ewma = latency
+        else:
+            endpoint.ewma += self.alpha * (latency - endpoint.ewma)
+
+    def start_prober(self):
+        if self.prober is None or not self.prober.is_alive():
+            self.prober = threading.Thread(
+                target=self.probe_loop, name="accumulate-prober", daemon=True
+            )
+            self.prober.start()
+
+    def probe_loop(self):
+        while not self.stopped.wait(self.probe_interval):
+            with self.lock:
+                ejected = [e for e in self.endpoints if not e.healthy]
+            if not ejected:
+                return
+            for endpoint in ejected:
+                self.probe(endpoint)
+
+    def probe(self, endpoint: Endpoint):
+        """
+        Sends `version` to an endpoint and readmits it if it answers
+        """
+        start = time.perf_counter()
+        try:
+            res = self.transport.post(
+                url=endpoint.url,
+                headers={"content-type": "application/json"},
+                data=PROBE_PAYLOAD,
+            )
+        except Exception:
+            return False
+        if res.status_code >= 500 or b'"error"' in res.content:
+            return False
+        with self.lock:
+            endpoint.healthy = True
+            # the old latency is stale; start over from the probe's
+            endpoint.ewma = None
+            self.observe(endpoint, time.perf_counter() - start)
+        return True
+
+    def stats(self):
+        """
+        Returns the routing state of every endpoint
+        """
+        with self.lock:
+            return [
+                {
+                    "url": endpoint.url,
+                    "healthy": endpoint.healthy,
+                    "ewma": endpoint.ewma,
+                    "inflight": endpoint.inflight,
+                    "calls": endpoint.calls,
+                    "errors": endpoint.errors,
+                }
+                for endpoint in self.endpoints
+            ]
+
+    def close(self):
+        """
+        Stops the background prober
+        """
+        self.stopped.set()
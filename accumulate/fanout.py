@@ -0,0 +1,101 @@
+from .transport import DEFAULT_POOL_SIZE
+
+# one worker per pooled connection, so no worker waits for a connection
+DEFAULT_MAX_WORKERS = DEFAULT_POOL_SIZE
+
+
+def call(fn, args: tuple):
+    """
+    Runs fn(*args), returning the exception instead of raising it so that one
+    failed item does not affect the others.
+    """
+    try:
+        return fn(*args)
+    except Exception as e:
+        return e
+
+
+def fan_out(fn, args_list, max_workers: int = DEFAULT_MAX_WORKERS):
+    """
+    Runs fn once per args tuple on a bounded thread pool.
+
+    Returns:
+        list of results in input order, with an exception in place of the
+        result for every call that failed
+    """
+    # imported here to keep `import accumulate` fast
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(call, fn, args) for args in args_list]
+        return [future.result() for future in futures]
+
+
+def fan_out_as_completed(fn, args_list, max_workers: int = DEFAULT_MAX_WORKERS):
+    """
+    Runs fn once per args tuple on a bounded thread pool.
+
+    Yields:
+        (index, result) tuples as the calls complete, where index is the
+        position of the args in args_list and result is an exception for
+        every call that failed
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = {
+        executor.submit(call, fn, args): index for index, args in enumerate(args_list)
+    }
+    try:
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        # the caller may stop iterating early; drop the calls not started yet
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+async def acall(semaphore, fn, args: tuple):
+    # call() for a coroutine function, within the semaphore's limit
+    async with semaphore:
+        try:
+            return await fn(*args)
+        except Exception as e:
+            return e
+
+
+async def afan_out(fn, args_list, max_workers: int = DEFAULT_MAX_WORKERS):
+    """
+    asyncio version of fan_out, where fn is a coroutine function and at most
+    `max_workers` calls are awaited at once
+    """
+    import asyncio
+
+    semaphore = asyncio.Semaphore(max_workers)
+    return await asyncio.gather(*[acall(semaphore, fn, args) for args in args_list])
+
+
+async def afan_out_as_completed(fn, args_list, max_workers: int = DEFAULT_MAX_WORKERS):
+    """
+    asyncio version of fan_out_as_completed, yielding (index, result) tuples
+    from an async iterator
+    """
+    import asyncio
+
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def indexed(index, args):
+        return index, await acall(semaphore, fn, args)
+
+    tasks = [
+        asyncio.ensure_future(indexed(index, args))
+        for index, args in enumerate(args_list)
+    ]
+    try:
+        for future in asyncio.as_completed(tasks):
+            yield await future
+    finally:
+        # the caller may stop iterating early
+        for task in tasks:
+            task.cancel()
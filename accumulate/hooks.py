@@ -0,0 +1,283 @@
+import bisect
+import threading
+import time
+
+from .exception import ServerError
+
+# histogram bucket upper bounds in seconds; one more bucket counts +Inf
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+STAGES = ("encode", "network", "decode", "model", "total")
+# reported as the method of a JSON-RPC batch POST
+BATCH_METHOD = "batch"
+DEFAULT_PREFIX = "accumulate_client"
+
+
+class CallInfo:
+    __slots__ = (
+        "method",
+        "id",
+        "params",
+        "cached",
+        "coalesced",
+        "encode_time",
+        "network_time",
+        "decode_time",
+        "model_time",
+        "total_time",
+        "request_bytes",
+        "response_bytes",
+        "error",
+        "error_code",
+        "start",
+        "last",
+    )
+
+    def __init__(self, method: str, id, params: dict = None) -> None:
+        """
+        One RPC as seen by hooks. Stage times are in seconds and stay None
+        for stages the call did not reach; a call answered from the cache
+        only has model_time and total_time, and so has a call that waited
+        for an identical one (coalesced).
+        """
+        self.method = method
+        self.id = id
+        self.params = params
+        self.cached = False
+        self.coalesced = False
+        self.encode_time = None
+        self.network_time = None
+        self.decode_time = None
+        self.model_time = None
+        self.total_time = None
+        self.request_bytes = None
+        self.response_bytes = None
+        self.error = None
+        self.error_code = None
+        self.start = self.last = time.perf_counter()
+
+    def lap(self):
+        # seconds since the previous lap, or since the call started
+        now = time.perf_counter()
+        elapsed = now - self.last
+        self.last = now
+        return elapsed
+
+    def failed(self, error: Exception):
+        self.error = error
+        if isinstance(error, ServerError) and error.args:
+            if isinstance(error.args[0], dict):
+                self.error_code = error.args[0].get("code")
+
+    def finish(self):
+        self.total_time = time.perf_counter() - self.start
+
+    def stage_time(self, stage: str):
+        return getattr(self, stage + "_time")
+
+
+class Hook:
+    """
+    Base class of call hooks. before() runs when a call starts and after()
+    when it ends, successfully or not, with the same CallInfo.
+    """
+
+    def before(self, call: CallInfo):
+        pass
+
+    def after(self, call: CallInfo):
+        pass
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        # (upper bound, count of values <= bound) pairs, ending with +Inf
+        total = 0
+        bounds = list(self.buckets) + [float("inf")]
+        pairs = list()
+        for bound, count in zip(bounds, self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+    def snapshot(self):
+        return {
+            "buckets": [[bound, count] for bound, count in self.cumulative()],
+            "sum": self.sum,
+            "count": self.count,
+        }
+
+
+class MethodStats:
+    __slots__ = (
+        "calls",
+        "cached",
+        "coalesced",
+        "errors",
+        "request_bytes",
+        "response_bytes",
+        "stages",
+    )
+
+    def __init__(self, buckets) -> None:
+        self.calls = 0
+        self.cached = 0
+        self.coalesced = 0
+        self.errors = dict()
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.stages = {stage: Histogram(buckets) for stage in STAGES}
+
+
+class MetricsCollector(Hook):
+    def __init__(self, buckets=DEFAULT_BUCKETS) -> None:
+        """
+        Hook keeping per-method call counts, error counts by code, byte
+        totals and a latency histogram for each client stage (encode,
+        network, decode, model and total).
+
+        Usage:
+            metrics = MetricsCollector()
+            accumulate = Accumulate(endpoint, hooks=[metrics])
+            ...
+            metrics.snapshot()  # dict
+            metrics.prometheus()  # Prometheus text exposition format
+
+        Args:
+            buckets: histogram bucket upper bounds in seconds
+        """
+        self.buckets = tuple(buckets)
+        self.methods = dict()
+        self.lock = threading.Lock()
+
+    def after(self, call: CallInfo):
+        with self.lock:
+            stats = self.methods.get(call.method)
+            if stats is None:
+                stats = self.methods[call.method] = MethodStats(self.buckets)
+            stats.calls += 1
+            if call.cached:
+                stats.cached += 1
+            if call.coalesced:
+                stats.coalesced += 1
+            if call.error is not None:
+                code = error_label(call)
+                stats.errors[code] = stats.errors.get(code, 0) + 1
+            stats.request_bytes += call.request_bytes or 0
+            stats.response_bytes += call.response_bytes or 0
+            for stage, histogram in stats.stages.items():
+                value = call.stage_time(stage)
+                if value is not None:
+                    histogram.observe(value)
+
+    def reset(self):
+        with self.lock:
+            self.methods = dict()
+
+    def snapshot(self):
+        """
+        Returns the collected metrics as a dict keyed by method
+        """
+        with self.lock:
+            return {
+                method: {
+                    "calls": stats.calls,
+                    "cached": stats.cached,
+                    "coalesced": stats.coalesced,
+                    "errors": dict(stats.errors),
+                    "request_bytes": stats.request_bytes,
+                    "response_bytes": stats.response_bytes,
+                    "stages": {
+                        stage: histogram.snapshot()
+                        for stage, histogram in stats.stages.items()
+                    },
+                }
+                for method, stats in self.methods.items()
+            }
+
+    def prometheus(self, prefix: str = DEFAULT_PREFIX):
+        """
+        Returns the collected metrics in the Prometheus text exposition format
+        """
+        with self.lock:
+            methods = sorted(self.methods.items())
+            lines = list()
+            counters = (
+                ("calls_total", "Calls made", "calls"),
+                ("cached_total", "Calls answered from the cache", "cached"),
+                ("coalesced_total", "Calls that shared an identical call", "coalesced"),
+                ("request_bytes_total", "Request bytes sent", "request_bytes"),
+                ("response_bytes_total", "Response bytes received", "response_bytes"),
+            )
+            for name, help, attribute in counters:
+                lines.append("# HELP %s_%s %s" % (prefix, name, help))
+                lines.append("# TYPE %s_%s counter" % (prefix, name))
+                for method, stats in methods:
+                    lines.append(
+                        '%s_%s{method="%s"} %d'
+                        % (prefix, name, method, getattr(stats, attribute))
+                    )
+            lines.append("# HELP %s_errors_total Failed calls by error code" % prefix)
+            lines.append("# TYPE %s_errors_total counter" % prefix)
+            for method, stats in methods:
+                for code, count in sorted(stats.errors.items()):
+                    lines.append(
+                        '%s_errors_total{method="%s",code="%s"} %d'
+                        % (prefix, method, code, count)
+                    )
+            name = prefix + "_stage_seconds"
+            lines.append("# HELP %s Time spent in each client stage of a call" % name)
+            lines.append("# TYPE %s histogram" % name)
+            for method, stats in methods:
+                for stage, histogram in stats.stages.items():
+                    labels = 'method="%s",stage="%s"' % (method, stage)
+                    for bound, count in histogram.cumulative():
+                        lines.append(
+                            '%s_bucket{%s,le="%s"} %d'
+                            % (name, labels, format_bound(bound), count)
+                        )
+                    lines.append("%s_sum{%s} %r" % (name, labels, histogram.sum))
+                    lines.append("%s_count{%s} %d" % (name, labels, histogram.count))
+        return "\n".join(lines) + "\n"
+
+
+def error_label(call: CallInfo):
+    # JSON-RPC error code, or the exception name for transport failures
+    if call.error_code is not None:
+        return str(call.error_code)
+    return type(call.error).__name__
+
+
+def format_bound(bound: float):
+    if bound == float("inf"):
+        return "+Inf"
+    return repr(float(bound))
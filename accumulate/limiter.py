@@ -0,0 +1,284 @@
+import threading
+import time
+
+from .cache import WRITE_METHODS
+
+READ = "read"
+WRITE = "write"
+
+DEFAULT_INITIAL_CONCURRENCY = 4
+DEFAULT_MIN_CONCURRENCY = 1
+DEFAULT_MAX_CONCURRENCY = 64
+DEFAULT_DECREASE = 0.5
+# a call slower than this multiple of the usual latency counts as a spike
+DEFAULT_SPIKE_FACTOR = 3.0
+BASELINE_ALPHA = 0.05
+# replies that mean the node is overloaded even though it answered
+OVERLOAD_STATUSES = (429,)
+
+
+def method_class(method: str):
+    return WRITE if method in WRITE_METHODS else READ
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float = None) -> None:
+        """
+        Allows `rate` calls per second on average and bursts of up to
+        `burst` calls
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.throttled = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Takes a token and returns the seconds to wait before using it; the
+        bucket goes into debt so callers are served in order
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            delay = -self.tokens / self.rate
+            self.throttled += delay
+            return delay
+
+
+class AdaptiveConcurrency:
+    def __init__(
+        self,
+        initial: int = DEFAULT_INITIAL_CONCURRENCY,
+        minimum: int = DEFAULT_MIN_CONCURRENCY,
+        maximum: int = DEFAULT_MAX_CONCURRENCY,
+        decrease: float = DEFAULT_DECREASE,
+        spike_factor: float = DEFAULT_SPIKE_FACTOR,
+    ) -> None:
+        """
+        AIMD limit on the number of calls in flight: +1 per limit's worth of
+        healthy calls, times `decrease` on an error or latency spike. Waiters
+        may be threads or asyncio tasks of any event loop.
+        """
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.spike_factor = spike_factor
+        self.inflight = 0
+        self.baseline = None
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+        self.waiters = list()
+
+    def try_acquire(self):
+        # caller holds self.condition
+        if self.inflight < int(self.limit):
+            self.inflight += 1
+            return True
+        return False
+
+    def acquire(self):
+        with self.condition:
+            while not self.try_acquire():
+                self.condition.wait()
+
+    async def aacquire(self):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        while True:
+            with self.condition:
+                if self.try_acquire():
+                    return
+                future = loop.create_future()
+                self.waiters.append((loop, future))
+            try:
+                await future
+            except asyncio.CancelledError:
+                # a wake-up this task can no longer use goes to the next waiter
+                with self.condition:
+                    self.wake(int(self.limit) - self.inflight)
+                raise
+
+    def release(self, latency: float = None, cancelled: bool = False):
+        """
+        Ends a call; latency is None when the call failed or was refused, and
+        a cancelled call frees its slot without changing the limit
+        """
+        with self.condition:
+            self.inflight -= 1
+            if cancelled:
+                pass
+            elif latency is None or self.is_spike(latency):
+                self.shrink()
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            if latency is not None:
+                if self.baseline is None:
+                    self.baseline = latency
+                else:
+                    self.baseline += BASELINE_ALPHA * (latency - self.baseline)
+            self.wake(int(self.limit) - self.inflight)
+
+    def is_spike(self, latency: float):
+        baseline = self.baseline
+        return baseline is not None and latency > self.spike_factor * baseline
+
+    def shrink(self):
+        # failures of calls that were already in flight together count once
+        now = time.monotonic()
+        if now - self.last_decrease < (self.baseline or 0.0):
+            return
+        self.last_decrease = now
+        self.limit = max(float(self.minimum), self.limit * self.decrease)
+
+    def wake(self, slots: int):
+        # caller holds self.condition
+        self.condition.notify(max(slots, 0))
+        while slots > 0 and self.waiters:
+            loop, future = self.waiters.pop(0)
+            if not future.done():
+                loop.call_soon_threadsafe(set_ready, future)
+                slots -= 1
+
+
+def set_ready(future):
+    # the waiting task may have been cancelled in the meantime
+    if not future.done():
+        future.set_result(None)
+
+
+class Limit:
+    def __init__(self, rate: float, burst: float, concurrency: dict) -> None:
+        """
+        Rate and concurrency limit of one endpoint and method class
+        """
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.concurrency = AdaptiveConcurrency(**concurrency)
+        self.calls = 0
+        self.errors = 0
+
+    def release(self, latency: float = None, cancelled: bool = False):
+        concurrency = self.concurrency
+        with concurrency.condition:
+            if not cancelled:
+                self.calls += 1
+                self.errors += latency is None
+            concurrency.release(latency, cancelled)
+
+
+class Limiter:
+    def __init__(
+        self,
+        read_rate: float = None,
+        write_rate: float = None,
+        read_burst: float = None,
+        write_burst: float = None,
+        initial_concurrency: int = DEFAULT_INITIAL_CONCURRENCY,
+        min_concurrency: int = DEFAULT_MIN_CONCURRENCY,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        decrease: float = DEFAULT_DECREASE,
+        spike_factor: float = DEFAULT_SPIKE_FACTOR,
+    ) -> None:
+        """
+        Client-side rate and concurrency limits, kept separately for every
+        endpoint and for reads and writes (Execute*, faucet). Each keeps a
+        token bucket, when a rate is set, and an AIMD concurrency limit which
+        grows while calls succeed and shrinks on errors, 429/5xx replies and
+        latency spikes. One Limiter can be shared by sync, threaded and async
+        clients.
+
+        Usage:
+            limiter = Limiter(read_rate=500, write_rate=50, max_concurrency=32)
+            accumulate = Accumulate(endpoint, limiter=limiter)
+
+        Args:
+            read_rate: reads per second per endpoint, None for no rate limit
+            write_rate: writes per second per endpoint, None for no rate limit
+            read_burst: calls a read bucket may hold, defaults to read_rate
+            write_burst: calls a write bucket may hold, defaults to write_rate
+            initial_concurrency: calls in flight allowed at first
+            min_concurrency: lower bound of the concurrency limit
+            max_concurrency: upper bound of the concurrency limit
+            decrease: factor applied to the limit on errors and spikes
+            spike_factor: multiple of the usual latency counted as a spike
+        """
+        self.rates = {
+            READ: (read_rate, read_burst),
+            WRITE: (write_rate, write_burst),
+        }
+        self.concurrency = {
+            "initial": initial_concurrency,
+            "minimum": min_concurrency,
+            "maximum": max_concurrency,
+            "decrease": decrease,
+            "spike_factor": spike_factor,
+        }
+        self.limits = dict()
+        self.lock = threading.Lock()
+
+    def get_limit(self, url: str, method: str):
+        key = (url, method_class(method))
+        limit = self.limits.get(key)
+        if limit is None:
+            with self.lock:
+                limit = self.limits.get(key)
+                if limit is None:
+                    rate, burst = self.rates[key[1]]
+                    limit = Limit(rate, burst, self.concurrency)
+                    self.limits[key] = limit
+        return limit
+
+    def acquire(self, url: str, method: str):
+        """
+        Waits until a call may be sent to `url` and returns its Limit, to be
+        released when the call ends
+        """
+        limit = self.get_limit(url, method)
+        if limit.bucket is not None:
+            delay = limit.bucket.reserve()
+            if delay:
+                time.sleep(delay)
+        limit.concurrency.acquire()
+        return limit
+
+    async def aacquire(self, url: str, method: str):
+        """
+        asyncio version of acquire()
+        """
+        import asyncio
+
+        limit = self.get_limit(url, method)
+        if limit.bucket is not None:
+            delay = limit.bucket.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+        await limit.concurrency.aacquire()
+        return limit
+
+    def stats(self):
+        """
+        Returns the current limits of every endpoint and method class
+        """
+        with self.lock:
+            limits = list(self.limits.items())
+        return [
+            {
+                "url": url,
+                "class": cls,
+                "concurrency": int(limit.concurrency.limit),
+                "inflight": limit.concurrency.inflight,
+                "calls": limit.calls,
+                "errors": limit.errors,
+                "throttled_seconds": limit.bucket.throttled if limit.bucket else 0.0,
+            }
+            for (url, cls), limit in limits
+        ]
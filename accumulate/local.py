@@ -0,0 +1,654 @@
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .constants import ACCUMULATE_METHODS, ACCUMULATE_TYPES
+from .transport import Response, Transport
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INJECTED_ERROR = -32000
+NOT_FOUND = -32004
+
+NODE_VERSION = "local"
+ACME_URL = "acc://ACME"
+FAUCET_AMOUNT = 1000000000
+
+
+def to_url(url: str):
+    # Accumulate URLs are case-insensitive; the local node keeps them lowercase
+    url = url.strip().rstrip("/").lower()
+    if not url.startswith("acc://"):
+        url = "acc://" + url
+    return url
+
+
+def parent_url(url: str):
+    path = url[len("acc://") :]
+    if "/" not in path:
+        return None
+    return "acc://" + path.split("/", 1)[0]
+
+
+def sha256(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode("utf-8"))
+    return h.hexdigest()
+
+
+class RPCError(Exception):
+    def __init__(self, code: int, message: str) -> None:
+        super().__init__(code, message)
+        self.code = code
+        self.message = message
+
+
+class LocalNode:
+    def __init__(
+        self,
+        latency=0.0,
+        error_rate: float = 0.0,
+        drop_rate: float = 0.0,
+        delivery_delay: float = 0.0,
+        seed=None,
+    ) -> None:
+        """
+        In-process stand-in for an Accumulate node, answering the v2 JSON-RPC
+        methods from synthetic in-memory state. Used with LocalTransport,
+        AsyncLocalTransport or LocalNodeServer to run tests, benchmarks and
+        load tests without the network.
+
+        Args:
+            latency: seconds each call takes, or a callable returning them
+            error_rate: fraction of calls answered with a JSON-RPC error
+            drop_rate: fraction of calls failing with a connection error
+            delivery_delay: seconds a transaction stays pending
+            seed: seed of the random number generator used for injection
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.delivery_delay = delivery_delay
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()
+        self.started = time.monotonic()
+        self.calls = 0
+        self.accounts = dict()
+        self.chains = dict()
+        self.txs = dict()
+        self.tx_created = dict()
+        self.histories = dict()
+        self.directories = dict()
+        self.entries = dict()
+        self.handlers = {
+            ACCUMULATE_METHODS.VERSION: self.version,
+            ACCUMULATE_METHODS.Metrics: self.metrics,
+            ACCUMULATE_METHODS.Faucet: self.faucet,
+            ACCUMULATE_METHODS.Query: self.query,
+            ACCUMULATE_METHODS.QueryChain: self.query_chain,
+            ACCUMULATE_METHODS.QueryData: self.query_data,
+            ACCUMULATE_METHODS.QueryDataSet: self.query_data_set,
+            ACCUMULATE_METHODS.QueryDirectory: self.query_directory,
+            ACCUMULATE_METHODS.QueryKeyPageIndex: self.query_key_page_index,
+            ACCUMULATE_METHODS.QueryTx: self.query_tx,
+            ACCUMULATE_METHODS.QueryTxHistory: self.query_tx_history,
+            ACCUMULATE_METHODS.Execute: self.execute,
+            ACCUMULATE_METHODS.ExecuteAddCredits: self.add_credits,
+            ACCUMULATE_METHODS.ExecuteCreateAdi: self.create_adi,
+            ACCUMULATE_METHODS.ExecuteCreateDataAccount: self.create_data_account,
+            ACCUMULATE_METHODS.ExecuteCreateKeyBook: self.create_key_book,
+            ACCUMULATE_METHODS.ExecuteCreateKeyPage: self.create_key_page,
+            ACCUMULATE_METHODS.ExecuteCreateToken: self.create_token,
+            ACCUMULATE_METHODS.ExecuteCreateTokenAccount: self.create_token_account,
+            ACCUMULATE_METHODS.ExecuteSendTokens: self.send_tokens,
+            ACCUMULATE_METHODS.ExecuteUpdateKeyPage: self.update_key_page,
+            ACCUMULATE_METHODS.ExecuteWriteData: self.write_data,
+        }
+
+    def delay(self):
+        """
+        Returns the injected latency of one call, in seconds
+        """
+        if callable(self.latency):
+            return self.latency()
+        return self.latency
+
+    def should_drop(self):
+        return bool(self.drop_rate) and self.random.random() < self.drop_rate
+
+    # JSON-RPC dispatch
+
+    def handle(self, data: bytes) -> bytes:
+        """
+        Answers one JSON-RPC request body, single call or batch
+        """
+        try:
+            request = json.loads(data)
+        except ValueError:
+            return self.encode(self.error(None, PARSE_ERROR, "parse error"))
+        if isinstance(request, list):
+            if not request:
+                return self.encode(self.error(None, INVALID_REQUEST, "empty batch"))
+            return self.encode([self.handle_call(call) for call in request])
+        return self.encode(self.handle_call(request))
+
+    def handle_call(self, call):
+        if not isinstance(call, dict):
+            return self.error(None, INVALID_REQUEST, "invalid request")
+        id = call.get("id")
+        handler = self.handlers.get(call.get("method"))
+        with self.lock:
+            self.calls += 1
+            if self.error_rate and self.random.random() < self.error_rate:
+                return self.error(id, INJECTED_ERROR, "injected error")
+            if handler is None:
+                return self.error(id, METHOD_NOT_FOUND, "method not found")
+            try:
+                result = handler(call.get("params") or dict())
+            except RPCError as e:
+                return self.error(id, e.code, e.message)
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                return self.error(id, INVALID_PARAMS, "invalid params: %r" % e)
+        return {"jsonrpc": "2.0", "id": id, "result": result}
+
+    def encode(self, obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+    def error(self, id, code: int, message: str):
+        error = {"code": code, "message": message}
+        return {"jsonrpc": "2.0", "id": id, "error": error}
+
+    # synthetic state
+
+    def add_account(self, url: str, type: str, **data):
+        url = to_url(url)
+        data.update({"type": type, "url": url})
+        self.accounts[url] = data
+        self.chains[sha256("chain", url)] = url
+        self.histories.setdefault(url, list())
+        parent = parent_url(url)
+        if parent is None:
+            self.directories.setdefault(url, [url])
+        else:
+            self.directories.setdefault(parent, [parent]).append(url)
+        return data
+
+    def add_lite_account(self, url: str = None, deposits: int = 0):
+        """
+        Creates a lite token account with `deposits` faucet transactions
+        """
+        with self.lock:
+            if url is None:
+                url = "acc://%s/ACME" % sha256("lite", len(self.accounts))[:48]
+            url = to_url(url)
+            if url not in self.accounts:
+                self.add_account(
+                    url,
+                    ACCUMULATE_TYPES.LITE_TOKEN_ACCOUNT,
+                    keyBook="",
+                    managerKeyBook="",
+                    tokenUrl=ACME_URL,
+                    balance="0",
+                    txCount=0,
+                    creditBalance="0",
+                )
+            for _ in range(deposits):
+                self.faucet({"url": url})
+            return url
+
+    def add_identity(self, url: str, data_entries: int = 0, publicKey: str = None):
+        """
+        Creates an ADI with a key book, a key page and a data account holding
+        `data_entries` entries
+        """
+        with self.lock:
+            url = to_url(url)
+            self.create_adi({"url": url, "publicKey": publicKey or sha256("key", url)})
+            data_url = to_url(url + "/data")
+            self.create_data_account({"url": data_url})
+            for i in range(data_entries):
+                self.write_data(
+                    {
+                        "url": data_url,
+                        # hex encoded, as the v2 API returns extIds
+                        "Entry": {
+                            "data": sha256("data", i),
+                            "extIds": [str(i).encode().hex()],
+                        },
+                    }
+                )
+            return url
+
+    def get_account(self, url: str):
+        account = self.accounts.get(to_url(url))
+        if account is None:
+            raise RPCError(NOT_FOUND, "%s not found" % url)
+        return account
+
+    def record_tx(self, type: str, sponsor: str, data: dict, deposit_to: str = None):
+        txid = sha256("tx", len(self.txs), type, sponsor)
+        self.txs[txid] = {
+            "type": type,
+            "data": data,
+            "sponsor": sponsor,
+            "keyPage": {"height": 1, "index": 0},
+            "txid": txid,
+            "signer": {
+                "publicKey": sha256("signer", sponsor),
+                "nonce": len(self.txs),
+            },
+            "sig": sha256("sig", txid),
+            "status": None,
+        }
+        self.tx_created[txid] = time.monotonic()
+        if deposit_to is not None:
+            self.histories.setdefault(deposit_to, list()).append(txid)
+            account = self.accounts.get(deposit_to)
+            if account is not None and "txCount" in account:
+                account["txCount"] += 1
+        return txid
+
+    def tx_status(self, txid: str):
+        if time.monotonic() - self.tx_created[txid] < self.delivery_delay:
+            return {"delivered": False, "pending": True}
+        return {"delivered": True, "pending": False}
+
+    def tx_response(self, txid: str):
+        return {
+            "txid": txid,
+            "hash": sha256("hash", txid),
+            "message": "",
+            "code": 0,
+            "delivered": self.tx_status(txid)["delivered"],
+        }
+
+    def history_item(self, txid: str):
+        item = dict(self.txs[txid])
+        item["type"] = ACCUMULATE_TYPES.SYNTHETIC_DEPOSIT_TOKENS
+        item["status"] = self.tx_status(txid)
+        return item
+
+    def merkle_state(self, url: str):
+        count = len(self.histories.get(url, ()))
+        return {"count": count, "roots": [sha256("root", url)]}
+
+    def credit(self, url: str, amount: int):
+        account = self.get_account(url)
+        account["balance"] = str(int(account["balance"]) + int(amount))
+
+    def page(self, params: dict, total: int):
+        pagination = params.get("queryPagination") or params
+        start = int(pagination.get("start") or 0)
+        count = int(pagination.get("count") or total)
+        return start, count
+
+    # query methods
+
+    def version(self, params):
+        return {
+            "type": ACCUMULATE_TYPES.VERSION,
+            "data": {
+                "commit": sha256(NODE_VERSION),
+                "version": NODE_VERSION,
+                "versionIsKnown": True,
+            },
+        }
+
+    def metrics(self, params):
+        elapsed = max(time.monotonic() - self.started, 1.0)
+        value = len(self.txs) / elapsed
+        return {"type": ACCUMULATE_TYPES.METRICS, "data": {"value": value}}
+
+    def query(self, params):
+        account = self.get_account(params["url"])
+        return {
+            "type": account["type"],
+            "merkleState": self.merkle_state(account["url"]),
+            "data": dict(account),
+        }
+
+    def query_chain(self, params):
+        url = self.chains.get(params["chainId"])
+        if url is None:
+            raise RPCError(NOT_FOUND, "chain %s not found" % params["chainId"])
+        return self.query({"url": url})
+
+    def query_tx(self, params):
+        tx = self.txs.get(params["txid"].lower())
+        if tx is None:
+            raise RPCError(NOT_FOUND, "transaction %s not found" % params["txid"])
+        tx = dict(tx)
+        tx["status"] = self.tx_status(tx["txid"])
+        tx["syntheticTxids"] = list()
+        return tx
+
+    def query_tx_history(self, params):
+        url = self.get_account(params["url"])["url"]
+        txids = self.histories[url]
+        start, count = self.page(params, len(txids))
+        items = [self.history_item(txid) for txid in txids[start : start + count]]
+        return {"items": items, "start": start, "count": count, "total": len(txids)}
+
+    def query_directory(self, params):
+        url = to_url(params["url"])
+        entries = self.directories.get(url)
+        if entries is None:
+            raise RPCError(NOT_FOUND, "directory %s not found" % url)
+        start, count = self.page(params, len(entries))
+        items = list()
+        for entry in entries[start : start + count]:
+            item = {
+                "type": ACCUMULATE_TYPES.DIRECTORY,
+                "total": len(entries),
+                "entries": [entry],
+            }
+            if params.get("expandChains"):
+                item["expandedEntries"] = [self.query({"url": entry})]
+            items.append(item)
+        return {"items": items, "start": start, "count": count, "total": len(entries)}
+
+    def query_data(self, params):
+        url = self.get_account(params["url"])["url"]
+        entries = self.entries.get(url)
+        if not entries:
+            raise RPCError(NOT_FOUND, "%s has no data entries" % url)
+        entry = entries[-1]
+        if params.get("entryHash"):
+            for entry in entries:
+                if entry["entryHash"] == params["entryHash"].lower():
+                    break
+            else:
+                raise RPCError(NOT_FOUND, "entry %s not found" % params["entryHash"])
+        return {
+            "type": ACCUMULATE_TYPES.DATA_ENTRY,
+            "merkleState": {"count": len(entries), "roots": [sha256("root", url)]},
+            "data": {"entryHash": entry["entryHash"], "entry": entry["entry"]},
+        }
+
+    def query_data_set(self, params):
+        url = self.get_account(params["url"])["url"]
+        entries = self.entries.get(url, list())
+        start, count = self.page(params, len(entries))
+        items = [
+            {"type": ACCUMULATE_TYPES.DATASET, **entry}
+            for entry in entries[start : start + count]
+        ]
+        return {"items": items, "start": start, "count": count, "total": len(entries)}
+
+    def query_key_page_index(self, params):
+        account = self.get_account(params["url"])
+        pages = [account] if "keys" in account else list()
+        for url in account.get("pages", ()):
+            pages.append(self.get_account(url))
+        for page in pages:
+            for index, key in enumerate(page["keys"]):
+                if key.get("publicKey") == params["key"]:
+                    return {
+                        "type": ACCUMULATE_TYPES.KEY_PAGE_INDEX,
+                        "data": {
+                            "keyBook": page["keyBook"],
+                            "keyPage": page["url"],
+                            "index": index,
+                        },
+                    }
+        raise RPCError(NOT_FOUND, "key not found")
+
+    # execute methods
+
+    def faucet(self, params):
+        url = to_url(params["url"])
+        if url not in self.accounts:
+            self.add_lite_account(url)
+        self.credit(url, FAUCET_AMOUNT)
+        data = {"to": url, "amount": str(FAUCET_AMOUNT), "token": ACME_URL}
+        txid = self.record_tx(ACCUMULATE_TYPES.ACME_FAUCET, "acc://faucet", data, url)
+        return self.tx_response(txid)
+
+    def execute(self, params):
+        sponsor = self.get_account(params["sponsor"])["url"]
+        if params.get("checkOnly"):
+            # validated but not recorded
+            txid = sha256("check", sponsor, params["payload"])
+            return {"txid": txid, "hash": txid, "message": "", "code": 0}
+        txid = self.record_tx("execute", sponsor, params["payload"])
+        return self.tx_response(txid)
+
+    def create_adi(self, params):
+        url = to_url(params["url"])
+        if url in self.accounts:
+            raise RPCError(INVALID_PARAMS, "%s already exists" % url)
+        book = "%s/%s" % (url, params.get("keyBookName") or "book")
+        page = "%s/%s" % (url, params.get("keyPageName") or "page")
+        self.add_account(
+            url,
+            ACCUMULATE_TYPES.IDENTITY,
+            keyBook=book,
+            managerKeyBook="",
+            keyType="ed25519",
+            keyData=params["publicKey"],
+            nonce=0,
+        )
+        self.add_account(book, "keyBook", keyBook=book, managerKeyBook="", pages=[page])
+        self.add_account(
+            page,
+            ACCUMULATE_TYPES.KEY_PAGE,
+            keyBook=book,
+            managerKeyBook="",
+            creditBalance="0",
+            keys=[{"publicKey": params["publicKey"], "nonce": 0}],
+        )
+        txid = self.record_tx("createIdentity", url, params)
+        return self.tx_response(txid)
+
+    def create_data_account(self, params):
+        url = to_url(params["url"])
+        self.add_account(
+            url,
+            "dataAccount",
+            keyBook=params.get("KeyBookUrl") or "",
+            managerKeyBook=params.get("ManagerKeyBookUrl") or "",
+        )
+        self.entries[url] = list()
+        return self.tx_response(self.record_tx("createDataAccount", url, params))
+
+    def create_key_book(self, params):
+        url = to_url(params["url"])
+        pages = [to_url(page) for page in params["Pages"]]
+        self.add_account(url, "keyBook", keyBook=url, managerKeyBook="", pages=pages)
+        return self.tx_response(self.record_tx("createKeyBook", url, params))
+
+    def create_key_page(self, params):
+        url = to_url(params["url"])
+        keys = [
+            {"publicKey": key.get("PublicKey") or key.get("publicKey"), "nonce": 0}
+            for key in params["Keys"]
+        ]
+        self.add_account(
+            url,
+            ACCUMULATE_TYPES.KEY_PAGE,
+            keyBook="",
+            managerKeyBook="",
+            creditBalance="0",
+            keys=keys,
+        )
+        return self.tx_response(self.record_tx("createKeyPage", url, params))
+
+    def create_token(self, params):
+        url = to_url(params["url"])
+        self.add_account(
+            url,
+            "tokenIssuer",
+            symbol=params["Symbol"],
+            precision=int(params["Precision"]),
+            properties=params.get("Properties"),
+        )
+        return self.tx_response(self.record_tx("createToken", url, params))
+
+    def create_token_account(self, params):
+        url = to_url(params["url"])
+        self.add_account(
+            url,
+            "tokenAccount",
+            keyBook=to_url(params["KeyBookUrl"]),
+            managerKeyBook="",
+            tokenUrl=to_url(params["TokenUrl"]),
+            balance="0",
+            txCount=0,
+            creditBalance="0",
+        )
+        return self.tx_response(self.record_tx("createTokenAccount", url, params))
+
+    def send_tokens(self, params):
+        sponsor = params.get("sponsor") or params.get("url") or "acc://sender"
+        txid = None
+        for recipient in params["To"]:
+            url = to_url(recipient["url"])
+            self.credit(url, recipient["amount"])
+            data = {"to": url, "amount": str(recipient["amount"]), "token": ACME_URL}
+            txid = self.record_tx(
+                ACCUMULATE_TYPES.SYNTHETIC_DEPOSIT_TOKENS, sponsor, data, url
+            )
+        if txid is None:
+            raise RPCError(INVALID_PARAMS, "no recipients")
+        return self.tx_response(txid)
+
+    def add_credits(self, params):
+        account = self.get_account(params["Recipient"])
+        if "creditBalance" in account:
+            balance = int(account["creditBalance"]) + int(params["Amount"])
+            account["creditBalance"] = str(balance)
+        txid = self.record_tx("addCredits", account["url"], params)
+        return self.tx_response(txid)
+
+    def update_key_page(self, params):
+        sponsor = params.get("url") or "acc://keypage"
+        return self.tx_response(self.record_tx("updateKeyPage", sponsor, params))
+
+    def write_data(self, params):
+        entry = params["Entry"]
+        entry = {"data": entry["data"], "extIds": entry.get("extIds")}
+        entryHash = sha256("entry", entry["data"], entry["extIds"])
+        url = params.get("url")
+        if url is not None:
+            url = self.get_account(url)["url"]
+            self.entries.setdefault(url, list()).append(
+                {"entryHash": entryHash, "entry": entry}
+            )
+        txid = self.record_tx("writeData", url or "acc://data", params)
+        response = self.tx_response(txid)
+        response["result"] = {"entryHash": entryHash}
+        return response
+
+
+class LocalTransport(Transport):
+    def __init__(self, node: LocalNode = None) -> None:
+        """
+        Transport answering calls in-process from a LocalNode, applying its
+        injected latency and connection failures
+
+        Args:
+            node: the LocalNode to call, a new empty one by default
+        """
+        self.node = node if node is not None else LocalNode()
+
+    def post(self, url: str, headers=None, data=None):
+        delay = self.node.delay()
+        if delay:
+            time.sleep(delay)
+        if self.node.should_drop():
+            raise ConnectionError("injected connection failure")
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        return Response(200, self.node.handle(data))
+
+
+class AsyncLocalTransport:
+    def __init__(self, node: LocalNode = None) -> None:
+        """
+        asyncio version of LocalTransport, for AsyncAccumulate
+        """
+        self.node = node if node is not None else LocalNode()
+
+    async def post(self, url: str, headers=None, data=None):
+        delay = self.node.delay()
+        if delay:
+            await asyncio.sleep(delay)
+        if self.node.should_drop():
+            raise ConnectionError("injected connection failure")
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        return Response(200, self.node.handle(data))
+
+    async def close(self):
+        pass
+
+
+class LocalNodeServer:
+    def __init__(self, node: LocalNode = None, host: str = "127.0.0.1", port: int = 0):
+        """
+        Serves a LocalNode over HTTP/1.1 with keep-alive, for load tests that
+        should include real sockets. Port 0 picks a free port; the endpoint to
+        pass to Accumulate is in `url`.
+
+        Usage:
+            with LocalNodeServer(LocalNode()) as server:
+                accumulate = Accumulate(server.url)
+        """
+        self.node = node if node is not None else LocalNode()
+        self.server = ThreadingHTTPServer((host, port), self.handler())
+        self.server.daemon_threads = True
+        self.url = "http://%s:%d/v2" % self.server.server_address[:2]
+        self.thread = None
+
+    def handler(self):
+        node = self.node
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # headers and body go out in separate writes; without this every
+            # keep-alive call stalls on delayed ACK
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                data = self.rfile.read(int(self.headers.get("content-length", 0)))
+                delay = node.delay()
+                if delay:
+                    time.sleep(delay)
+                if node.should_drop():
+                    self.close_connection = True
+                    return
+                body = node.handle(data)
+                self.send_response(200)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -1,8 +1,19 @@
-import requests
-import json
+import copy
+import itertools
+import threading
+import time
 
 from .exception import ServerError
 from .constants import ACCUMULATE_METHODS
+from .transport import HttpTransport, DEFAULT_POOL_SIZE
+from .cache import MISSING
+from .codec import get_codec
+from .hooks import CallInfo
+from .endpoints import EndpointPool
+from .limiter import OVERLOAD_STATUSES
+from .fanout import fan_out, fan_out_as_completed, DEFAULT_MAX_WORKERS
+from .pagination import iter_items, DEFAULT_PAGE_SIZE
+from .columnar import export_tx_history, RawPage, ACME_PRECISION
 from .models import (
     QueryResponse,
     QueryMultiResponse,
@@ -12,8 +23,41 @@ from .models import (
 
 JSONRPC_VERSION = "2.0"
 
+# raw modes: return the decoded `result` dict, or the undecoded response bytes
+RAW_RESULT = "result"
+RAW_BYTES = "bytes"
+
 
 class BaseClass:
+    def __init__(
+        self,
+        endpoint=None,
+        transport=None,
+        cache=None,
+        store=None,
+        codec=None,
+        raw=False,
+        hooks=None,
+        endpoints=None,
+        retry=None,
+        coalescer=None,
+        limiter=None,
+    ) -> None:
+        self.endpoint = endpoint
+        self.transport = transport if transport is not None else HttpTransport()
+        self.cache = cache
+        self.store = store
+        if codec is None or isinstance(codec, str):
+            codec = get_codec(codec)
+        self.codec = codec
+        self.raw = RAW_RESULT if raw is True else raw
+        # shared with the sub-clients, so hooks added later apply to all calls
+        self.hooks = hooks if hooks is not None else list()
+        self.endpoints = endpoints
+        self.retry = retry
+        self.coalescer = coalescer
+        self.limiter = limiter
+
     def generate_payload(
         self,
         id,
@@ -31,53 +75,591 @@ class BaseClass:
         return payload
 
     def handle_response(self, res):
-        res_text = json.loads(res.text)
+        return self.get_result(self.load_response(res))
+
+    def load_response(self, res):
+        # decoded straight from the response bytes, skipping charset detection
+        try:
+            return self.codec.loads(res.content)
+        except ValueError:
+            if res.status_code < 400:
+                raise
+            raise self.http_error(res)
+
+    def http_error(self, res):
+        # an HTTP error without a JSON-RPC body, e.g. 429 or 503 from a proxy
+        return ServerError(
+            {
+                "code": res.status_code,
+                "message": res.content[:200].decode("utf-8", "replace"),
+                "status": res.status_code,
+            }
+        )
+
+    def get_result(self, res_text: dict):
         error_obj = res_text.get("error")
         if error_obj:
             error_obj.update({"id": res_text.get("id")})
             raise ServerError(error_obj)
         return res_text.get("result")
 
+    def request(self, id, method: str, params: dict = None, model=None):
+        """
+        Sends one JSON-RPC call to the node and returns its result, built
+        into `model` when one is given.
+        """
+        if self.hooks:
+            return self.traced_request(id, method, params, model)
+        result = self.get_cached(method, params)
+        if result is MISSING:
+            result = self.coalesced_fetch(id, method, params)
+        return self.build_model(result, model)
+
+    def traced_request(self, id, method: str, params: dict = None, model=None):
+        # request() with every stage timed and reported to the hooks
+        call = self.start_call(method, id, params)
+        try:
+            result = self.get_cached(method, params)
+            if result is not MISSING:
+                call.cached = True
+            else:
+                result = self.coalesced_fetch(id, method, params, call)
+                # only the call that went to the node has its stages timed
+                call.coalesced = call.encode_time is None
+            call.lap()
+            value = self.build_model(result, model)
+            call.model_time = call.lap()
+            return value
+        except Exception as e:
+            call.failed(e)
+            raise
+        finally:
+            self.end_call(call)
+
+    def coalesced_fetch(self, id, method: str, params: dict = None, call=None):
+        coalescer = self.coalescer
+        if coalescer is None or not coalescer.applies(method):
+            return self.fetch(id, method, params, call)
+        return coalescer.call(
+            self.fetch, id, method, params, call, raw=self.raw == RAW_BYTES
+        )
+
+    def fetch(self, id, method: str, params: dict = None, call=None):
+        """
+        Encodes, sends and decodes one call, timing each stage into the
+        CallInfo of a traced call
+        """
+        data = self.encode_request(id, method, params)
+        if call is not None:
+            call.encode_time = call.lap()
+            call.request_bytes = len(data)
+        res = self.post(method, data, self.get_headers())
+        if call is not None:
+            call.network_time = call.lap()
+            call.response_bytes = len(res.content)
+        result = self.decode_result(method, params, res)
+        if call is not None:
+            call.decode_time = call.lap()
+        return result
+
+    def post(self, method: str, data: bytes, headers: dict):
+        """
+        Sends an encoded call, with retries and hedging for reads when there
+        is a RetryPolicy
+        """
+        retry = self.retry
+        if retry is None or not retry.applies(method):
+            return self.post_once(method, data, headers)
+        return retry.call(self.post_once, method, data, headers)
+
+    def post_once(self, method: str, data: bytes, headers: dict):
+        """
+        Sends an encoded call once, through the endpoint pool when there is one
+        and within the Limiter's limits when there is one
+        """
+        endpoints = self.endpoints
+        limiter = self.limiter
+        if endpoints is None and limiter is None:
+            return self.transport.post(url=self.endpoint, headers=headers, data=data)
+        endpoint = endpoints.acquire(method) if endpoints is not None else None
+        url = endpoint.url if endpoint is not None else self.endpoint
+        limit = None
+        latency = None
+        status = None
+        try:
+            if limiter is not None:
+                limit = limiter.acquire(url, method)
+            start = time.perf_counter()
+            res = self.transport.post(url=url, headers=headers, data=data)
+            status = res.status_code
+            if status < 500:
+                latency = time.perf_counter() - start
+            return res
+        finally:
+            if limit is not None:
+                limit.release(None if status in OVERLOAD_STATUSES else latency)
+            if endpoint is not None:
+                endpoints.release(endpoint, latency)
+
+    def start_call(self, method: str, id, params: dict = None):
+        call = CallInfo(method, id, params)
+        for hook in self.hooks:
+            hook.before(call)
+        return call
+
+    def end_call(self, call: CallInfo):
+        call.finish()
+        for hook in self.hooks:
+            hook.after(call)
+
+    def get_cached(self, method: str, params: dict = None):
+        result = MISSING
+        if self.raw == RAW_BYTES:
+            return result
+        if self.cache is not None:
+            result = self.cache.get(method, params)
+        if result is MISSING and self.store is not None:
+            result = self.store.get(method, params)
+        return result
+
+    def encode_request(self, id, method: str, params: dict = None):
+        payload = self.generate_payload(id=id, method=method, params=params)
+        return self.codec.dumps(payload)
+
+    def decode_result(self, method: str, params: dict, res):
+        if self.cache is not None:
+            # the write reached the node, so drop its URLs even if it failed
+            self.cache.invalidate_write(method, params)
+        if self.raw == RAW_BYTES:
+            return self.check_raw(res)
+        result = self.handle_response(res)
+        if self.cache is not None:
+            self.cache.set(method, params, result, len(res.content))
+        if self.store is not None:
+            self.store.set(method, params, result)
+        return result
+
+    def check_raw(self, res):
+        # only an HTTP error or a reply with an "error" member needs the full
+        # parse, which raises the same ServerError as handle_response
+        content = res.content
+        if res.status_code >= 400:
+            self.handle_response(res)
+            raise self.http_error(res)
+        if b'"error"' in content:
+            self.get_result(self.codec.loads(content))
+        return content
+
+    def build_model(self, result, model=None):
+        if model is None or self.raw:
+            return result
+        return model(**result)
+
     def get_headers(self):
         return {"content-type": "application/json"}
 
 
 class Accumulate(BaseClass):
-    def __init__(self, endpoint: str) -> None:
+    def __init__(
+        self,
+        endpoint,
+        transport=None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        keep_alive: bool = True,
+        timeout=None,
+        cache=None,
+        store=None,
+        codec=None,
+        raw=False,
+        hooks=None,
+        retry=None,
+        coalescer=None,
+        limiter=None,
+    ) -> None:
         """
         API calls are made to a node endpoint, which is a URL. The base URL follows this format:
         [node-ip] is the IP address for the node you are connecting to.
         [http-port] is the port that the node you are connecting to is listening for HTTP calls.
         All API calls are made to the /v1 endpoint.
 
+        One pooled transport is created here and shared with every sub-client,
+        so all calls reuse warm keep-alive connections to the node.
+
+        Several nodes can be given as a list of URLs or an EndpointPool. Reads
+        then go to the fastest healthy node and failing nodes are ejected
+        until a background `version` probe succeeds; see EndpointPool.
+
         Args:
-            endpoint: the node endpoint URL
+            endpoint: the node endpoint URL, a list of URLs or an EndpointPool
+            transport: optional transport to use instead of a new HttpTransport
+            pool_size: maximum number of pooled connections to the node
+            keep_alive: set to False to close the connection after every call
+            timeout: requests timeout, seconds or (connect, read) tuple
+            cache: optional ResponseCache for read results
+            store: optional ResultStore for final transactions and data entries
+            codec: JSON codec or codec name ("orjson", "ujson", "json"); defaults
+                to the fastest one installed
+            raw: True or "result" to return the decoded result dicts instead of
+                models, "bytes" to return the undecoded response bytes
+            hooks: optional list of Hook objects called around every call,
+                e.g. a MetricsCollector
+            retry: optional RetryPolicy retrying, and optionally hedging, reads
+            coalescer: optional Coalescer sharing one call between identical
+                concurrent reads
+            limiter: optional Limiter keeping calls within per-endpoint rate
+                and adaptive concurrency limits; may be shared between clients
         """
-        self.endpoint = endpoint
-        self.id = 0
-        self.token_class = Token(self.endpoint)
-        self.url_method_class = URL_Methods(self.endpoint)
-        self.keyManagementMethods = KeyManagementMethods(self.endpoint)
-        self.executeMethods = ExecuteMethods(self.endpoint)
-        super().__init__()
+        # shared, not copied, by the clients of as_raw so ids stay unique
+        self.ids = itertools.count(1)
+        self.id_lock = threading.Lock()
+        if transport is None:
+            transport = HttpTransport(
+                pool_maxsize=pool_size, keep_alive=keep_alive, timeout=timeout
+            )
+        hooks = list(hooks) if hooks is not None else list()
+        endpoints = None
+        if isinstance(endpoint, (list, tuple)):
+            endpoint = EndpointPool(endpoint)
+        if isinstance(endpoint, EndpointPool):
+            endpoints = endpoint
+            if endpoints.transport is None:
+                endpoints.transport = self.probe_transport(transport)
+            endpoint = endpoints.endpoints[0].url
+        super().__init__(
+            endpoint,
+            transport,
+            cache,
+            store,
+            codec,
+            raw,
+            hooks,
+            endpoints,
+            retry,
+            coalescer,
+            limiter,
+        )
+        self.token_class = self.sub_client(Token)
+        self.url_method_class = self.sub_client(URL_Methods)
+        self.keyManagementMethods = self.sub_client(KeyManagementMethods)
+        self.executeMethods = self.sub_client(ExecuteMethods)
+
+    def sub_client(self, cls):
+        """
+        Creates a sub-client sharing this client's endpoint, transport, caches,
+        codec, raw mode and hooks
+        """
+        return cls(
+            self.endpoint,
+            self.transport,
+            self.cache,
+            self.store,
+            self.codec,
+            self.raw,
+            self.hooks,
+            self.endpoints,
+            self.retry,
+            self.coalescer,
+            self.limiter,
+        )
+
+    def probe_transport(self, transport):
+        # the pool's prober runs on its own thread and needs a sync transport
+        return transport
+
+    def add_hook(self, hook):
+        """
+        Adds a Hook called around every call of this client and its sub-clients
+        """
+        self.hooks.append(hook)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Closes the pooled connections to the node
+        """
+        if self.endpoints is not None:
+            self.endpoints.close()
+        if self.retry is not None:
+            self.retry.close()
+        self.transport.close()
 
     def __id__(self):
-        self.id += 1
-        return self.id
+        with self.id_lock:
+            return next(self.ids)
+
+    def query_many(
+        self, urls, max_workers: int = DEFAULT_MAX_WORKERS, as_completed: bool = False
+    ):
+        """
+        Runs Query for many URLs on a bounded thread pool. A failed URL does
+        not cancel the others: its exception is returned in place of a result.
+
+        Args:
+            urls: iterable of Accumulate URLs
+            max_workers: maximum number of calls in flight at once
+            as_completed: when True, returns an iterator of (index, result)
+                tuples in completion order instead of a list in input order
+        """
+        args_list = [(url,) for url in urls]
+        if as_completed:
+            return fan_out_as_completed(self.Query, args_list, max_workers)
+        return fan_out(self.Query, args_list, max_workers)
+
+    def query_tx_many(
+        self,
+        txids,
+        wait=None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        as_completed: bool = False,
+    ):
+        """
+        Runs QueryTx for many txids on a bounded thread pool. A failed txid
+        does not cancel the others: its exception is returned in place of a result.
+
+        Args:
+            txids: iterable of transaction ids
+            wait: optional wait passed to every QueryTx
+            max_workers: maximum number of calls in flight at once
+            as_completed: when True, returns an iterator of (index, result)
+                tuples in completion order instead of a list in input order
+        """
+        args_list = [(txid, wait) for txid in txids]
+        if as_completed:
+            return fan_out_as_completed(self.QueryTx, args_list, max_workers)
+        return fan_out(self.QueryTx, args_list, max_workers)
+
+    def batch(self):
+        """
+        Returns a Batch which collects read calls and sends them to the node
+        as a single JSON-RPC batch request.
+
+        Usage:
+            with accumulate.batch() as batch:
+                account = batch.Query(url)
+                tx = batch.QueryTx(txid)
+            account.result()  # QueryResponse
+            tx.result()  # AcmeFaucet, or raises ServerError
+        """
+        from .batch import Batch
+
+        return Batch(self)
+
+    def tx_tracker(self, **kwargs):
+        """
+        Returns a TxTracker waiting for many transactions with batched
+        QueryTx polls; kwargs are passed to TxTracker.
+
+        Usage:
+            with accumulate.tx_tracker() as tracker:
+                futures = tracker.track_many(txids)
+                tracker.wait()
+        """
+        from .tracker import TxTracker
+
+        return TxTracker(self, **kwargs)
+
+    def submitter(self, **kwargs):
+        """
+        Returns a Submitter streaming many transactions to the node with
+        several in flight; kwargs are passed to Submitter.
+
+        Usage:
+            for index, res in accumulate.submitter(window=64).submit(txs):
+                ...
+        """
+        from .submitter import Submitter
+
+        return Submitter(self, **kwargs)
+
+    def history_mirror(self, path: str, urls=(), **kwargs):
+        """
+        Returns a HistoryMirror keeping the histories of `urls` in the SQLite
+        database at `path`; kwargs are passed to HistoryMirror.
+
+        Usage:
+            with accumulate.history_mirror("history.db", urls) as mirror:
+                mirror.sync()
+                mirror.history(url)
+        """
+        from .mirror import HistoryMirror
+
+        return HistoryMirror(self, path, urls, **kwargs)
+
+    def crawler(self, **kwargs):
+        """
+        Returns a Crawler walking the accounts below one or more ADIs with
+        several calls in flight; kwargs are passed to Crawler.
+
+        Usage:
+            for res in accumulate.crawler(max_depth=2).crawl(adis):
+                ...
+        """
+        from .crawler import Crawler
+
+        return Crawler(self, **kwargs)
+
+    def metrics_sampler(self, metrics, **kwargs):
+        """
+        Returns a MetricsSampler polling the (metric, duration) pairs of
+        `metrics` in the background; kwargs are passed to MetricsSampler.
+
+        Usage:
+            with accumulate.metrics_sampler([("tps", "1h")]) as sampler:
+                sampler.series("tps", "1h").mean(60)
+        """
+        from .sampler import MetricsSampler
+
+        return MetricsSampler(self, metrics, **kwargs)
+
+    def data_set_exporter(self, url: str, path: str, **kwargs):
+        """
+        Returns a DataSetExporter streaming every entry of the data account
+        `url` to the file at `path`; kwargs are passed to DataSetExporter.
+
+        Usage:
+            accumulate.data_set_exporter(url, "entries.jsonl", workers=4).run()
+        """
+        from .dataset import DataSetExporter
+
+        return DataSetExporter(self, url, path, **kwargs)
+
+    def export_tx_history(
+        self,
+        url: str,
+        format: str = "auto",
+        page_size: int = DEFAULT_PAGE_SIZE,
+        start: int = 0,
+        precision=ACME_PRECISION,
+    ):
+        """
+        Exports an account's whole history into typed columns for vectorized
+        analysis: index, txid, type, sponsor, recipient, token, amount (scaled
+        by the token's precision), delivered, pending and status code. Pages
+        are decoded straight from the raw results, without building models.
+
+        Usage:
+            txs = accumulate.export_tx_history(url, format="numpy")
+            txs["amount"][txs["type"] == "syntheticDepositTokens"].sum()
+
+        Args:
+            url: account URL
+            format: "numpy" for a NumPy structured array, "arrow" for a pyarrow
+                Table, "columns" for a dict of lists, or "auto" for Arrow when
+                pyarrow is installed and NumPy otherwise
+            page_size: number of transactions requested per page
+            start: index of the first transaction
+            precision: decimal places of the token amounts, or a dict of them
+                by token URL; defaults to ACME's 8
+        """
+        return export_tx_history(self, url, format, page_size, start, precision)
+
+    def as_raw(self, raw=RAW_RESULT):
+        """
+        Returns a client sharing this client's connections and caches whose
+        calls return raw results, for per-call use:
+            accumulate.as_raw().Query(url)  # result dict
+            accumulate.as_raw("bytes").Query(url)  # response bytes
+
+        Args:
+            raw: "result" (or True) for the decoded result dicts, "bytes" for the
+                undecoded response bytes; ServerError is raised in both modes
+        """
+        client = copy.copy(self)
+        client.raw = RAW_RESULT if raw is True else raw
+        client.token_class = client.sub_client(type(self.token_class))
+        client.url_method_class = client.sub_client(type(self.url_method_class))
+        client.keyManagementMethods = client.sub_client(type(self.keyManagementMethods))
+        client.executeMethods = client.sub_client(type(self.executeMethods))
+        return client
+
+    def check_pageable(self):
+        # pages are walked by their item count and total, so the response
+        # bytes must be decoded
+        if self.raw == RAW_BYTES:
+            raise TypeError(
+                "iter_tx_history, iter_directory and iter_data_set need decoded "
+                'pages; use as_raw() instead of as_raw("bytes")'
+            )
+
+    def paginate(self, fetch, page_size: int, start: int):
+        if self.raw:
+            # raw results are walked as RawPage and yield the item dicts
+            self.check_pageable()
+            return iter_items(
+                lambda start, count: RawPage(fetch(start, count)), page_size, start
+            )
+        return iter_items(fetch, page_size, start)
+
+    def iter_tx_history(self, url: str, page_size: int = DEFAULT_PAGE_SIZE, start=0):
+        """
+        Yields every transaction of an account's history, one at a time,
+        fetching QueryTxHistory pages until `total` is reached. The next page
+        is prefetched in the background while the current one is consumed.
+
+        Args:
+            url: Any Accumulate URL
+            page_size: number of transactions requested per page
+            start: index of the first transaction
+        """
+
+        def fetch(start, count):
+            return self.QueryTxHistory(url, count, start)
+
+        return self.paginate(fetch, page_size, start)
+
+    def iter_directory(
+        self, url: str, page_size: int = DEFAULT_PAGE_SIZE, start=0, expandChains=None
+    ):
+        """
+        Yields every QueryDirectory item of an ADI, one at a time, fetching
+        pages in the background until `total` is reached.
+
+        Args:
+            url: ADI URL
+            page_size: number of entries requested per page
+            start: index of the first entry
+            expandChains: passed to every QueryDirectory call
+        """
+
+        def fetch(start, count):
+            return self.QueryDirectory(
+                url, count=count, start=start, expandChains=expandChains
+            )
+
+        return self.paginate(fetch, page_size, start)
+
+    def iter_data_set(
+        self, url: str, page_size: int = DEFAULT_PAGE_SIZE, start=0, queryOptions=None
+    ):
+        """
+        Yields every entry of a data account, one at a time, fetching
+        QueryDataSet pages in the background until `total` is reached.
+
+        Args:
+            url: data account URL
+            page_size: number of entries requested per page
+            start: index of the first entry
+            queryOptions: passed to every QueryDataSet call
+        """
+
+        def fetch(start, count):
+            queryPagination = {"start": start, "count": count}
+            return self.QueryDataSet(url, queryPagination, queryOptions)
+
+        return self.paginate(fetch, page_size, start)
 
     def Version(self):
         """
         returns QueryResponse with VersionResponse
         """
-        method = ACCUMULATE_METHODS.VERSION
-        payload = self.generate_payload(id=self.__id__(), method=method)
-        headers = self.get_headers()
-        res = requests.post(
-            url=self.endpoint, headers=headers, data=json.dumps(payload)
+        return self.request(
+            self.__id__(), ACCUMULATE_METHODS.VERSION, model=QueryResponse
         )
-        result = self.handle_response(res)
-        queryResponse = QueryResponse(**result)
-        return queryResponse
 
     def Query(self, url: str):
         """
@@ -211,7 +793,7 @@ class Accumulate(BaseClass):
                 type: bool
                 optional: true
         """
-        self.url_method_class.QueryDirectory(
+        return self.url_method_class.QueryDirectory(
             self.__id__(), url, count=count, start=start, expandChains=expandChains
         )
 
@@ -225,7 +807,7 @@ class Accumulate(BaseClass):
                         - QueryPagination
                         - QueryOptions
         """
-        self.url_method_class.QueryDataSet(
+        return self.url_method_class.QueryDataSet(
             self.__id__(), url, queryPagination, queryOptions
         )
 
@@ -254,7 +836,7 @@ class Accumulate(BaseClass):
                     - name: Payload
                         type: any
         """
-        self.executeMethods.Execute(
+        return self.executeMethods.Execute(
             self.__id__(),
             sponsor=sponsor,
             signer=signer,
@@ -281,12 +863,12 @@ class Accumulate(BaseClass):
                             type: string
                             optional: true
         """
-        self.executeMethods.ExecuteCreateAdi(
+        return self.executeMethods.ExecuteCreateAdi(
             self.__id__(),
             url,
             publicKey=publicKey,
             keyBookName=keyBookName,
-            KeyPageName=keyPageName,
+            keyPageName=keyPageName,
         )
 
     def ExecuteCreateDataAccount(self, url, keyBookUrl=None, managerKeyBookUrl=None):
@@ -306,7 +888,7 @@ class Accumulate(BaseClass):
                             is-url: true
                             optional: true
         """
-        self.executeMethods.ExecuteCreateDataAccount(
+        return self.executeMethods.ExecuteCreateDataAccount(
             self.__id__(),
             url,
             KeyBookUrl=keyBookUrl,
@@ -327,7 +909,7 @@ class Accumulate(BaseClass):
                                 type: string
                                 is-url: true
         """
-        self.executeMethods.ExecuteCreateKeyBook(self.__id__(), url, Pages)
+        return self.executeMethods.ExecuteCreateKeyBook(self.__id__(), url, Pages)
 
     def ExecuteCreateKeyPage(self, url, Keys):
         """
@@ -344,7 +926,7 @@ class Accumulate(BaseClass):
                                 pointer: true
                                 marshal-as: reference
         """
-        self.executeMethods.ExecuteCreateKeyPage(self.__id__(), url, Keys)
+        return self.executeMethods.ExecuteCreateKeyPage(self.__id__(), url, Keys)
 
     def ExecuteCreateToken(self, url, Symbol, Precision, Properties=None):
         """
@@ -363,7 +945,7 @@ class Accumulate(BaseClass):
                             is-url: true
                             optional: true
         """
-        self.executeMethods.ExecuteCreateToken(
+        return self.executeMethods.ExecuteCreateToken(
             self.__id__(),
             url=url,
             Symbol=Symbol,
@@ -386,7 +968,7 @@ class Accumulate(BaseClass):
                             type: string
                             is-url: true
         """
-        self.executeMethods.ExecuteCreateTokenAccount(
+        return self.executeMethods.ExecuteCreateTokenAccount(
             self.__id__(), url, TokenUrl=TokenUrl, KeyBookUrl=KeyBookUrl
         )
 
@@ -408,7 +990,9 @@ class Accumulate(BaseClass):
                                 marshal-as: reference
                                 pointer: true
         """
-        self.executeMethods.ExecuteSendTokens(self.__id(), To, Hash=Hash, Meta=Meta)
+        return self.executeMethods.ExecuteSendTokens(
+            self.__id__(), To, Hash=Hash, Meta=Meta
+        )
 
     def ExecuteAddCredits(self, Recipient, Amount):
         """
@@ -420,7 +1004,7 @@ class Accumulate(BaseClass):
                         - name: Amount
                             type: uvarint
         """
-        self.executeMethods.ExecuteAddCredits(self.__id__(), Recipient, Amount)
+        return self.executeMethods.ExecuteAddCredits(self.__id__(), Recipient, Amount)
 
     def ExecuteUpdateKeyPage(self, Operation, Key=None, NewKey=None, Owner=None):
         """
@@ -440,7 +1024,7 @@ class Accumulate(BaseClass):
                             type: string
                             optional: true
         """
-        self.executeMethods.ExecuteUpdateKeyPage(
+        return self.executeMethods.ExecuteUpdateKeyPage(
             self.__id__(), Operation, Key=Key, NewKey=NewKey, Owner=Owner
         )
 
@@ -453,7 +1037,7 @@ class Accumulate(BaseClass):
                             type: DataEntry
                             marshal-as: reference
         """
-        self.executeMethods.ExecuteWriteData(self.__id__(), Entry)
+        return self.executeMethods.ExecuteWriteData(self.__id__(), Entry)
 
     def Metrics(self, metric: str, duration):
         """
@@ -462,87 +1046,39 @@ class Accumulate(BaseClass):
             duration,  example = "1h"
         """
         params = {"metric": metric, "duration": duration}
-        method = ACCUMULATE_METHODS.Metrics
-        payload = self.generate_payload(id=self.__id__(), method=method, params=params)
-        headers = self.get_headers()
-        res = requests.post(
-            url=self.endpoint, headers=headers, data=json.dumps(payload)
+        return self.request(
+            self.__id__(), ACCUMULATE_METHODS.Metrics, params, QueryResponse
         )
-        result = self.handle_response(res)
-        queryResponse = QueryResponse(**result)
-        return queryResponse
 
 
 class URL_Methods(BaseClass):
-    def __init__(self, endpoint):
-        self.endpoint = endpoint
-        super().__init__()
-
     def Query(self, id, url: str):
         params = {"url": url}
-        method = ACCUMULATE_METHODS.Query
-        payload = self.generate_payload(id=id, method=method, params=params)
-        headers = self.get_headers()
-        res = requests.post(
-            url=self.endpoint, headers=headers, data=json.dumps(payload)
-        )
-        result = self.handle_response(res)
-        queryResponse = QueryResponse(**result)
-        return queryResponse
+        return self.request(id, ACCUMULATE_METHODS.Query, params, QueryResponse)
 
     def QueryTxHistory(self, id, url: str, count, start=None):
         params = {"url": url, "count": count}
         if start:
             params.update({"start": start})
-        method = ACCUMULATE_METHODS.QueryTxHistory
-        payload = self.generate_payload(id=id, method=method, params=params)
-        headers = self.get_headers()
-        res = requests.post(
-            url=self.endpoint, headers=headers, data=json.dumps(payload)
+        return self.request(
+            id, ACCUMULATE_METHODS.QueryTxHistory, params, QueryMultiResponse
         )
-        result = self.handle_response(res)
-        queryMultiResponse = QueryMultiResponse(**result)
-        return queryMultiResponse
 
     def QueryTx(self, id, txId, wait=None):
         params = {"txid": txId}
         if wait:
             params.update({"wait": wait})
-        method = ACCUMULATE_METHODS.QueryTx
-        payload = self.generate_payload(id=id, method=method, params=params)
-        headers = self.get_headers()
-        res = requests.post(
-            url=self.endpoint, headers=headers, data=json.dumps(payload)
-        )
-        result = self.handle_response(res)
-        acmeFaucet = AcmeFaucet(**result)
-        return acmeFaucet
+        return self.request(id, ACCUMULATE_METHODS.QueryTx, params, AcmeFaucet)
 
     def QueryChain(self, id, chainId):
         params = {"chainId": chainId}
-        method = ACCUMULATE_METHODS.QueryChain
-        payload = self.generate_payload(id=id, method=method, params=params)
-        headers = self.get_headers()
-        res = requests.post(
-            url=self.endpoint, headers=headers, data=json.dumps(payload)
-        )
-        result = self.handle_response(res)
-        queryResponse = QueryResponse(**result)
-        return queryResponse
+        return self.request(id, ACCUMULATE_METHODS.QueryChain, params, QueryResponse)
 
     def QueryData(self, id, url, entryHash=None):
         params = {"url": url}
         if entryHash:
             params.update({"entryHash": entryHash})
-        method = ACCUMULATE_METHODS.QueryData
-        payload = self.generate_payload(id=id, method=method, params=params)
-        headers = self.get_headers()
-        res = requests.post(
-            url=self.endpoint, headers=headers, data=json.dumps(payload)
-        )
-        result = self.handle_response(res)
-        queryResponse = QueryResponse(**result)
-        return queryResponse
+        return self.request(id, ACCUMULATE_METHODS.QueryData, params, QueryResponse)
 
     def QueryDataSet(self, id, url: str, queryPagination, queryOptions):
         params = {"url": url}
@@ -550,15 +1086,9 @@ class URL_Methods(BaseClass):
             params.update({"queryPagination": queryPagination})
         if queryOptions:
             params.update({"queryOptions": queryOptions})
-        method = ACCUMULATE_METHODS.QueryDataSet
-        payload = self.generate_payload(id=id, method=method, params=params)
-        headers = self.get_headers()
-        res = requests.post(
-            url=self.endpoint, headers=headers, data=json.dumps(payload)
+        return self.request(
+            id, ACCUMULATE_METHODS.QueryDataSet, params, QueryMultiResponse
         )
-        result = self.handle_response(res)
-        queryMultiResponse = QueryMultiResponse(**result)
-        return queryMultiResponse
 
     def QueryDirectory(self, id, url: str, count=None, start=None, expandChains=None):
         params = {"url": url}
@@ -568,58 +1098,26 @@ class URL_Methods(BaseClass):
             params.update({"start": start})
         if expandChains:
             params.update({"expandChains": expandChains})
-        method = ACCUMULATE_METHODS.QueryDirectory
-        payload = self.generate_payload(id=id, method=method, params=params)
-        headers = self.get_headers()
-        res = requests.post(
-            url=self.endpoint, headers=headers, data=json.dumps(payload)
+        return self.request(
+            id, ACCUMULATE_METHODS.QueryDirectory, params, QueryMultiResponse
         )
-        result = self.handle_response(res)
-        queryMultiResponse = QueryMultiResponse(**result)
-        return queryMultiResponse
 
 
 class Token(BaseClass):
-    def __init__(self, endpoint):
-        self.endpoint = endpoint
-        super().__init__()
-
     def Faucet(self, id, url: str):
         params = {"url": url}
-        method = ACCUMULATE_METHODS.Faucet
-        payload = self.generate_payload(id=id, method=method, params=params)
-        headers = self.get_headers()
-        res = requests.post(
-            url=self.endpoint, headers=headers, data=json.dumps(payload)
-        )
-        result = self.handle_response(res)
-        txResponse = TxResponse(**result)
-        return txResponse
+        return self.request(id, ACCUMULATE_METHODS.Faucet, params, TxResponse)
 
 
 class KeyManagementMethods(BaseClass):
-    def __init__(self, endpoint):
-        self.endpoint = endpoint
-        super().__init__()
-
-    def QueryKeyPageIndex(id, self, url, key):
+    def QueryKeyPageIndex(self, id, url, key):
         params = {"url": url, "key": key}
-        method = ACCUMULATE_METHODS.QueryKeyPageIndex
-        payload = self.generate_payload(id=id, method=method, params=params)
-        headers = self.get_headers()
-        res = requests.post(
-            url=self.endpoint, headers=headers, data=json.dumps(payload)
+        return self.request(
+            id, ACCUMULATE_METHODS.QueryKeyPageIndex, params, QueryResponse
         )
-        result = self.handle_response(res)
-        queryResponse = QueryResponse(**result)
-        return queryResponse
 
 
 class ExecuteMethods(BaseClass):
-    def __init__(self, endpoint):
-        self.endpoint = endpoint
-        super().__init__()
-
     def Execute(self, id, sponsor, signer, signature, keyPage, payload, checkOnly=None):
         params = {
             "sponsor": sponsor,
@@ -630,15 +1128,7 @@ class ExecuteMethods(BaseClass):
         }
         if checkOnly:
             params.update({"checkOnly": checkOnly})
-        method = ACCUMULATE_METHODS.Execute
-        payload = self.generate_payload(id=id, method=method, params=params)
-        headers = self.get_headers()
-        res = requests.post(
-            url=self.endpoint, headers=headers, data=json.dumps(payload)
-        )
-        result = self.handle_response(res)
-        txResponse = TxResponse(**result)
-        return txResponse
+        return self.request(id, ACCUMULATE_METHODS.Execute, params, TxResponse)
 
     def ExecuteCreateAdi(self, id, url, publicKey, keyBookName=None, keyPageName=None):
         params = {"url": url, "publicKey": publicKey}
@@ -646,14 +1136,7 @@ class ExecuteMethods(BaseClass):
             params.update({"keyBookName": keyBookName})
         if keyPageName:
             params.update({"keyPageName": keyPageName})
-        method = ACCUMULATE_METHODS.ExecuteCreateAdi
-        payload = self.generate_payload(id=id, method=method, params=params)
-        headers = self.get_headers()
-        res = requests.post(
-            url=self.endpoint, headers=headers, data=json.dumps(payload)
-        )
-        result = self.handle_response(res)
-        return result
+        return self.request(id, ACCUMULATE_METHODS.ExecuteCreateAdi, params, TxResponse)
 
     def ExecuteCreateDataAccount(
         self, id, url, KeyBookUrl=None, ManagerKeyBookUrl=None
@@ -663,60 +1146,35 @@ class ExecuteMethods(BaseClass):
             params.update({"KeyBookUrl": KeyBookUrl})
         if ManagerKeyBookUrl:
             params.update({"ManagerKeyBookUrl": ManagerKeyBookUrl})
-        method = ACCUMULATE_METHODS.ExecuteCreateDataAccount
-        payload = self.generate_payload(id=id, method=method, params=params)
-        headers = self.get_headers()
-        res = requests.post(
-            url=self.endpoint, headers=headers, data=json.dumps(payload)
+        return self.request(
+            id, ACCUMULATE_METHODS.ExecuteCreateDataAccount, params, TxResponse
         )
-        result = self.handle_response(res)
-        return result
 
     def ExecuteCreateKeyBook(self, id, url, Pages):
         params = {"url": url, "Pages": Pages}
-        method = ACCUMULATE_METHODS.ExecuteCreateKeyBook
-        payload = self.generate_payload(id=id, method=method, params=params)
-        headers = self.get_headers()
-        res = requests.post(
-            url=self.endpoint, headers=headers, data=json.dumps(payload)
+        return self.request(
+            id, ACCUMULATE_METHODS.ExecuteCreateKeyBook, params, TxResponse
         )
-        result = self.handle_response(res)
-        return result
 
     def ExecuteCreateKeyPage(self, id, url, Keys):
         params = {"url": url, "Keys": Keys}
-        method = ACCUMULATE_METHODS.ExecuteCreateKeyPage
-        payload = self.generate_payload(id=id, method=method, params=params)
-        headers = self.get_headers()
-        res = requests.post(
-            url=self.endpoint, headers=headers, data=json.dumps(payload)
+        return self.request(
+            id, ACCUMULATE_METHODS.ExecuteCreateKeyPage, params, TxResponse
         )
-        result = self.handle_response(res)
-        return result
 
     def ExecuteCreateToken(self, id, url, Symbol, Precision, Properties=None):
         params = {"url": url, "Symbol": Symbol, "Precision": Precision}
         if Properties:
             params.update({"Properties": Properties})
-        method = ACCUMULATE_METHODS.ExecuteCreateToken
-        payload = self.generate_payload(id=id, method=method, params=params)
-        headers = self.get_headers()
-        res = requests.post(
-            url=self.endpoint, headers=headers, data=json.dumps(payload)
+        return self.request(
+            id, ACCUMULATE_METHODS.ExecuteCreateToken, params, TxResponse
         )
-        result = self.handle_response(res)
-        return result
 
     def ExecuteCreateTokenAccount(self, id, url, TokenUrl, KeyBookUrl):
         params = {"url": url, "TokenUrl": TokenUrl, "KeyBookUrl": KeyBookUrl}
-        method = ACCUMULATE_METHODS.ExecuteCreateTokenAccount
-        payload = self.generate_payload(id=id, method=method, params=params)
-        headers = self.get_headers()
-        res = requests.post(
-            url=self.endpoint, headers=headers, data=json.dumps(payload)
+        return self.request(
+            id, ACCUMULATE_METHODS.ExecuteCreateTokenAccount, params, TxResponse
         )
-        result = self.handle_response(res)
-        return result
 
     def ExecuteSendTokens(self, id, To, Hash=None, Meta=None):
         params = {"To": To}
@@ -724,25 +1182,15 @@ class ExecuteMethods(BaseClass):
             params.update({"Hash": Hash})
         if Meta:
             params.update({"Meta": Meta})
-        method = ACCUMULATE_METHODS.ExecuteSendTokens
-        payload = self.generate_payload(id=id, method=method, params=params)
-        headers = self.get_headers()
-        res = requests.post(
-            url=self.endpoint, headers=headers, data=json.dumps(payload)
+        return self.request(
+            id, ACCUMULATE_METHODS.ExecuteSendTokens, params, TxResponse
         )
-        result = self.handle_response(res)
-        return result
 
     def ExecuteAddCredits(self, id, Recipient, Amount):
         params = {"Recipient": Recipient, "Amount": Amount}
-        method = ACCUMULATE_METHODS.ExecuteAddCredits
-        payload = self.generate_payload(id=id, method=method, params=params)
-        headers = self.get_headers()
-        res = requests.post(
-            url=self.endpoint, headers=headers, data=json.dumps(payload)
+        return self.request(
+            id, ACCUMULATE_METHODS.ExecuteAddCredits, params, TxResponse
         )
-        result = self.handle_response(res)
-        return result
 
     def ExecuteUpdateKeyPage(self, id, Operation, Key=None, NewKey=None, Owner=None):
         params = {"Operation": Operation}
@@ -752,22 +1200,10 @@ class ExecuteMethods(BaseClass):
             params.update({"NewKey": NewKey})
         if Owner:
             params.update({"Owner": Owner})
-        method = ACCUMULATE_METHODS.ExecuteUpdateKeyPage
-        payload = self.generate_payload(id=id, method=method, params=params)
-        headers = self.get_headers()
-        res = requests.post(
-            url=self.endpoint, headers=headers, data=json.dumps(payload)
+        return self.request(
+            id, ACCUMULATE_METHODS.ExecuteUpdateKeyPage, params, TxResponse
         )
-        result = self.handle_response(res)
-        return result
 
     def ExecuteWriteData(self, id, Entry):
         params = {"Entry": Entry}
-        method = ACCUMULATE_METHODS.ExecuteWriteData
-        payload = self.generate_payload(id=id, method=method, params=params)
-        headers = self.get_headers()
-        res = requests.post(
-            url=self.endpoint, headers=headers, data=json.dumps(payload)
-        )
-        result = self.handle_response(res)
-        return result
+        return self.request(id, ACCUMULATE_METHODS.ExecuteWriteData, params, TxResponse)
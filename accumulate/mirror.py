@@ -0,0 +1,300 @@
+import json
+import time
+
+from .cache import normalize_url
+from .columnar import RawPage, get_transfer
+from .fanout import fan_out, DEFAULT_MAX_WORKERS
+from .pagination import iter_pages, DEFAULT_PAGE_SIZE
+from .store import ConnectionPool, DEFAULT_BUSY_TIMEOUT
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS accounts (
+        url TEXT PRIMARY KEY,
+        synced INTEGER NOT NULL DEFAULT 0,
+        total INTEGER,
+        updated REAL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS txs (
+        url TEXT NOT NULL,
+        idx INTEGER NOT NULL,
+        txid TEXT NOT NULL,
+        type TEXT,
+        sponsor TEXT,
+        recipient TEXT,
+        token TEXT,
+        amount INTEGER NOT NULL,
+        delta INTEGER NOT NULL,
+        pending INTEGER NOT NULL,
+        code INTEGER NOT NULL,
+        seen REAL NOT NULL,
+        tx TEXT NOT NULL,
+        PRIMARY KEY (url, idx)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS txs_txid ON txs (txid)",
+    "CREATE INDEX IF NOT EXISTS txs_seen ON txs (url, seen)",
+)
+
+
+def account_url(url: str):
+    """
+    Returns the form an account URL is stored under: lowercase, with the
+    acc:// prefix, so that "x/ACME" and "acc://x/acme" are one account
+    """
+    return "acc://" + normalize_url(url)
+
+
+def history_row(url: str, index: int, item: dict, seen: float):
+    """
+    Returns the txs row of one raw QueryTxHistory item of account `url`,
+    given as account_url returns it
+    """
+    recipient, token, amount = get_transfer(item.get("data"))
+    status = item.get("status") or dict()
+    # positive when the account received the amount, negative when it sent it
+    delta = 0
+    if recipient and account_url(recipient) == url:
+        delta = amount
+    elif item.get("sponsor") and account_url(item["sponsor"]) == url:
+        delta = -amount
+    return (
+        url,
+        index,
+        (item.get("txid") or "").lower(),
+        item.get("type"),
+        item.get("sponsor"),
+        recipient,
+        token,
+        amount,
+        delta,
+        int(bool(status.get("pending"))),
+        int(status.get("code") or 0),
+        seen,
+        json.dumps(item),
+    )
+
+
+class HistoryMirror:
+    def __init__(
+        self,
+        client,
+        path: str,
+        urls=(),
+        page_size: int = DEFAULT_PAGE_SIZE,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        busy_timeout: float = DEFAULT_BUSY_TIMEOUT,
+    ) -> None:
+        """
+        Local SQLite copy of the transaction histories of a set of accounts.
+        Each sync fetches only the transactions after the last one stored,
+        plus any stored as pending, and commits every page together with the
+        account's position, so an interrupted sync resumes where it stopped.
+        Accounts sync in parallel on a bounded thread pool.
+
+        History, txid and balance-change queries are then answered from the
+        database. The node reports no time for history items, so the time a
+        transaction was first mirrored (`seen`) stands in for it. Account
+        URLs are matched case-insensitively, with or without acc://.
+
+        Usage:
+            mirror = accumulate.history_mirror("history.db", urls)
+            mirror.sync()  # {url: transactions added}
+            mirror.balance_delta(url, since=time.time() - 86400)
+
+        Args:
+            client: a sync Accumulate client
+            path: path of the SQLite database file
+            urls: accounts to mirror; more can be added with add()
+            page_size: number of transactions requested per page
+            max_workers: maximum number of accounts synced at once
+            busy_timeout: seconds to wait for another process holding the write lock
+        """
+        self.client = client.as_raw()
+        self.path = path
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.busy_timeout = busy_timeout
+        # one connection per account synced at once, plus one for queries
+        self.pool = ConnectionPool(path, SCHEMA, busy_timeout, max_workers + 1)
+        self.add(urls)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, urls):
+        """
+        Adds accounts to the mirror; they are fetched on the next sync
+        """
+        with self.pool.connection() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO accounts (url) VALUES (?)",
+                [(account_url(url),) for url in urls],
+            )
+
+    def urls(self):
+        with self.pool.connection() as conn:
+            rows = conn.execute("SELECT url FROM accounts ORDER BY url").fetchall()
+        return [row[0] for row in rows]
+
+    def sync(self, urls=None):
+        """
+        Syncs every account, or the given ones, in parallel.
+
+        Returns:
+            dict of the number of transactions added per URL, as urls()
+            returns it, or the exception that stopped the account's sync; its
+            pages already committed are kept
+        """
+        if urls is None:
+            urls = self.urls()
+        else:
+            urls = list(dict.fromkeys(account_url(url) for url in urls))
+        self.add(urls)
+        args_list = [(url,) for url in urls]
+        return dict(zip(urls, fan_out(self.sync_account, args_list, self.max_workers)))
+
+    def sync_account(self, url: str):
+        """
+        Fetches the new tail of one account's history, committing every page
+
+        Returns:
+            number of transactions added
+        """
+        with self.pool.connection() as conn:
+            return self.sync_pages(conn, account_url(url))
+
+    def sync_pages(self, conn, url: str):
+        row = conn.execute(
+            "SELECT synced, (SELECT MIN(idx) FROM txs WHERE url = ? AND pending = 1)"
+            " FROM accounts WHERE url = ?",
+            (url, url),
+        ).fetchone()
+        if row is None:
+            conn.execute("INSERT OR IGNORE INTO accounts (url) VALUES (?)", (url,))
+            row = (0, None)
+        synced, pending = row
+        # transactions stored while pending are fetched again
+        start = synced if pending is None else min(synced, pending)
+
+        def fetch(start, count):
+            return RawPage(self.client.QueryTxHistory(url, count, start))
+
+        added = 0
+        for page in iter_pages(fetch, self.page_size, start):
+            seen = time.time()
+            rows = [
+                history_row(url, start + i, item, seen)
+                for i, item in enumerate(page.items)
+            ]
+            page_start = start
+            start += len(rows)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # a row refetched after being pending keeps its first `seen`
+                conn.executemany(
+                    "INSERT INTO txs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT (url, idx) DO UPDATE SET txid = excluded.txid,"
+                    " type = excluded.type, sponsor = excluded.sponsor,"
+                    " recipient = excluded.recipient, token = excluded.token,"
+                    " amount = excluded.amount, delta = excluded.delta,"
+                    " pending = excluded.pending, code = excluded.code,"
+                    " tx = excluded.tx",
+                    rows,
+                )
+                conn.execute(
+                    "UPDATE accounts SET synced = MAX(synced, ?), total = ?,"
+                    " updated = ? WHERE url = ?",
+                    (start, page.total, seen, url),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            added += max(0, start - max(synced, page_start))
+        return added
+
+    def status(self, url: str):
+        """
+        Returns the number of transactions mirrored for an account, the
+        history length the node reported on the last sync and its time
+        """
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT synced, total, updated FROM accounts WHERE url = ?",
+                (account_url(url),),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"synced": row[0], "total": row[1], "updated": row[2]}
+
+    def history(
+        self, url: str, start: int = 0, count: int = None, since=None, until=None
+    ):
+        """
+        Returns the mirrored history of an account as raw QueryTxHistory
+        items, in history order
+
+        Args:
+            url: account URL
+            start: index of the first transaction
+            count: maximum number of transactions
+            since: only transactions first seen at or after this Unix time
+            until: only transactions first seen before this Unix time
+        """
+        query = "SELECT tx FROM txs WHERE url = ? AND idx >= ?"
+        args = [account_url(url), start]
+        if since is not None:
+            query += " AND seen >= ?"
+            args.append(since)
+        if until is not None:
+            query += " AND seen < ?"
+            args.append(until)
+        query += " ORDER BY idx LIMIT ?"
+        args.append(-1 if count is None else count)
+        with self.pool.connection() as conn:
+            rows = conn.execute(query, args).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def get_tx(self, txid: str):
+        """
+        Returns the mirrored QueryTxHistory item of a txid, or None
+        """
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT tx FROM txs WHERE txid = ? LIMIT 1", (txid.lower(),)
+            ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def balance_delta(self, url: str, since=None, until=None, token: str = None):
+        """
+        Returns the net change of an account's balance, in the token's base
+        units, over the mirrored transactions that did not fail
+
+        Args:
+            url: account URL
+            since: only transactions first seen at or after this Unix time
+            until: only transactions first seen before this Unix time
+            token: only transfers of this token URL
+        """
+        query = "SELECT COALESCE(SUM(delta), 0) FROM txs WHERE url = ? AND code = 0"
+        args = [account_url(url)]
+        if since is not None:
+            query += " AND seen >= ?"
+            args.append(since)
+        if until is not None:
+            query += " AND seen < ?"
+            args.append(until)
+        if token is not None:
+            query += " AND token = ?"
+            args.append(token)
+        with self.pool.connection() as conn:
+            return conn.execute(query, args).fetchone()[0]
+
+    def close(self):
+        self.pool.close()
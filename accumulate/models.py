@@ -1,7 +1,25 @@
+from collections.abc import Sequence
+
 from .constants import ACCUMULATE_TYPES
 
+# Models use __slots__ and keep nested objects (merkleState, data, entry, the
+# items of a page) as the decoded dicts until first accessed, so scanning
+# large pages only pays for what is read.
+
 
 class AcmeFaucet:
+    __slots__ = (
+        "type",
+        "data",
+        "sponsor",
+        "keyPage",
+        "txid",
+        "signer",
+        "sig",
+        "status",
+        "syntheticTxids",
+    )
+
     def __init__(
         self, type, data, sponsor, keyPage, txid, signer, sig, status, syntheticTxids
     ):
@@ -17,25 +35,51 @@ class AcmeFaucet:
 
 
 class DataEntry:
+    __slots__ = ("extIds", "data")
+
     def __init__(self, data, extIds=None):
         self.extIds = extIds
         self.data = data
 
 
 class DataEntryQueryResponse:
-    def __init__(self, entryHash, entry):
+    __slots__ = ("type", "entryHash", "_entry")
+
+    def __init__(self, entryHash, entry, type=None):
+        self.type = type
         self.entryHash = entryHash
-        self.entry = DataEntry(**entry)
+        self._entry = entry
+
+    @property
+    def entry(self):
+        entry = self._entry
+        if isinstance(entry, dict):
+            entry = self._entry = DataEntry(**entry)
+        return entry
 
 
 class DirectoryQueryResult:
-    def __init__(self, total, entries=None, expandedEntries=None):
+    __slots__ = ("type", "total", "entries", "expandedEntries")
+
+    def __init__(self, total, entries=None, expandedEntries=None, type=None):
+        self.type = type
         self.total = total
         self.entries = entries
         self.expandedEntries = expandedEntries
 
 
 class LiteTokenAccount:
+    __slots__ = (
+        "type",
+        "url",
+        "keyBook",
+        "managerKeyBook",
+        "tokenUrl",
+        "balance",
+        "txCount",
+        "creditBalance",
+    )
+
     def __init__(
         self,
         type,
@@ -58,6 +102,16 @@ class LiteTokenAccount:
 
 
 class Identity:
+    __slots__ = (
+        "type",
+        "url",
+        "keyBook",
+        "managerKeyBook",
+        "keyType",
+        "keyData",
+        "nonce",
+    )
+
     def __init__(self, type, url, keyBook, managerKeyBook, keyType, keyData, nonce):
         self.type = type
         self.url = url
@@ -69,12 +123,16 @@ class Identity:
 
 
 class MerkleState:
+    __slots__ = ("count", "roots")
+
     def __init__(self, count, roots):
         self.count = count
         self.roots = roots
 
 
 class KeyPage:
+    __slots__ = ("type", "url", "keyBook", "managerKeyBook", "creditBalance", "keys")
+
     def __init__(self, type, url, keyBook, managerKeyBook, creditBalance, keys):
         self.type = type
         self.url = url
@@ -85,49 +143,78 @@ class KeyPage:
 
 
 class MetricsResponse:
+    __slots__ = ("value",)
+
     def __init__(self, value):
         self.value = value
 
 
 class QueryResponse:
+    __slots__ = ("type", "_data", "_merkleState")
+
     def __init__(self, type, data, merkleState=None):
         self.type = type
-        if merkleState:
-            self.merkleState = MerkleState(**merkleState)
-
-        if type == ACCUMULATE_TYPES.VERSION:
-            self.version = VersionResponse(**data)
-        elif self.type == ACCUMULATE_TYPES.IDENTITY:
-            self.identity = Identity(**data)
-        elif self.type == ACCUMULATE_TYPES.LITE_TOKEN_ACCOUNT:
-            self.liteTokenAccount = LiteTokenAccount(**data)
-        elif self.type == ACCUMULATE_TYPES.KEY_PAGE:
-            self.keyPage = KeyPage(**data)
-        elif self.type == ACCUMULATE_TYPES.DATA_ENTRY:
-            self.dataEntryQueryResponse = DataEntryQueryResponse(**data)
-        elif self.type == ACCUMULATE_TYPES.KEY_PAGE_INDEX:
-            self.keyPageIndex = ResponseKeyPageIndex(**data)
-        elif self.type == ACCUMULATE_TYPES.METRICS:
-            self.metricResponse = MetricsResponse(**data)
+        self._data = data
+        self._merkleState = merkleState
+
+    @property
+    def merkleState(self):
+        merkleState = self._merkleState
+        if not merkleState:
+            raise AttributeError("merkleState")
+        if isinstance(merkleState, dict):
+            merkleState = self._merkleState = MerkleState(**merkleState)
+        return merkleState
+
+    def __getattr__(self, name):
+        # only reached for the type-specific attribute, e.g. identity or keyPage
+        if name.startswith("_") or name == "type":
+            raise AttributeError(name)
+        dispatch = QUERY_RESPONSE_TYPES.get(self.type)
+        if dispatch is None or dispatch[0] != name:
+            raise AttributeError(name)
+        data = self._data
+        if isinstance(data, dict):
+            data = self._data = dispatch[1](**data)
+        return data
+
+
+class QueryItems(Sequence):
+    __slots__ = ("_items", "received")
+
+    def __init__(self, items):
+        # decoded dicts, each replaced by its model on first access; items of
+        # other types are left out, but still count towards the page offset
+        self.received = len(items)
+        self._items = [
+            item for item in items if item.get("type") in MULTI_RESPONSE_TYPES
+        ]
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self._items)))]
+        item = self._items[index]
+        if isinstance(item, dict):
+            item = self._items[index] = MULTI_RESPONSE_TYPES[item["type"]](**item)
+        return item
 
 
 class QueryMultiResponse:
+    __slots__ = ("start", "count", "total", "items")
+
     def __init__(self, items, start, count, total):
         self.start = start
         self.count = count
         self.total = total
-        self.items = list()
-        for item in items:
-            type = item.get("type")
-            if type == ACCUMULATE_TYPES.SYNTHETIC_DEPOSIT_TOKENS:
-                self.items.append(SyntheticDepositTokens(**item))
-            elif type == ACCUMULATE_TYPES.DIRECTORY:
-                self.items.append(DirectoryQueryResult(**item))
-            elif type == ACCUMULATE_TYPES.DATASET:
-                self.items.append(DataEntryQueryResponse(**item))
+        self.items = QueryItems(items)
 
 
 class ResponseKeyPageIndex:
+    __slots__ = ("keyBook", "keyPage", "index")
+
     def __init__(self, keyBook, keyPage, index=None):
         self.keyBook = keyBook
         self.keyPage = keyPage
@@ -135,6 +222,17 @@ class ResponseKeyPageIndex:
 
 
 class SyntheticDepositTokens:
+    __slots__ = (
+        "type",
+        "data",
+        "sponsor",
+        "keyPage",
+        "txid",
+        "signer",
+        "sig",
+        "status",
+    )
+
     def __init__(self, type, data, sponsor, keyPage, txid, signer, sig, status):
         self.type = type
         self.data = data
@@ -147,16 +245,51 @@ class SyntheticDepositTokens:
 
 
 class TxResponse:
-    def __init__(self, hash, message, txid, code=None, delivered=None):
+    __slots__ = ("hash", "message", "txid", "code", "delivered", "result")
+
+    def __init__(
+        self,
+        hash=None,
+        message=None,
+        txid=None,
+        code=None,
+        delivered=None,
+        result=None,
+        **kwargs
+    ):
+        # fields the node adds or omits, e.g. codespace or an empty message,
+        # must not break every Execute call
         self.hash = hash
         self.message = message
         self.txid = txid
         self.code = code
         self.delivered = delivered
+        self.result = result
 
 
 class VersionResponse:
+    __slots__ = ("commit", "version", "versionIsknown")
+
     def __init__(self, commit, version, versionIsKnown):
         self.commit = commit
         self.version = version
         self.versionIsknown = versionIsKnown
+
+
+# QueryResponse.type -> (attribute name, model of data)
+QUERY_RESPONSE_TYPES = {
+    ACCUMULATE_TYPES.VERSION: ("version", VersionResponse),
+    ACCUMULATE_TYPES.IDENTITY: ("identity", Identity),
+    ACCUMULATE_TYPES.LITE_TOKEN_ACCOUNT: ("liteTokenAccount", LiteTokenAccount),
+    ACCUMULATE_TYPES.KEY_PAGE: ("keyPage", KeyPage),
+    ACCUMULATE_TYPES.DATA_ENTRY: ("dataEntryQueryResponse", DataEntryQueryResponse),
+    ACCUMULATE_TYPES.KEY_PAGE_INDEX: ("keyPageIndex", ResponseKeyPageIndex),
+    ACCUMULATE_TYPES.METRICS: ("metricResponse", MetricsResponse),
+}
+
+# QueryMultiResponse item type -> model of the item
+MULTI_RESPONSE_TYPES = {
+    ACCUMULATE_TYPES.SYNTHETIC_DEPOSIT_TOKENS: SyntheticDepositTokens,
+    ACCUMULATE_TYPES.DIRECTORY: DirectoryQueryResult,
+    ACCUMULATE_TYPES.DATASET: DataEntryQueryResponse,
+}
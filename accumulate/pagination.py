@@ -0,0 +1,81 @@
+DEFAULT_PAGE_SIZE = 100
+
+
+def next_start(page, start: int, page_size: int):
+    """
+    Returns the start of the page after `page`, or None when it was the last one
+    """
+    # the number of items the node returned, including those QueryItems
+    # leaves out, so that pages neither overlap nor end early
+    received = getattr(page.items, "received", None)
+    if received is None:
+        received = len(page.items)
+    if not received:
+        return None
+    start += received
+    if page.total is not None:
+        return start if start < page.total else None
+    return start if received >= page_size else None
+
+
+def iter_pages(fetch, page_size: int = DEFAULT_PAGE_SIZE, start: int = 0):
+    """
+    Walks all pages of a paginated query. While the caller handles a page, the
+    next one is fetched on a background thread, so at most two pages are held
+    in memory.
+
+    Args:
+        fetch: callable(start, count) returning a QueryMultiResponse
+        page_size: number of items requested per page
+        start: index of the first item
+
+    Yields:
+        QueryMultiResponse pages
+    """
+    # imported here to keep `import accumulate` fast
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(fetch, start, page_size)
+        while future is not None:
+            page = future.result()
+            start = next_start(page, start, page_size)
+            future = None
+            if start is not None:
+                future = executor.submit(fetch, start, page_size)
+            yield page
+
+
+def iter_items(fetch, page_size: int = DEFAULT_PAGE_SIZE, start: int = 0):
+    """
+    Same as iter_pages, yielding the items of every page one at a time
+    """
+    for page in iter_pages(fetch, page_size, start):
+        yield from page.items
+
+
+async def aiter_pages(fetch, page_size: int = DEFAULT_PAGE_SIZE, start: int = 0):
+    """
+    asyncio version of iter_pages; fetch(start, count) returns an awaitable and
+    the next page is fetched in a task while the caller handles the current one
+    """
+    import asyncio
+
+    task = asyncio.ensure_future(fetch(start, page_size))
+    try:
+        while task is not None:
+            page = await task
+            start = next_start(page, start, page_size)
+            task = None
+            if start is not None:
+                task = asyncio.ensure_future(fetch(start, page_size))
+            yield page
+    finally:
+        if task is not None:
+            task.cancel()
+
+
+async def aiter_items(fetch, page_size: int = DEFAULT_PAGE_SIZE, start: int = 0):
+    async for page in aiter_pages(fetch, page_size, start):
+        for item in page.items:
+            yield item
@@ -0,0 +1,313 @@
+import json
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .cache import WRITE_METHODS
+from .constants import ACCUMULATE_METHODS
+from .hooks import BATCH_METHOD
+
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BACKOFF = 0.05
+DEFAULT_MAX_BACKOFF = 2.0
+DEFAULT_HEDGE_PERCENTILE = 0.95
+# used until a method has MIN_SAMPLES latencies to take the percentile of
+DEFAULT_HEDGE_DELAY = 0.1
+DEFAULT_MIN_HEDGE_DELAY = 0.005
+DEFAULT_WINDOW = 256
+DEFAULT_HEDGE_WORKERS = 32
+MIN_SAMPLES = 20
+
+# idempotent methods; write calls are never retried or hedged
+READ_METHODS = frozenset(
+    [
+        method
+        for name, method in vars(ACCUMULATE_METHODS).items()
+        if not name.startswith("_") and method not in WRITE_METHODS
+    ]
+    + [BATCH_METHOD]
+)
+# JSON-RPC "Internal error"
+RETRY_CODES = (-32603,)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class LatencyWindow:
+    def __init__(self, size: int = DEFAULT_WINDOW) -> None:
+        """
+        Last `size` latencies of one method, for percentile queries
+        """
+        self.samples = deque(maxlen=size)
+        self.sorted = None
+
+    def add(self, latency: float):
+        self.samples.append(latency)
+        self.sorted = None
+
+    def percentile(self, fraction: float):
+        if self.sorted is None:
+            self.sorted = sorted(self.samples)
+        index = min(len(self.sorted) - 1, int(len(self.sorted) * fraction))
+        return self.sorted[index]
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        backoff: float = DEFAULT_BACKOFF,
+        max_backoff: float = DEFAULT_MAX_BACKOFF,
+        hedge: bool = False,
+        hedge_percentile: float = DEFAULT_HEDGE_PERCENTILE,
+        hedge_delay: float = DEFAULT_HEDGE_DELAY,
+        min_hedge_delay: float = DEFAULT_MIN_HEDGE_DELAY,
+        retry_codes=RETRY_CODES,
+        retry_statuses=RETRY_STATUSES,
+        retry_exceptions=(OSError,),
+        methods=READ_METHODS,
+        hedge_workers: int = DEFAULT_HEDGE_WORKERS,
+    ) -> None:
+        """
+        Retry and hedging for idempotent reads. A read failing with a
+        retryable error is retried after a jittered exponential backoff.
+        With hedge=True, a read with no reply after the method's observed
+        `hedge_percentile` latency is sent a second time, to another
+        endpoint when there is an EndpointPool, and the first reply wins.
+        Methods outside `methods`, which never include writes, are sent once.
+
+        Usage:
+            accumulate = Accumulate(endpoint, retry=RetryPolicy(hedge=True))
+
+        Args:
+            max_attempts: attempts per call, including the first
+            backoff: base delay in seconds, doubled after every attempt; the
+                actual delay is drawn uniformly between 0 and that
+            max_backoff: upper bound of the backoff delay
+            hedge: send a second copy of slow reads
+            hedge_percentile: latency percentile after which to hedge
+            hedge_delay: delay used before a method has enough samples
+            min_hedge_delay: lower bound of the hedge delay
+            retry_codes: JSON-RPC error codes that are retried
+            retry_statuses: HTTP statuses that are retried
+            retry_exceptions: transport exceptions that are retried; OSError
+                covers requests' ConnectionError and Timeout
+            methods: methods the policy applies to
+            hedge_workers: threads sending hedged calls of sync clients
+        """
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.initial_hedge_delay = hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.retry_codes = frozenset(retry_codes)
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retry_exceptions = tuple(retry_exceptions)
+        self.methods = frozenset(methods) - WRITE_METHODS
+        self.hedge_workers = hedge_workers
+        self.executor = None
+        self.latencies = dict()
+        self.lock = threading.Lock()
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def applies(self, method: str):
+        return method in self.methods
+
+    def backoff_delay(self, attempt: int):
+        # "full jitter": spreads the retries of many clients over the window
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+    def hedge_delay(self, method: str):
+        with self.lock:
+            window = self.latencies.get(method)
+            if window is None or len(window.samples) < MIN_SAMPLES:
+                return self.initial_hedge_delay
+            delay = window.percentile(self.hedge_percentile)
+        return max(self.min_hedge_delay, delay)
+
+    def observe(self, method: str, latency: float):
+        with self.lock:
+            window = self.latencies.get(method)
+            if window is None:
+                window = self.latencies[method] = LatencyWindow()
+            window.add(latency)
+
+    def count(self, counter: str):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def is_retryable_error(self, error: Exception):
+        return isinstance(error, self.retry_exceptions)
+
+    def is_retryable_response(self, res):
+        if res.status_code in self.retry_statuses:
+            return True
+        if not self.retry_codes or b'"error"' not in res.content:
+            return False
+        try:
+            error = json.loads(res.content).get("error")
+        except (ValueError, AttributeError):
+            # not JSON, or a batch reply; failed calls are in the items
+            return False
+        return isinstance(error, dict) and error.get("code") in self.retry_codes
+
+    def call(self, send, method: str, data: bytes, headers: dict):
+        """
+        Sends a call with send(method, data, headers), retrying and hedging
+        as configured, and returns the response
+        """
+        attempt = 0
+        while True:
+            try:
+                if self.hedge:
+                    res = self.hedged(send, method, data, headers)
+                else:
+                    res = self.timed(send, method, data, headers)
+                if not self.is_retryable_response(res):
+                    return res
+                error = None
+            except Exception as e:
+                if not self.is_retryable_error(e):
+                    raise
+                error = e
+            attempt += 1
+            if attempt >= self.max_attempts:
+                if error is not None:
+                    raise error
+                # surfaces as ServerError when decoded
+                return res
+            self.count("retries")
+            time.sleep(self.backoff_delay(attempt))
+
+    def timed(self, send, method: str, data: bytes, headers: dict):
+        start = time.perf_counter()
+        res = send(method, data, headers)
+        self.observe(method, time.perf_counter() - start)
+        return res
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=self.hedge_workers,
+                    thread_name_prefix="accumulate-hedge",
+                )
+            return self.executor
+
+    def hedged(self, send, method: str, data: bytes, headers: dict):
+        executor = self.get_executor()
+        start = time.perf_counter()
+        first = executor.submit(send, method, data, headers)
+        done, pending = wait([first], timeout=self.hedge_delay(method))
+        if not done:
+            self.count("hedges")
+            second = executor.submit(send, method, data, headers)
+            pending = {first, second}
+        error = None
+        while True:
+            for future in done:
+                try:
+                    res = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if pending and self.is_retryable_response(res):
+                    continue
+                self.observe(method, time.perf_counter() - start)
+                if future is not first:
+                    self.count("hedge_wins")
+                # the slower copy finishes in the background and is dropped
+                return res
+            if not pending:
+                raise error
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+    async def acall(self, send, method: str, data: bytes, headers: dict):
+        """
+        asyncio version of call(), where send is a coroutine function
+        """
+        import asyncio
+
+        attempt = 0
+        while True:
+            try:
+                if self.hedge:
+                    res = await self.ahedged(send, method, data, headers)
+                else:
+                    start = time.perf_counter()
+                    res = await send(method, data, headers)
+                    self.observe(method, time.perf_counter() - start)
+                if not self.is_retryable_response(res):
+                    return res
+                error = None
+            except Exception as e:
+                if not self.is_retryable_error(e):
+                    raise
+                error = e
+            attempt += 1
+            if attempt >= self.max_attempts:
+                if error is not None:
+                    raise error
+                return res
+            self.count("retries")
+            await asyncio.sleep(self.backoff_delay(attempt))
+
+    async def ahedged(self, send, method: str, data: bytes, headers: dict):
+        import asyncio
+
+        start = time.perf_counter()
+        first = asyncio.ensure_future(send(method, data, headers))
+        done, pending = await asyncio.wait([first], timeout=self.hedge_delay(method))
+        if not done:
+            self.count("hedges")
+            second = asyncio.ensure_future(send(method, data, headers))
+            pending = {first, second}
+        error = None
+        try:
+            while True:
+                for task in done:
+                    try:
+                        res = task.result()
+                    except Exception as e:
+                        error = e
+                        continue
+                    if pending and self.is_retryable_response(res):
+                        continue
+                    self.observe(method, time.perf_counter() - start)
+                    if task is not first:
+                        self.count("hedge_wins")
+                    return res
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self):
+        """
+        Returns the number of retries, hedged calls and hedges that won
+        """
+        with self.lock:
+            return {
+                "retries": self.retries,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+            }
+
+    def close(self):
+        """
+        Shuts down the hedging threads
+        """
+        with self.lock:
+            executor = self.executor
+            self.executor = None
+        if executor is not None:
+            executor.shutdown(wait=False)
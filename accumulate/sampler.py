@@ -0,0 +1,337 @@
+import math
+import threading
+import time
+from array import array
+
+DEFAULT_INTERVAL = 1.0
+# (seconds per bucket, number of buckets): an hour of seconds, a day of
+# minutes and 30 days of hours
+DEFAULT_TIERS = ((1, 3600), (60, 1440), (3600, 720))
+INF = float("inf")
+
+
+class Tier:
+    __slots__ = ("step", "capacity", "counts", "sums", "mins", "maxs", "last")
+
+    def __init__(self, step: float, capacity: int) -> None:
+        """
+        Ring of `capacity` buckets of `step` seconds each. Bucket n covers
+        [n * step, (n + 1) * step) and lives in slot n % capacity; the
+        arrays are allocated once, and an empty bucket holds a count of 0,
+        a min of +inf and a max of -inf so whole slices can be reduced
+        without checking every slot.
+        """
+        self.step = step
+        self.capacity = capacity
+        self.counts = array("d", bytes(8 * capacity))
+        self.sums = array("d", bytes(8 * capacity))
+        self.mins = array("d", [INF]) * capacity
+        self.maxs = array("d", [-INF]) * capacity
+        # number of the newest bucket
+        self.last = None
+
+    def clear(self, first: int, last: int):
+        # empties the slots of buckets first..last
+        if last - first + 1 >= self.capacity:
+            first, last = 0, self.capacity - 1
+        else:
+            first, last = first % self.capacity, last % self.capacity
+        for start, stop in self.slots(first, last):
+            size = stop - start
+            self.counts[start:stop] = array("d", bytes(8 * size))
+            self.sums[start:stop] = array("d", bytes(8 * size))
+            self.mins[start:stop] = array("d", [INF]) * size
+            self.maxs[start:stop] = array("d", [-INF]) * size
+
+    def slots(self, first: int, last: int):
+        # (start, stop) slices covering slots first..last, wrapping around
+        if first <= last:
+            return ((first, last + 1),)
+        return ((first, self.capacity), (0, last + 1))
+
+    def add(self, t: float, value: float):
+        bucket = int(t // self.step)
+        if self.last is None or bucket > self.last:
+            first = bucket if self.last is None else self.last + 1
+            self.clear(first, bucket)
+            self.last = bucket
+        elif bucket <= self.last - self.capacity:
+            # older than anything the ring still holds
+            return
+        slot = bucket % self.capacity
+        self.counts[slot] += 1
+        self.sums[slot] += value
+        if value < self.mins[slot]:
+            self.mins[slot] = value
+        if value > self.maxs[slot]:
+            self.maxs[slot] = value
+
+    def span(self):
+        return self.step * self.capacity
+
+    def window(self, start: float, end: float):
+        """
+        Returns the slices of the slots whose buckets start in [start, end)
+        """
+        if self.last is None:
+            return ()
+        first = max(int(math.ceil(start / self.step)), self.last - self.capacity + 1)
+        last = min(int(math.ceil(end / self.step)) - 1, self.last)
+        if first > last:
+            return ()
+        return self.slots(first % self.capacity, last % self.capacity)
+
+
+class Series:
+    def __init__(self, tiers=DEFAULT_TIERS) -> None:
+        """
+        Samples of one value kept at several resolutions. Every sample is
+        added to the current bucket of each tier, so the coarser tiers are
+        rollups of the finer ones that outlive them. A query reads the
+        finest tier whose span covers its window.
+
+        min, max, count and mean are exact at every resolution. Percentiles
+        are taken over the buckets' means, which are the samples themselves
+        while a bucket is no longer than the sampling interval.
+
+        Args:
+            tiers: (seconds per bucket, number of buckets) pairs, finest first
+        """
+        self.tiers = [Tier(step, capacity) for step, capacity in tiers]
+        self.lock = threading.Lock()
+        self.latest = None
+        self.latest_time = None
+
+    def add(self, value: float, t: float = None):
+        """
+        Adds a sample taken at Unix time `t`, by default now
+        """
+        if t is None:
+            t = time.time()
+        value = float(value)
+        with self.lock:
+            for tier in self.tiers:
+                tier.add(t, value)
+            if self.latest_time is None or t >= self.latest_time:
+                self.latest = value
+                self.latest_time = t
+
+    def tier(self, window: float):
+        for tier in self.tiers:
+            if tier.span() >= window:
+                return tier
+        return self.tiers[-1]
+
+    def slices(self, window: float, end: float = None):
+        # caller holds self.lock
+        if end is None:
+            end = time.time()
+        tier = self.tier(window)
+        # the bucket holding `end` is included
+        end = (math.floor(end / tier.step) + 1) * tier.step
+        return tier, tier.window(end - window, end)
+
+    def count(self, window: float, end: float = None):
+        with self.lock:
+            tier, slices = self.slices(window, end)
+            return int(sum(math.fsum(tier.counts[a:b]) for a, b in slices))
+
+    def min(self, window: float, end: float = None):
+        """
+        Returns the lowest sample of the `window` seconds up to `end`, by
+        default now, or None without samples
+        """
+        with self.lock:
+            tier, slices = self.slices(window, end)
+            value = min((min(tier.mins[a:b]) for a, b in slices), default=INF)
+        return None if value == INF else value
+
+    def max(self, window: float, end: float = None):
+        with self.lock:
+            tier, slices = self.slices(window, end)
+            value = max((max(tier.maxs[a:b]) for a, b in slices), default=-INF)
+        return None if value == -INF else value
+
+    def mean(self, window: float, end: float = None):
+        with self.lock:
+            tier, slices = self.slices(window, end)
+            count = sum(math.fsum(tier.counts[a:b]) for a, b in slices)
+            total = sum(math.fsum(tier.sums[a:b]) for a, b in slices)
+        return total / count if count else None
+
+    def values(self, window: float, end: float = None):
+        """
+        Returns the bucket means of the window, sorted
+        """
+        with self.lock:
+            tier, slices = self.slices(window, end)
+            values = list()
+            for a, b in slices:
+                values.extend(
+                    s / c for s, c in zip(tier.sums[a:b], tier.counts[a:b]) if c
+                )
+        values.sort()
+        return values
+
+    def percentile(self, q: float, window: float, end: float = None):
+        """
+        Returns the q-th percentile, 0 <= q <= 100, of the window,
+        interpolating between the closest ranks, or None without samples
+        """
+        return percentile(self.values(window, end), q)
+
+    def summary(self, window: float, end: float = None):
+        """
+        Returns the count, min, max, mean and 50th, 90th and 99th
+        percentiles of the window as a dict
+        """
+        if end is None:
+            end = time.time()
+        values = self.values(window, end)
+        return {
+            "count": self.count(window, end),
+            "min": self.min(window, end),
+            "max": self.max(window, end),
+            "mean": self.mean(window, end),
+            "p50": percentile(values, 50),
+            "p90": percentile(values, 90),
+            "p99": percentile(values, 99),
+        }
+
+
+def percentile(values: list, q: float):
+    """
+    Returns the q-th percentile of sorted values, or None if there are none
+    """
+    if not values:
+        return None
+    rank = (len(values) - 1) * q / 100.0
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+class MetricsSampler:
+    def __init__(
+        self,
+        client,
+        metrics,
+        interval: float = DEFAULT_INTERVAL,
+        tiers=DEFAULT_TIERS,
+    ) -> None:
+        """
+        Polls node metrics at a fixed interval and keeps their values in
+        Series. Every round sends all (metric, duration) pairs as one
+        JSON-RPC batch over the client's connection, on a background thread
+        or through explicit poll() calls. Rounds are scheduled on a fixed
+        grid; rounds missed while a poll was slow are skipped, not bunched.
+
+        Usage:
+            with accumulate.metrics_sampler([("tps", "1h")]) as sampler:
+                ...
+                sampler.series("tps", "1h").summary(300)
+
+        Args:
+            client: a sync Accumulate client
+            metrics: (metric, duration) pairs, e.g. [("tps", "1h")]
+            interval: seconds between two rounds
+            tiers: resolutions of each Series; see Series
+        """
+        self.client = client.as_raw()
+        self.interval = interval
+        self.pairs = [tuple(pair) for pair in metrics]
+        self.series_by_pair = {pair: Series(tiers) for pair in self.pairs}
+        self.errors = {pair: 0 for pair in self.pairs}
+        self.last_error = None
+        self.polls = 0
+        self.condition = threading.Condition()
+        self.thread = None
+        self.stopped = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def series(self, metric: str, duration):
+        return self.series_by_pair[(metric, duration)]
+
+    def poll(self):
+        """
+        Runs one round, adding a sample to every Series whose metric the
+        node returned
+        """
+        batch = self.client.batch()
+        items = [batch.Metrics(metric, duration) for metric, duration in self.pairs]
+        try:
+            batch.send()
+        except Exception as e:
+            # the node could not be reached; the round is lost
+            self.last_error = e
+            for pair in self.pairs:
+                self.errors[pair] += 1
+            return
+        t = time.time()
+        self.polls += 1
+        for pair, item in zip(self.pairs, items):
+            try:
+                value = item.result()["data"]["value"]
+                self.series_by_pair[pair].add(value, t)
+            except Exception as e:
+                self.last_error = e
+                self.errors[pair] += 1
+
+    def start(self):
+        """
+        Starts polling on a background thread
+        """
+        with self.condition:
+            if self.thread is not None:
+                return
+            self.stopped = False
+            self.thread = threading.Thread(
+                target=self.run, name="accumulate-metrics-sampler", daemon=True
+            )
+        self.thread.start()
+
+    def run(self):
+        next_poll = time.monotonic()
+        while True:
+            with self.condition:
+                if self.stopped:
+                    return
+            self.poll()
+            now = time.monotonic()
+            next_poll += self.interval
+            if next_poll < now:
+                next_poll += (now - next_poll) // self.interval * self.interval
+                next_poll += self.interval
+            with self.condition:
+                if not self.stopped:
+                    self.condition.wait(next_poll - now)
+
+    def stats(self):
+        """
+        Returns the number of rounds sent and of failed samples per pair
+        """
+        return {
+            "polls": self.polls,
+            "errors": {
+                "%s/%s" % (metric, duration): count
+                for (metric, duration), count in self.errors.items()
+            },
+        }
+
+    def close(self):
+        """
+        Stops the background thread; the Series stay readable
+        """
+        with self.condition:
+            self.stopped = True
+            thread = self.thread
+            self.thread = None
+            self.condition.notify_all()
+        if thread is not None:
+            thread.join()
@@ -0,0 +1,189 @@
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from .cache import MISSING, normalize_url
+from .constants import ACCUMULATE_METHODS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (kind, key)
+)
+"""
+
+# seconds a process waits for another process holding the write lock
+DEFAULT_BUSY_TIMEOUT = 30
+# connections kept open between uses, as many as the default fan-out workers
+DEFAULT_MAX_IDLE = 10
+
+
+def is_final(result: dict):
+    """
+    A transaction result is final once its status reports it delivered and
+    no longer pending; anything else may still change.
+    """
+    status = result.get("status") if result else None
+    if not isinstance(status, dict):
+        return False
+    return bool(status.get("delivered")) and not status.get("pending")
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        path: str,
+        schema=(),
+        busy_timeout: float = DEFAULT_BUSY_TIMEOUT,
+        max_idle: int = DEFAULT_MAX_IDLE,
+    ) -> None:
+        """
+        SQLite connections in WAL mode shared by all threads. A connection is
+        checked out for one operation and handed back afterwards, so the
+        number open follows the number of concurrent operations rather than
+        the number of threads that ever used the pool; at most `max_idle`
+        stay open between uses.
+
+        Args:
+            path: path of the SQLite database file
+            schema: statements run on every new connection
+            busy_timeout: seconds to wait for another process holding the write lock
+            max_idle: maximum number of connections kept open while unused
+        """
+        self.path = path
+        self.schema = tuple(schema)
+        self.busy_timeout = busy_timeout
+        self.max_idle = max_idle
+        self.idle = list()
+        self.lock = threading.Lock()
+
+    def open(self):
+        # check_same_thread is off as a connection moves between threads,
+        # though only one uses it at a time
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in self.schema:
+            conn.execute(statement)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        with self.lock:
+            conn = self.idle.pop() if self.idle else None
+        if conn is None:
+            conn = self.open()
+        try:
+            yield conn
+        finally:
+            with self.lock:
+                if len(self.idle) < self.max_idle:
+                    self.idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    def close(self):
+        """
+        Closes the idle connections; the pool opens new ones when used again
+        """
+        with self.lock:
+            idle = self.idle
+            self.idle = list()
+        for conn in idle:
+            conn.close()
+
+
+class ResultStore:
+    def __init__(
+        self,
+        path: str,
+        busy_timeout: float = DEFAULT_BUSY_TIMEOUT,
+        max_idle: int = DEFAULT_MAX_IDLE,
+    ) -> None:
+        """
+        On-disk, content-addressed cache of immutable results: QueryTx results
+        keyed by txid and QueryData entries keyed by data account and
+        entryHash. It is checked before any network call. Stored entries
+        leave out the account's merkleState, which keeps changing. The SQLite database runs in WAL mode, so
+        several processes can share one file.
+
+        Pending transactions are never stored.
+
+        Args:
+            path: path of the SQLite database file
+            busy_timeout: seconds to wait for another process holding the write lock
+            max_idle: maximum number of SQLite connections kept open while unused
+        """
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.pool = ConnectionPool(path, (SCHEMA,), busy_timeout, max_idle)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, method: str, params: dict = None):
+        if not params:
+            return None
+        if method == ACCUMULATE_METHODS.QueryTx:
+            return "tx", params["txid"].lower()
+        if method == ACCUMULATE_METHODS.QueryData and params.get("entryHash"):
+            # the same entry hash may be written to several data accounts
+            url = normalize_url(params["url"])
+            return "data", "%s#%s" % (url, params["entryHash"].lower())
+        return None
+
+    def get(self, method: str, params: dict = None):
+        """
+        Returns the stored result, or MISSING
+        """
+        key = self.key(method, params)
+        if key is None:
+            return MISSING
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT result FROM results WHERE kind = ? AND key = ?", key
+            ).fetchone()
+        with self.lock:
+            if row is None:
+                self.misses += 1
+                return MISSING
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, method: str, params: dict, result):
+        """
+        Stores a final QueryTx result or a QueryData entry; other results are ignored
+        """
+        key = self.key(method, params)
+        if key is None:
+            return
+        if key[0] == "tx" and not is_final(result):
+            return
+        if key[0] == "data" and isinstance(result, dict) and "merkleState" in result:
+            # the account's merkle state moves on as entries are added
+            result = {k: v for k, v in result.items() if k != "merkleState"}
+        with self.pool.connection() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO results (kind, key, result) VALUES (?, ?, ?)",
+                key + (json.dumps(result),),
+            )
+
+    def __len__(self):
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        self.pool.close()
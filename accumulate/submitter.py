@@ -0,0 +1,314 @@
+import collections
+import heapq
+import queue
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .constants import ACCUMULATE_METHODS
+from .exception import ServerError
+from .models import TxResponse
+
+DEFAULT_WINDOW = 32
+DEFAULT_CHECK_BATCH_SIZE = 100
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BACKOFF = 0.1
+DEFAULT_MAX_BACKOFF = 5.0
+# the node refused the call without processing it, so resending is safe
+PUSHBACK_STATUSES = (429, 503)
+# seconds between two reads of an empty queue while submissions are in flight
+QUEUE_POLL_INTERVAL = 0.05
+
+
+def get_call(tx):
+    """
+    Returns the (method, params) of a queued transaction: either such a
+    tuple or the params dict of a signed `execute` call
+    """
+    if isinstance(tx, dict):
+        return ACCUMULATE_METHODS.Execute, tx
+    method, params = tx
+    return method, params
+
+
+# returned by Source.get when no transaction arrived in time
+PENDING = object()
+
+
+class Source:
+    def __init__(self, txs) -> None:
+        """
+        Numbers the transactions of an iterable, or of a queue.Queue until a
+        None sentinel. A queue is read without blocking while submissions
+        are in flight, so their results are yielded as they finish.
+        """
+        if isinstance(txs, queue.Queue):
+            self.queue, self.iterator = txs, None
+        else:
+            self.queue, self.iterator = None, iter(txs)
+        self.index = 0
+        self.exhausted = False
+
+    def live(self):
+        # transactions may still be put on the queue
+        return self.queue is not None and not self.exhausted
+
+    def get(self, timeout: float = None):
+        """
+        Returns the next (index, tx), PENDING if the queue stayed empty for
+        `timeout` seconds (0 does not wait), or None once exhausted
+        """
+        if self.exhausted:
+            return None
+        if self.queue is None:
+            try:
+                tx = next(self.iterator)
+            except StopIteration:
+                tx = None
+        else:
+            try:
+                tx = self.queue.get(block=timeout != 0, timeout=timeout)
+            except queue.Empty:
+                return PENDING
+        if tx is None:
+            self.exhausted = True
+            return None
+        index = self.index
+        self.index += 1
+        return index, tx
+
+
+class Submitter:
+    def __init__(
+        self,
+        client,
+        window: int = DEFAULT_WINDOW,
+        check: bool = False,
+        check_batch_size: int = DEFAULT_CHECK_BATCH_SIZE,
+        ordered: bool = False,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        backoff: float = DEFAULT_BACKOFF,
+        max_backoff: float = DEFAULT_MAX_BACKOFF,
+        pushback_codes=(),
+    ) -> None:
+        """
+        Submits a stream of transactions with up to `window` of them in
+        flight, instead of one per round trip. Transactions are read from the
+        source only as slots free up, so a slow node slows the producer down.
+        When the node pushes back (HTTP 429/503, or one of `pushback_codes`)
+        the window is halved and the refused transaction is resent after a
+        jittered backoff; every success widens the window again, up to
+        `window`. Other errors are reported and never resent, since the
+        transaction may have been accepted.
+
+        A transaction is the params dict of a signed `execute` call, or a
+        (method, params) tuple such as ("send-tokens", {"to": [...]}).
+
+        Usage:
+            submitter = accumulate.submitter(window=64, check=True)
+            for index, res in submitter.submit(transactions):
+                ...  # TxResponse, or the exception for that transaction
+
+        Args:
+            client: a sync Accumulate client
+            window: maximum number of submissions in flight
+            check: first send each group of `execute` transactions as one
+                batch with checkOnly set, and submit only those that pass
+            check_batch_size: transactions per checkOnly batch
+            ordered: yield results in input order instead of completion order
+            max_attempts: attempts per transaction when the node pushes back
+            backoff: base delay before resending, doubled per attempt
+            max_backoff: upper bound of the resend delay
+            pushback_codes: JSON-RPC error codes that also mean "slow down"
+        """
+        self.client = client
+        self.window = window
+        self.check = check
+        self.check_batch_size = check_batch_size
+        self.ordered = ordered
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pushback_codes = frozenset(PUSHBACK_STATUSES) | frozenset(pushback_codes)
+        self.submitted = 0
+        self.pushbacks = 0
+        self.current_window = float(window)
+
+    def submit_one(self, method: str, params: dict):
+        client = self.client
+        return client.request(client.__id__(), method, params, TxResponse)
+
+    def is_pushback(self, error: Exception):
+        if not isinstance(error, ServerError) or not error.args:
+            return False
+        obj = error.args[0]
+        return isinstance(obj, dict) and obj.get("code") in self.pushback_codes
+
+    def backoff_delay(self, attempt: int):
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+    def read(self, source: Source, checked, timeout: float = None):
+        """
+        Returns the next (index, tx, error) of the source, with the error of
+        a failed checkOnly pre-validation, PENDING if nothing arrived within
+        `timeout` seconds, or None once the source is exhausted. With check
+        set, the transactions already available are checked as one group;
+        the rest of the group waits in the `checked` deque.
+        """
+        if checked:
+            return checked.popleft()
+        item = source.get(timeout)
+        if item is None or item is PENDING:
+            return item
+        if not self.check:
+            index, tx = item
+            return index, tx, None
+        group = [item]
+        while len(group) < self.check_batch_size:
+            item = source.get(0)
+            if item is None or item is PENDING:
+                break
+            group.append(item)
+        checked.extend(self.check_group(group))
+        return checked.popleft()
+
+    def check_group(self, group: list):
+        batch = self.client.batch()
+        items = dict()
+        for index, tx in group:
+            method, params = get_call(tx)
+            if method == ACCUMULATE_METHODS.Execute:
+                params = dict(params, checkOnly=True)
+                items[index] = batch.request(
+                    self.client.__id__(), method, params, TxResponse
+                )
+        if items:
+            batch.send()
+        for index, tx in group:
+            item = items.get(index)
+            if item is None:
+                # only `execute` has a checkOnly mode
+                yield index, tx, None
+                continue
+            try:
+                res = item.result()
+            except ServerError as e:
+                yield index, tx, e
+                continue
+            code = res.get("code") if isinstance(res, dict) else res.code
+            if code:
+                message = res.get("message") if isinstance(res, dict) else res.message
+                yield index, tx, ServerError({"code": code, "message": message})
+            else:
+                yield index, tx, None
+
+    def submit(self, txs):
+        """
+        Submits every transaction of an iterable, or of a queue.Queue until a
+        None sentinel, and yields (index, TxResponse or exception) tuples,
+        where index is the transaction's position in the input
+        """
+        source = Source(txs)
+        checked = collections.deque()
+        inflight = dict()
+        # heap of (ready time, index, tx, attempt) of refused transactions
+        retries = list()
+        buffer = dict()
+        next_index = 0
+        executor = ThreadPoolExecutor(
+            max_workers=self.window, thread_name_prefix="accumulate-submit"
+        )
+        try:
+            while True:
+                finished = list()
+                # fill the window: due resends first, then new transactions
+                while len(inflight) < int(self.current_window):
+                    if retries and retries[0][0] <= time.monotonic():
+                        ready, index, tx, attempt = heapq.heappop(retries)
+                    else:
+                        # block on the source only while nothing else can
+                        # make progress
+                        timeout = 0
+                        if not inflight and not finished:
+                            timeout = None
+                            if retries:
+                                timeout = max(0.0, retries[0][0] - time.monotonic())
+                        item = self.read(source, checked, timeout)
+                        if item is None or item is PENDING:
+                            break
+                        index, tx, error = item
+                        if error is not None:
+                            finished.append((index, error))
+                            continue
+                        attempt = 0
+                    future = executor.submit(self.submit_one, *get_call(tx))
+                    inflight[future] = (index, tx, attempt)
+                if inflight:
+                    timeout = None
+                    if len(inflight) < int(self.current_window):
+                        # a free slot may be filled by a due resend or by a
+                        # transaction put on the queue meanwhile
+                        if retries:
+                            timeout = max(0.0, retries[0][0] - time.monotonic())
+                        if source.live() and (
+                            timeout is None or timeout > QUEUE_POLL_INTERVAL
+                        ):
+                            timeout = QUEUE_POLL_INTERVAL
+                    done, pending = wait(
+                        inflight, timeout=timeout, return_when=FIRST_COMPLETED
+                    )
+                    for future in done:
+                        index, tx, attempt = inflight.pop(future)
+                        try:
+                            res = future.result()
+                        except Exception as e:
+                            if self.is_pushback(e) and attempt + 1 < self.max_attempts:
+                                self.slow_down()
+                                ready = time.monotonic() + self.backoff_delay(attempt)
+                                heapq.heappush(retries, (ready, index, tx, attempt + 1))
+                            else:
+                                finished.append((index, e))
+                            continue
+                        self.speed_up()
+                        finished.append((index, res))
+                elif retries:
+                    time.sleep(max(0.0, retries[0][0] - time.monotonic()))
+                elif not finished:
+                    return
+                for index, value in finished:
+                    if not self.ordered:
+                        yield index, value
+                        continue
+                    buffer[index] = value
+                    while next_index in buffer:
+                        yield next_index, buffer.pop(next_index)
+                        next_index += 1
+        finally:
+            # the caller may stop iterating early; only in-flight calls were
+            # handed to the executor
+            for future in inflight:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def slow_down(self):
+        # multiplicative decrease on pushback
+        self.pushbacks += 1
+        self.current_window = max(1.0, self.current_window / 2)
+
+    def speed_up(self):
+        # additive increase: about one more slot per window of successes
+        self.submitted += 1
+        self.current_window = min(
+            float(self.window), self.current_window + 1 / self.current_window
+        )
+
+    def stats(self):
+        """
+        Returns the number of transactions submitted, of pushbacks from the
+        node and the current window
+        """
+        return {
+            "submitted": self.submitted,
+            "pushbacks": self.pushbacks,
+            "window": int(self.current_window),
+        }
@@ -0,0 +1,265 @@
+import threading
+import time
+from concurrent.futures import Future, wait
+
+from .exception import ServerError
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_INTERVAL = 0.5
+DEFAULT_MAX_INTERVAL = 10.0
+DEFAULT_BACKOFF = 2.0
+DEFAULT_TIMEOUT = 300.0
+
+
+def get_txid(tx):
+    """
+    Returns the txid of a txid string, a TxResponse or AcmeFaucet model, or
+    their raw result dicts
+    """
+    if isinstance(tx, str):
+        return tx
+    if isinstance(tx, dict):
+        return tx["txid"]
+    return tx.txid
+
+
+def get_status(value):
+    if isinstance(value, dict):
+        return value.get("status")
+    return getattr(value, "status", None)
+
+
+class TrackedTx:
+    def __init__(self, txid: str, interval: float, deadline: float) -> None:
+        self.txid = txid
+        self.future = Future()
+        self.interval = interval
+        self.next_poll = time.monotonic() + interval
+        self.deadline = deadline
+        self.error = None
+
+
+class TxTracker:
+    def __init__(
+        self,
+        client,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        interval: float = DEFAULT_INTERVAL,
+        max_interval: float = DEFAULT_MAX_INTERVAL,
+        backoff: float = DEFAULT_BACKOFF,
+        timeout: float = DEFAULT_TIMEOUT,
+    ) -> None:
+        """
+        Waits for many transactions at once. Tracked txids are polled in
+        rounds, each sending the txids that are due as JSON-RPC batches of
+        QueryTx calls. A transaction still pending is polled less and less
+        often, from `interval` up to `max_interval`. Every tracked
+        transaction has a Future which resolves to its QueryTx result once
+        delivered, or fails with ServerError when the node reports it
+        failed, or with TimeoutError after `timeout` seconds.
+
+        Usage:
+            with accumulate.tx_tracker() as tracker:
+                futures = tracker.track_many(responses)
+                tracker.wait()
+
+        Args:
+            client: a sync Accumulate client
+            batch_size: maximum number of QueryTx calls per batch
+            interval: seconds before the first poll of a transaction
+            max_interval: maximum seconds between two polls of a transaction
+            backoff: factor applied to a transaction's interval after every
+                poll that found it pending
+            timeout: seconds after which a transaction is given up on
+        """
+        self.client = client
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.timeout = timeout
+        self.pending = dict()
+        self.condition = threading.Condition()
+        self.thread = None
+        self.stopped = False
+        self.polls = 0
+        self.queries = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def track(self, tx, callback=None):
+        """
+        Starts tracking a transaction and returns its Future
+
+        Args:
+            tx: txid, or a TxResponse/AcmeFaucet or result dict with a txid
+            callback: optional function called with the Future once resolved
+        """
+        txid = get_txid(tx)
+        with self.condition:
+            tracked = self.pending.get(txid)
+            if tracked is None:
+                deadline = time.monotonic() + self.timeout
+                tracked = self.pending[txid] = TrackedTx(txid, self.interval, deadline)
+                self.condition.notify_all()
+        if callback is not None:
+            tracked.future.add_done_callback(callback)
+        return tracked.future
+
+    def track_many(self, txs, callback=None):
+        """
+        Tracks many transactions, returning their Futures in input order
+        """
+        return [self.track(tx, callback) for tx in txs]
+
+    def __len__(self):
+        with self.condition:
+            return len(self.pending)
+
+    def poll(self):
+        """
+        Runs one polling round over the transactions that are due.
+
+        Returns:
+            seconds until the next transaction is due, or None when no
+            transaction is tracked
+        """
+        now = time.monotonic()
+        with self.condition:
+            due = [tx for tx in self.pending.values() if tx.next_poll <= now]
+        for i in range(0, len(due), self.batch_size):
+            self.poll_batch(due[i : i + self.batch_size])
+        with self.condition:
+            if not self.pending:
+                return None
+            next_poll = min(tx.next_poll for tx in self.pending.values())
+        return max(0.0, next_poll - time.monotonic())
+
+    def poll_batch(self, txs: list):
+        batch = self.client.batch()
+        items = [batch.QueryTx(tx.txid) for tx in txs]
+        try:
+            batch.send()
+        except Exception as e:
+            # the node could not be reached; every transaction stays pending
+            for tx in txs:
+                tx.error = e
+                self.reschedule(tx)
+            return
+        self.polls += 1
+        self.queries += len(txs)
+        for tx, item in zip(txs, items):
+            try:
+                value = item.result()
+            except ServerError as e:
+                # usually not found yet, right after submission
+                tx.error = e
+                self.reschedule(tx)
+                continue
+            status = get_status(value) or dict()
+            if status.get("code"):
+                error = dict(status)
+                error["txid"] = tx.txid
+                self.resolve(tx, error=ServerError(error))
+            elif status.get("delivered") and not status.get("pending"):
+                self.resolve(tx, value)
+            else:
+                tx.error = None
+                self.reschedule(tx)
+
+    def reschedule(self, tx: TrackedTx):
+        now = time.monotonic()
+        if now >= tx.deadline:
+            error = TimeoutError("transaction %s not delivered in time" % tx.txid)
+            if tx.error is not None:
+                error.__cause__ = tx.error
+            self.resolve(tx, error=error)
+            return
+        tx.interval = min(tx.interval * self.backoff, self.max_interval)
+        tx.next_poll = min(now + tx.interval, tx.deadline)
+
+    def resolve(self, tx: TrackedTx, value=None, error: Exception = None):
+        with self.condition:
+            self.pending.pop(tx.txid, None)
+            self.condition.notify_all()
+        if error is not None:
+            tx.future.set_exception(error)
+        else:
+            tx.future.set_result(value)
+
+    def start(self):
+        """
+        Starts polling on a background thread
+        """
+        with self.condition:
+            if self.thread is not None:
+                return
+            self.stopped = False
+            self.thread = threading.Thread(
+                target=self.run, name="accumulate-tx-tracker", daemon=True
+            )
+        self.thread.start()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+            delay = self.poll()
+            if delay:
+                with self.condition:
+                    # track() wakes this up early, which is harmless
+                    self.condition.wait(delay)
+
+    def wait(self, timeout: float = None):
+        """
+        Blocks until every tracked transaction is resolved. Without a
+        background thread, polling runs on the calling thread.
+
+        Returns:
+            True if all transactions were resolved within `timeout`
+        """
+        end = None if timeout is None else time.monotonic() + timeout
+        if self.thread is not None:
+            with self.condition:
+                futures = [tx.future for tx in self.pending.values()]
+            done, not_done = wait(futures, timeout=timeout)
+            return not not_done
+        while True:
+            delay = self.poll()
+            if delay is None:
+                return True
+            if end is not None:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    return False
+                delay = min(delay, remaining)
+            time.sleep(delay)
+
+    def stats(self):
+        """
+        Returns the number of tracked transactions, batches sent and QueryTx
+        calls they carried
+        """
+        with self.condition:
+            pending = len(self.pending)
+        return {"pending": pending, "polls": self.polls, "queries": self.queries}
+
+    def close(self):
+        """
+        Stops the background thread; tracked transactions stay unresolved
+        """
+        with self.condition:
+            self.stopped = True
+            thread = self.thread
+            self.thread = None
+            self.condition.notify_all()
+        if thread is not None:
+            thread.join()
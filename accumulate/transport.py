@@ -0,0 +1,76 @@
+DEFAULT_POOL_SIZE = 10
+
+
+class Response:
+    def __init__(self, status_code: int, content: bytes) -> None:
+        """
+        Minimal response returned by transports that do not use requests
+        """
+        self.status_code = status_code
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+
+class Transport:
+    """
+    Interface every transport implements. BaseClass and its subclasses only
+    call post() and close(); the returned response must have `content` (the
+    body as bytes) and `text`.
+    """
+
+    def post(self, url: str, headers=None, data=None):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class HttpTransport(Transport):
+    def __init__(
+        self,
+        pool_connections: int = DEFAULT_POOL_SIZE,
+        pool_maxsize: int = DEFAULT_POOL_SIZE,
+        keep_alive: bool = True,
+        timeout=None,
+    ) -> None:
+        """
+        Pooled HTTP transport shared by Accumulate and all its sub-clients.
+        Connections are kept alive and reused between calls, so only the first
+        call to a node pays for the TCP+TLS handshake.
+
+        Args:
+            pool_connections: number of per-host connection pools to cache
+            pool_maxsize: maximum number of connections kept per host
+            keep_alive: set to False to close the connection after every call
+            timeout: requests timeout, seconds or (connect, read) tuple
+        """
+        # imported here, as it is slow to import and unused with other transports
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if not keep_alive:
+            self.session.headers.update({"connection": "close"})
+
+    def post(self, url: str, headers=None, data=None):
+        return self.session.post(
+            url=url, headers=headers, data=data, timeout=self.timeout
+        )
+
+    def close(self):
+        self.session.close()
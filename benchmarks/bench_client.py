@@ -0,0 +1,300 @@
+"""
+Client-side overhead and end-to-end throughput benchmarks.
+
+For every method in ACCUMULATE_METHODS this measures the cost of
+generate_payload, JSON encode and decode with the client's codec, and model
+construction. It then measures calls per second and p50/p99 latency against
+a LocalNodeServer at several concurrency levels and page sizes.
+
+    python benchmarks/bench_client.py --output bench.json
+    python benchmarks/bench_client.py --output new.json --compare bench.json
+
+With --compare, every metric that got worse by more than --threshold is
+reported and the exit status is 1.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from accumulate import Accumulate
+from accumulate.constants import ACCUMULATE_METHODS
+from accumulate.local import LocalNode, LocalNodeServer, LocalTransport
+from accumulate.models import QUERY_RESPONSE_TYPES, QueryMultiResponse, QueryResponse
+from accumulate.transport import Transport
+
+PAGE_SIZE = 100
+MICRO_SECONDS = 0.2
+CONCURRENCY = (1, 4, 16)
+PAGE_SIZES = (10, 100, 1000)
+CALLS_PER_SCENARIO = 2000
+DEFAULT_THRESHOLD = 0.2
+
+# metric -> True when higher is better
+METRICS = {
+    "payload_ns": False,
+    "encode_ns": False,
+    "decode_ns": False,
+    "model_ns": False,
+    "calls_per_s": True,
+    "p50_ms": False,
+    "p99_ms": False,
+}
+
+
+class CapturingTransport(Transport):
+    def __init__(self, transport) -> None:
+        self.transport = transport
+        self.data = None
+        self.content = None
+
+    def post(self, url: str, headers=None, data=None):
+        res = self.transport.post(url, headers=headers, data=data)
+        self.data = data
+        self.content = res.content
+        return res
+
+
+def sample_calls(node: LocalNode):
+    """
+    Returns one sample call per method, against synthetic state on node
+    """
+    lite = node.add_lite_account(deposits=PAGE_SIZE)
+    adi = node.add_identity("bench", data_entries=PAGE_SIZE)
+    data = adi + "/data"
+    txid = node.histories[lite][0]
+    chainId = [chain for chain, url in node.chains.items() if url == lite][0]
+    key = node.accounts[adi]["keyData"]
+    entryHash = node.entries[data][0]["entryHash"]
+    pagination = {"start": 0, "count": PAGE_SIZE}
+    m = ACCUMULATE_METHODS
+    return {
+        m.VERSION: lambda c: c.Version(),
+        m.Metrics: lambda c: c.Metrics("tps", "1h"),
+        m.Faucet: lambda c: c.Faucet(lite),
+        m.Query: lambda c: c.Query(lite),
+        m.QueryChain: lambda c: c.QueryChain(chainId),
+        m.QueryData: lambda c: c.QueryData(data, entryHash),
+        m.QueryDataSet: lambda c: c.QueryDataSet(data, pagination, None),
+        m.QueryDirectory: lambda c: c.QueryDirectory(adi, expandChains=True),
+        m.QueryKeyPageIndex: lambda c: c.QueryKeyPageIndex(adi + "/page", key),
+        m.QueryTx: lambda c: c.QueryTx(txid),
+        m.QueryTxHistory: lambda c: c.QueryTxHistory(lite, PAGE_SIZE),
+        m.Execute: lambda c: c.Execute(adi, {"nonce": 1}, "00", {"height": 1}, "00"),
+        m.ExecuteAddCredits: lambda c: c.ExecuteAddCredits(lite, 100),
+        m.ExecuteCreateAdi: lambda c: c.ExecuteCreateAdi("acc://bench-adi", "00"),
+        m.ExecuteCreateDataAccount: lambda c: c.ExecuteCreateDataAccount(
+            adi + "/data2"
+        ),
+        m.ExecuteCreateKeyBook: lambda c: c.ExecuteCreateKeyBook(
+            adi + "/book2", [adi + "/page"]
+        ),
+        m.ExecuteCreateKeyPage: lambda c: c.ExecuteCreateKeyPage(
+            adi + "/page2", [{"PublicKey": "00"}]
+        ),
+        m.ExecuteCreateToken: lambda c: c.ExecuteCreateToken(adi + "/token", "BNC", 8),
+        m.ExecuteCreateTokenAccount: lambda c: c.ExecuteCreateTokenAccount(
+            adi + "/tokens", adi + "/token", adi + "/book"
+        ),
+        m.ExecuteSendTokens: lambda c: c.ExecuteSendTokens(
+            [{"url": lite, "amount": 1}]
+        ),
+        m.ExecuteUpdateKeyPage: lambda c: c.ExecuteUpdateKeyPage("add", NewKey="11"),
+        m.ExecuteWriteData: lambda c: c.ExecuteWriteData({"data": "00"}),
+    }
+
+
+def per_op_ns(fn, seconds: float = MICRO_SECONDS):
+    """
+    Runs fn repeatedly for about `seconds` and returns nanoseconds per call
+    """
+    number = 1
+    while True:
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter_ns() - start
+        if elapsed >= seconds * 1e9:
+            return elapsed / number
+        number *= 2
+
+
+def touch(obj):
+    # lazily built models only pay for what is read, so read everything
+    if isinstance(obj, QueryResponse):
+        getattr(obj, QUERY_RESPONSE_TYPES[obj.type][0])
+    elif isinstance(obj, QueryMultiResponse):
+        for item in obj.items:
+            pass
+
+
+def bench_micro(seconds: float):
+    node = LocalNode()
+    transport = CapturingTransport(LocalTransport(node))
+    client = Accumulate("local", transport=transport)
+    codec = client.codec
+    results = dict()
+    for method, call in sample_calls(node).items():
+        res = call(client)
+        payload = codec.loads(transport.data)
+        params = payload.get("params")
+        content = transport.content
+        result = codec.loads(content)["result"]
+        model = None if isinstance(res, dict) else type(res)
+
+        def build():
+            touch(model(**result))
+
+        results[method] = {
+            "payload_ns": per_op_ns(
+                lambda: client.generate_payload(id=1, method=method, params=params),
+                seconds,
+            ),
+            "encode_ns": per_op_ns(lambda: codec.dumps(payload), seconds),
+            "decode_ns": per_op_ns(lambda: codec.loads(content), seconds),
+            "model_ns": per_op_ns(build, seconds) if model is not None else None,
+            "response_bytes": len(content),
+        }
+    return results
+
+
+def percentile(values: list, fraction: float):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_scenario(client, call, concurrency: int, calls: int):
+    latencies = list()
+    errors = [0]
+    lock = threading.Lock()
+
+    def worker(count):
+        for _ in range(count):
+            start = time.perf_counter()
+            try:
+                call(client)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(worker, calls // concurrency)
+    elapsed = time.perf_counter() - start
+    return {
+        "calls": len(latencies),
+        "errors": errors[0],
+        "calls_per_s": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def bench_throughput(calls: int):
+    node = LocalNode()
+    lite = node.add_lite_account(deposits=max(PAGE_SIZES))
+    results = dict()
+    with LocalNodeServer(node) as server:
+        for concurrency in CONCURRENCY:
+            with Accumulate(server.url, pool_size=concurrency) as client:
+                client.Query(lite)
+                results["query/c%d" % concurrency] = run_scenario(
+                    client, lambda c: c.Query(lite), concurrency, calls
+                )
+        for page_size in PAGE_SIZES:
+            with Accumulate(server.url, pool_size=4) as client:
+                results["query-tx-history/p%d" % page_size] = run_scenario(
+                    client,
+                    lambda c: c.QueryTxHistory(lite, page_size),
+                    4,
+                    max(calls * 10 // page_size, 40),
+                )
+    return results
+
+
+def compare(old: dict, new: dict, threshold: float):
+    regressions = list()
+    for section in ("micro", "throughput"):
+        for name, metrics in new.get(section, dict()).items():
+            before = old.get(section, dict()).get(name, dict())
+            for metric, higher_is_better in METRICS.items():
+                a, b = before.get(metric), metrics.get(metric)
+                if not a or b is None:
+                    continue
+                change = (b - a) / a
+                if higher_is_better:
+                    change = -change
+                if change > threshold:
+                    regressions.append((section, name, metric, a, b, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--quick", action="store_true", help="short run, for CI")
+    args = parser.parse_args(argv)
+
+    seconds = MICRO_SECONDS / 10 if args.quick else MICRO_SECONDS
+    calls = CALLS_PER_SCENARIO // 10 if args.quick else CALLS_PER_SCENARIO
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "codec": Accumulate("local", transport=LocalTransport()).codec.name,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "micro": bench_micro(seconds),
+        "throughput": bench_throughput(calls),
+    }
+    for method, metrics in results["micro"].items():
+        print(
+            "%-20s payload %7.0f ns  encode %7.0f ns  decode %8.0f ns  model %s"
+            % (
+                method,
+                metrics["payload_ns"],
+                metrics["encode_ns"],
+                metrics["decode_ns"],
+                "-" if metrics["model_ns"] is None else "%.0f ns" % metrics["model_ns"],
+            )
+        )
+    for name, metrics in results["throughput"].items():
+        print(
+            "%-24s %8.0f calls/s  p50 %6.2f ms  p99 %6.2f ms  errors %d"
+            % (
+                name,
+                metrics["calls_per_s"],
+                metrics["p50_ms"],
+                metrics["p99_ms"],
+                metrics["errors"],
+            )
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        for section, name, metric, a, b, change in regressions:
+            print(
+                "REGRESSION %s %s %s: %.3f -> %.3f (%+.0f%%)"
+                % (section, name, metric, a, b, change * 100)
+            )
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Memory used by the response models per 100k transaction history items,
+compared with the previous eager, __dict__ based models.
+
+    python benchmarks/models_memory.py
+"""
+
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from accumulate.constants import ACCUMULATE_TYPES
+from accumulate.models import QueryMultiResponse
+
+ITEMS = 100000
+PAGE_SIZE = 100
+
+
+class DictSyntheticDepositTokens:
+    def __init__(self, type, data, sponsor, keyPage, txid, signer, sig, status):
+        self.type = type
+        self.data = data
+        self.sponsor = sponsor
+        self.keyPage = keyPage
+        self.txid = txid
+        self.signer = signer
+        self.sig = sig
+        self.status = status
+
+
+class DictQueryMultiResponse:
+    def __init__(self, items, start, count, total):
+        self.start = start
+        self.count = count
+        self.total = total
+        self.items = list()
+        for item in items:
+            if item.get("type") == ACCUMULATE_TYPES.SYNTHETIC_DEPOSIT_TOKENS:
+                self.items.append(DictSyntheticDepositTokens(**item))
+
+
+def history_pages():
+    items = [
+        {
+            "type": ACCUMULATE_TYPES.SYNTHETIC_DEPOSIT_TOKENS,
+            "data": {"amount": str(i)},
+            "sponsor": "acc://sponsor",
+            "keyPage": {"height": 1, "index": 0},
+            "txid": "%064x" % i,
+            "signer": {"publicKey": "00", "nonce": i},
+            "sig": "00",
+            "status": {"delivered": True},
+        }
+        for i in range(ITEMS)
+    ]
+    return [
+        {
+            "items": items[start : start + PAGE_SIZE],
+            "start": start,
+            "count": PAGE_SIZE,
+            "total": ITEMS,
+        }
+        for start in range(0, ITEMS, PAGE_SIZE)
+    ]
+
+
+def measure(model, pages, touch):
+    tracemalloc.start()
+    responses = [model(**page) for page in pages]
+    if touch:
+        for response in responses:
+            for item in response.items:
+                item.txid
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size
+
+
+def main():
+    pages = history_pages()
+    eager = measure(DictQueryMultiResponse, pages, touch=True)
+    untouched = measure(QueryMultiResponse, pages, touch=False)
+    touched = measure(QueryMultiResponse, pages, touch=True)
+    print("bytes per %d items, excluding the decoded JSON" % ITEMS)
+    report("__dict__ models, eager", eager, eager)
+    report("__slots__ models, items not read", untouched, eager)
+    report("__slots__ models, every item read", touched, eager)
+
+
+def report(name, size, baseline):
+    print("  %-36s %10d  (%.0f%% saved)" % (name, size, 100 - size * 100 / baseline))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
+import asyncio
 import unittest
 import sys
+import tempfile
 import os
 
 sys.path.append(os.path.abspath(".."))
 sys.path.append(os.path.abspath("../accumulate"))
-from accumulate import Accumulate
+from accumulate import Accumulate, AsyncAccumulate, ResponseCache, ResultStore
 from accumulate.constants import ACCUMULATE_TYPES
 
 
@@ -119,3 +121,76 @@ class TestClassAccumulate(unittest.TestCase):
         self.assertIsNotNone(res.dataEntryQueryResponse.entry)
         self.assertIsNotNone(res.dataEntryQueryResponse.entry.data)
         self.assertIsNotNone(res.dataEntryQueryResponse.entryHash)
+
+    def test_batch(self):
+        with self.accumulate.batch() as batch:
+            account = batch.Query(self.URL_acc)
+            tx = batch.QueryTx(self.txId)
+            data = batch.QueryData(self.URL_queryData, self.entryHash)
+        res = account.result()
+        self.assertIsNotNone(res)
+        self.assertIsNotNone(res.liteTokenAccount)
+        res = tx.result()
+        self.assertIsNotNone(res)
+        self.assertEqual(res.type, ACCUMULATE_TYPES.ACME_FAUCET)
+        res = data.result()
+        self.assertIsNotNone(res)
+        self.assertIsNotNone(res.dataEntryQueryResponse)
+
+    def test_async_query(self):
+        async def query():
+            async with AsyncAccumulate(self.endpoint) as accumulate:
+                return await asyncio.gather(
+                    accumulate.Query(self.URL_acc), accumulate.QueryTx(self.txId)
+                )
+
+        account, tx = asyncio.run(query())
+        self.assertIsNotNone(account)
+        self.assertIsNotNone(account.liteTokenAccount)
+        self.assertIsNotNone(tx)
+        self.assertEqual(tx.type, ACCUMULATE_TYPES.ACME_FAUCET)
+
+    def test_query_many(self):
+        res = self.accumulate.query_many([self.URL_acc, self.ADI])
+        self.assertEqual(len(res), 2)
+        self.assertIsNotNone(res[0].liteTokenAccount)
+        self.assertIsNotNone(res[1].identity)
+        res = self.accumulate.query_tx_many([self.txId], as_completed=True)
+        for index, tx in res:
+            self.assertEqual(index, 0)
+            self.assertEqual(tx.type, ACCUMULATE_TYPES.ACME_FAUCET)
+
+    def test_cache(self):
+        cache = ResponseCache()
+        accumulate = Accumulate(self.endpoint, cache=cache)
+        res = accumulate.Version()
+        self.assertIsNotNone(res.version)
+        res = accumulate.Version()
+        self.assertIsNotNone(res.version)
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["entries"], 1)
+
+    def test_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = ResultStore(os.path.join(directory, "accumulate.db"))
+            accumulate = Accumulate(self.endpoint, store=store)
+            res = accumulate.QueryData(self.URL_queryData, self.entryHash)
+            self.assertIsNotNone(res.dataEntryQueryResponse)
+            res = accumulate.QueryData(self.URL_queryData, self.entryHash)
+            self.assertIsNotNone(res.dataEntryQueryResponse)
+            self.assertEqual(store.stats()["hits"], 1)
+            store.close()
+
+    def test_iter_tx_history(self):
+        total = self.accumulate.QueryTxHistory(self.URL_acc, 1).total
+        items = list(self.accumulate.iter_tx_history(self.URL_acc, page_size=2))
+        self.assertEqual(len(items), total)
+
+    def test_raw(self):
+        res = self.accumulate.as_raw().Query(self.URL_acc)
+        self.assertIsInstance(res, dict)
+        self.assertIsNotNone(res.get("type"))
+        res = self.accumulate.as_raw("bytes").Query(self.URL_acc)
+        self.assertIsInstance(res, bytes)
@@ -0,0 +1,649 @@
+import asyncio
+import importlib.util
+import json
+import os
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.append(os.path.abspath(".."))
+sys.path.append(os.path.abspath("../accumulate"))
+from accumulate import (
+    Accumulate,
+    AsyncAccumulate,
+    Coalescer,
+    Limiter,
+    MetricsCollector,
+    ResponseCache,
+    ResultStore,
+)
+from accumulate import dataset
+from accumulate.constants import ACCUMULATE_TYPES
+from accumulate.dataset import iter_records
+from accumulate.endpoints import EndpointPool
+from accumulate.fanout import fan_out
+from accumulate.retry import RetryPolicy
+from accumulate.sampler import Series
+from accumulate.transport import Response, Transport
+from accumulate.exception import ServerError
+from accumulate.models import Identity, KeyPage, TxResponse
+from accumulate.local import (
+    FAUCET_AMOUNT,
+    INJECTED_ERROR,
+    LocalNode,
+    LocalTransport,
+    AsyncLocalTransport,
+    LocalNodeServer,
+)
+
+
+class TestClassLocalNode(unittest.TestCase):
+    def setUp(self) -> None:
+        self.node = LocalNode(seed=1)
+        self.URL_acc = self.node.add_lite_account(deposits=25)
+        self.ADI = self.node.add_identity("adione", data_entries=7)
+        self.URL_data = self.ADI + "/data"
+        self.txId = self.node.histories[self.URL_acc][0]
+        self.accumulate = Accumulate("local", transport=LocalTransport(self.node))
+
+    def test_version(self):
+        res = self.accumulate.Version()
+        self.assertEqual(res.type, ACCUMULATE_TYPES.VERSION)
+        self.assertEqual(res.version.versionIsknown, True)
+
+    def test_query(self):
+        res = self.accumulate.Query(self.URL_acc)
+        self.assertEqual(res.type, ACCUMULATE_TYPES.LITE_TOKEN_ACCOUNT)
+        self.assertEqual(res.merkleState.count, 25)
+        self.assertEqual(res.liteTokenAccount.url, self.URL_acc)
+        res = self.accumulate.Query(self.ADI)
+        self.assertEqual(res.identity.url, self.ADI)
+        with self.assertRaises(ServerError):
+            self.accumulate.Query("acc://missing")
+
+    def test_queryTx(self):
+        res = self.accumulate.QueryTx(self.txId)
+        self.assertEqual(res.type, ACCUMULATE_TYPES.ACME_FAUCET)
+        self.assertEqual(res.txid, self.txId)
+
+    def test_iter_tx_history(self):
+        txids = [tx.txid for tx in self.accumulate.iter_tx_history(self.URL_acc, 4)]
+        self.assertEqual(txids, self.node.histories[self.URL_acc])
+
+    def test_iter_tx_history_mixed_types(self):
+        class FaucetHistoryNode(LocalNode):
+            # reports some items as acmeFaucet, which QueryItems leaves out
+            faucet_txids = set()
+
+            def history_item(self, txid):
+                item = super().history_item(txid)
+                if txid in self.faucet_txids:
+                    item["type"] = ACCUMULATE_TYPES.ACME_FAUCET
+                return item
+
+        node = FaucetHistoryNode(seed=5)
+        url = node.add_lite_account(deposits=15)
+        history = node.histories[url]
+        # one page partly and one page wholly made of skipped items
+        node.faucet_txids = set(history[5:12])
+        accumulate = Accumulate("local", transport=LocalTransport(node))
+        txids = [tx.txid for tx in accumulate.iter_tx_history(url, 4)]
+        self.assertEqual(txids, history[:5] + history[12:])
+
+    def test_iter_data_set(self):
+        entries = list(self.accumulate.iter_data_set(self.URL_data, page_size=3))
+        self.assertEqual(len(entries), 7)
+        self.assertIsNotNone(entries[0].entry.data)
+
+    def test_iter_directory(self):
+        urls = [item.entries[0] for item in self.accumulate.iter_directory(self.ADI)]
+        self.assertIn(self.URL_data, urls)
+
+    def test_iter_raw(self):
+        raw = self.accumulate.as_raw()
+        txids = [tx["txid"] for tx in raw.iter_tx_history(self.URL_acc, 4)]
+        self.assertEqual(txids, self.node.histories[self.URL_acc])
+        self.assertEqual(len(list(raw.iter_data_set(self.URL_data, page_size=3))), 7)
+        urls = [item["entries"][0] for item in raw.iter_directory(self.ADI)]
+        self.assertIn(self.URL_data, urls)
+        with self.assertRaises(TypeError):
+            self.accumulate.as_raw("bytes").iter_tx_history(self.URL_acc)
+
+    def test_batch(self):
+        with self.accumulate.batch() as batch:
+            account = batch.Query(self.URL_acc)
+            missing = batch.Query("acc://missing")
+            tx = batch.QueryTx(self.txId)
+        self.assertEqual(account.result().liteTokenAccount.url, self.URL_acc)
+        self.assertEqual(tx.result().txid, self.txId)
+        with self.assertRaises(ServerError):
+            missing.result()
+
+    def test_query_many(self):
+        res = self.accumulate.query_many([self.URL_acc, "acc://missing", self.ADI])
+        self.assertEqual(res[0].liteTokenAccount.url, self.URL_acc)
+        self.assertIsInstance(res[1], ServerError)
+        self.assertEqual(res[2].identity.url, self.ADI)
+
+    def test_cache(self):
+        cache = ResponseCache()
+        transport = LocalTransport(self.node)
+        accumulate = Accumulate("local", transport=transport, cache=cache)
+        accumulate.Query(self.URL_acc)
+        calls = self.node.calls
+        accumulate.Query(self.URL_acc)
+        self.assertEqual(self.node.calls, calls)
+        accumulate.ExecuteSendTokens([{"url": self.URL_acc, "amount": 5}])
+        res = accumulate.Query(self.URL_acc)
+        self.assertEqual(res.merkleState.count, 26)
+
+    def test_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = ResultStore(os.path.join(directory, "accumulate.db"))
+            accumulate = Accumulate(
+                "local", transport=LocalTransport(self.node), store=store
+            )
+            accumulate.QueryTx(self.txId)
+            calls = self.node.calls
+            self.assertEqual(accumulate.QueryTx(self.txId).txid, self.txId)
+            self.assertEqual(self.node.calls, calls)
+            # entries are stored per data account, without the merkle state
+            entryHash = self.node.entries[self.URL_data][6]["entryHash"]
+            other = self.node.add_identity("adistore", data_entries=1) + "/data"
+            accumulate.QueryData(self.URL_data, entryHash)
+            res = accumulate.as_raw().QueryData(self.URL_data, entryHash)
+            self.assertEqual(res["data"]["entryHash"], entryHash)
+            self.assertNotIn("merkleState", res)
+            with self.assertRaises(ServerError):
+                accumulate.QueryData(other, entryHash)
+            if os.path.isdir("/proc/self/fd"):
+                # connections are pooled, not left behind by every worker thread
+                txids = self.node.histories[self.URL_acc][:8]
+                accumulate.query_tx_many(txids, max_workers=4)
+                fds = len(os.listdir("/proc/self/fd"))
+                for _ in range(20):
+                    accumulate.query_tx_many(txids, max_workers=4)
+                self.assertLessEqual(len(os.listdir("/proc/self/fd")), fds + 8)
+            store.close()
+
+    def test_raw(self):
+        res = self.accumulate.as_raw().Query(self.URL_acc)
+        self.assertEqual(res["data"]["url"], self.URL_acc)
+        res = self.accumulate.as_raw("bytes").Query(self.URL_acc)
+        self.assertIsInstance(res, bytes)
+        with self.assertRaises(ServerError):
+            self.accumulate.as_raw("bytes").Query("acc://missing")
+        raw = self.accumulate.as_raw()
+        ids = [client.__id__() for client in (self.accumulate, raw) * 2]
+        self.assertEqual(len(set(ids)), 4)
+
+        class Unavailable(Transport):
+            def post(self, url, headers=None, data=None):
+                return Response(503, b"<html>Service Unavailable</html>")
+
+        accumulate = Accumulate("local", transport=Unavailable())
+        for raw in (False, "bytes"):
+            with self.assertRaises(ServerError) as error:
+                accumulate.as_raw(raw).Query(self.URL_acc)
+            self.assertEqual(error.exception.args[0]["status"], 503)
+        batch = accumulate.batch()
+        batch.Query(self.URL_acc)
+        with self.assertRaises(ServerError) as error:
+            batch.send()
+        self.assertEqual(error.exception.args[0]["status"], 503)
+
+        class AsyncUnavailable:
+            async def post(self, url, headers=None, data=None):
+                return Unavailable().post(url, headers, data)
+
+        async def send():
+            accumulate = AsyncAccumulate("local", transport=AsyncUnavailable())
+            batch = accumulate.batch()
+            batch.Query(self.URL_acc)
+            await batch.send()
+
+        with self.assertRaises(ServerError) as error:
+            asyncio.run(send())
+        self.assertEqual(error.exception.args[0]["status"], 503)
+
+    def test_metrics(self):
+        metrics = MetricsCollector()
+        self.accumulate.add_hook(metrics)
+        self.accumulate.Query(self.URL_acc)
+        with self.assertRaises(ServerError):
+            self.accumulate.Query("acc://missing")
+        with self.accumulate.batch() as batch:
+            batch.Version()
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["query"]["calls"], 2)
+        self.assertEqual(snapshot["query"]["errors"], {"-32004": 1})
+        self.assertGreater(snapshot["query"]["response_bytes"], 0)
+        self.assertEqual(snapshot["query"]["stages"]["network"]["count"], 2)
+        self.assertEqual(snapshot["query"]["stages"]["model"]["count"], 1)
+        self.assertEqual(snapshot["batch"]["calls"], 1)
+        text = metrics.prometheus()
+        self.assertIn('accumulate_client_calls_total{method="query"} 2', text)
+        self.assertIn(
+            'accumulate_client_stage_seconds_count{method="query",stage="total"} 2',
+            text,
+        )
+
+    def test_error_injection(self):
+        self.node.error_rate = 1.0
+        with self.assertRaises(ServerError):
+            self.accumulate.Version()
+        self.node.error_rate = 0.0
+        self.node.drop_rate = 1.0
+        with self.assertRaises(ConnectionError):
+            self.accumulate.Version()
+
+    def test_retry(self):
+        retry = RetryPolicy(max_attempts=50, backoff=0, retry_codes=[INJECTED_ERROR])
+        node = LocalNode(error_rate=0.5, seed=2)
+        url = node.add_lite_account()
+        accumulate = Accumulate("local", transport=LocalTransport(node), retry=retry)
+        for _ in range(10):
+            self.assertEqual(accumulate.Query(url).liteTokenAccount.url, url)
+        self.assertGreater(retry.stats()["retries"], 0)
+        node.error_rate = 1.0
+        calls = node.calls
+        with self.assertRaises(ServerError):
+            accumulate.ExecuteSendTokens([{"url": url, "amount": 1}])
+        self.assertEqual(node.calls, calls + 1)
+
+    def test_hedge(self):
+        retry = RetryPolicy(hedge=True, hedge_delay=0.01)
+        self.node.latency = 0.05
+        with Accumulate(
+            "local", transport=LocalTransport(self.node), retry=retry
+        ) as accumulate:
+            res = accumulate.Query(self.URL_acc)
+        self.assertEqual(res.liteTokenAccount.url, self.URL_acc)
+        self.assertEqual(retry.stats()["hedges"], 1)
+
+    def test_coalesce(self):
+        self.node.latency = 0.05
+        coalescer = Coalescer()
+        accumulate = Accumulate(
+            "local", transport=LocalTransport(self.node), coalescer=coalescer
+        )
+        calls = self.node.calls
+        res = accumulate.query_many([self.URL_acc] * 10)
+        self.assertEqual(res[9].liteTokenAccount.url, self.URL_acc)
+        self.assertGreater(coalescer.stats()["saved"], 0)
+        self.assertLess(self.node.calls - calls, 10)
+        # raw bytes callers never share a call with decoding ones
+        raw = accumulate.as_raw("bytes")
+        args_list = [(raw.Query,), (accumulate.Query,)] * 4
+        res = fan_out(lambda query: query(self.URL_acc), args_list, 8)
+        self.assertTrue(all(isinstance(value, bytes) for value in res[::2]))
+        for value in res[1::2]:
+            self.assertEqual(value.liteTokenAccount.url, self.URL_acc)
+
+        async def query():
+            accumulate = AsyncAccumulate(
+                "local",
+                transport=AsyncLocalTransport(self.node),
+                coalescer=Coalescer(),
+            )
+            res = await asyncio.gather(
+                *[accumulate.Query(self.URL_acc) for _ in range(10)]
+            )
+            return res, accumulate.coalescer.stats()
+
+        res, stats = asyncio.run(query())
+        self.assertEqual(res[9].liteTokenAccount.url, self.URL_acc)
+        self.assertEqual(stats, {"calls": 1, "saved": 9})
+
+    def test_tx_tracker(self):
+        self.node.delivery_delay = 0.1
+        responses = [
+            self.accumulate.ExecuteSendTokens([{"url": self.URL_acc, "amount": 1}])
+            for _ in range(30)
+        ]
+        delivered = list()
+        with self.accumulate.tx_tracker(interval=0.02, timeout=1) as tracker:
+            futures = tracker.track_many(responses, delivered.append)
+            missing = tracker.track("0" * 64)
+            self.assertTrue(tracker.wait(5))
+        self.assertEqual(futures[0].result().txid, responses[0].txid)
+        self.assertEqual(len(delivered), 30)
+        self.assertIsInstance(missing.exception(), TimeoutError)
+        self.assertLess(tracker.stats()["polls"], 30)
+
+    def test_submitter(self):
+        tx = {
+            "sponsor": self.ADI,
+            "signer": {"nonce": 1},
+            "signature": "00",
+            "keyPage": {"height": 1},
+            "payload": "00",
+        }
+        txs = [dict(tx, payload="%02x" % i) for i in range(40)]
+        txs[7] = dict(tx, sponsor="acc://nobody")
+        calls = self.node.calls
+        submitter = self.accumulate.submitter(window=8, check=True, ordered=True)
+        results = list(submitter.submit(txs))
+        self.assertEqual([index for index, res in results], list(range(40)))
+        self.assertIsInstance(results[7][1], ServerError)
+        self.assertIn(results[8][1].txid, self.node.txs)
+        # 40 checkOnly calls in one batch, then the 39 that passed
+        self.assertEqual(self.node.calls - calls, 40 + 39)
+
+        self.node.error_rate = 0.3
+        submitter = self.accumulate.submitter(
+            window=8, max_attempts=50, backoff=0, pushback_codes=[INJECTED_ERROR]
+        )
+        results = list(submitter.submit(iter(txs[:7])))
+        self.assertEqual(len(results), 7)
+        self.assertTrue(all(isinstance(res, TxResponse) for index, res in results))
+        self.assertGreater(submitter.stats()["pushbacks"], 0)
+        res = TxResponse(txid="00", hash="00", codespace="", log="")
+        self.assertEqual(res.txid, "00")
+
+        # results of a queue are yielded while the producer is still idle
+        txs_queue = queue.Queue()
+        yielded = threading.Event()
+        waited = list()
+
+        def produce():
+            txs_queue.put(txs[0])
+            waited.append(yielded.wait(1))
+            txs_queue.put(txs[1])
+            txs_queue.put(None)
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+        results = list()
+        for index, res in self.accumulate.submitter(check=True).submit(txs_queue):
+            results.append(index)
+            yielded.set()
+        producer.join()
+        self.assertEqual(results, [0, 1])
+        self.assertEqual(waited, [True])
+
+    def test_limiter(self):
+        limiter = Limiter(write_rate=50, write_burst=1, max_concurrency=2)
+        self.node.latency = 0.01
+        accumulate = Accumulate(
+            "local", transport=LocalTransport(self.node), limiter=limiter
+        )
+        res = accumulate.query_many([self.URL_acc] * 20)
+        self.assertEqual(res[19].liteTokenAccount.url, self.URL_acc)
+        for _ in range(5):
+            accumulate.ExecuteSendTokens([{"url": self.URL_acc, "amount": 1}])
+        reads, writes = limiter.stats()
+        self.assertEqual((reads["class"], reads["calls"]), ("read", 20))
+        self.assertEqual(reads["concurrency"], 2)
+        self.assertGreater(writes["throttled_seconds"], 0)
+
+        async def query():
+            accumulate = AsyncAccumulate(
+                "local", transport=AsyncLocalTransport(self.node), limiter=limiter
+            )
+            return await asyncio.gather(
+                *[accumulate.Query(self.URL_acc) for _ in range(10)]
+            )
+
+        self.assertEqual(len(asyncio.run(query())), 10)
+        self.assertEqual(limiter.stats()[0]["calls"], 30)
+        self.assertEqual(limiter.stats()[0]["inflight"], 0)
+
+        self.node.drop_rate = 1.0
+        with self.assertRaises(ConnectionError):
+            accumulate.Query(self.URL_acc)
+        self.assertEqual(limiter.stats()[0]["concurrency"], 1)
+
+    def test_export_tx_history(self):
+        self.accumulate.ExecuteSendTokens([{"url": self.URL_acc, "amount": 150000000}])
+        columns = self.accumulate.export_tx_history(
+            self.URL_acc, format="columns", page_size=7
+        )
+        self.assertEqual(columns["txid"], self.node.histories[self.URL_acc])
+        self.assertEqual(columns["index"], list(range(26)))
+        self.assertEqual(columns["amount"][-1], 1.5)
+        self.assertEqual(columns["sponsor"][0], "acc://faucet")
+        self.assertTrue(all(columns["delivered"]))
+        if importlib.util.find_spec("numpy") is None:
+            return
+        txs = self.accumulate.export_tx_history(self.URL_acc, format="numpy")
+        self.assertEqual(len(txs), 26)
+        self.assertEqual(txs["amount"][txs["sponsor"] == "acc://faucet"].sum(), 250)
+
+    def test_history_mirror(self):
+        node = LocalNode(seed=3, error_rate=0.3)
+        url = node.add_lite_account(deposits=25)
+        accumulate = Accumulate("local", transport=LocalTransport(node))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "history.db")
+            # URLs are stored lowercase with the acc:// prefix
+            bare = url[len("acc://") :].upper()
+            with accumulate.history_mirror(path, [bare], page_size=5) as mirror:
+                mirror.add([url])
+                self.assertEqual(mirror.urls(), [url])
+                failures = 0
+                while isinstance(mirror.sync()[url], ServerError):
+                    failures += 1
+                self.assertGreater(failures, 0)
+                txids = [tx["txid"] for tx in mirror.history(url)]
+                self.assertEqual(txids, node.histories[url])
+                self.assertEqual(mirror.status(url)["synced"], 25)
+
+                node.error_rate = 0.0
+                node.delivery_delay = 60
+                accumulate.ExecuteSendTokens([{"url": url, "amount": 5}])
+                self.assertEqual(mirror.sync(), {url: 1})
+                calls = node.calls
+                self.assertEqual(mirror.sync(), {url: 0})
+                self.assertEqual(node.calls, calls + 1)  # the pending tx again
+                self.assertEqual(mirror.balance_delta(bare), 25 * FAUCET_AMOUNT + 5)
+                self.assertEqual(mirror.get_tx(txids[3])["txid"], txids[3])
+                if os.path.isdir("/proc/self/fd"):
+                    # every sync runs on new threads; connections are pooled
+                    fds = len(os.listdir("/proc/self/fd"))
+                    for _ in range(20):
+                        mirror.sync()
+                    self.assertLessEqual(len(os.listdir("/proc/self/fd")), fds + 4)
+            with accumulate.history_mirror(path) as mirror:
+                self.assertEqual(len(mirror.history(url, start=20)), 6)
+
+    def test_data_set_export(self):
+        node = LocalNode(seed=4, error_rate=0.2)
+        url = node.add_identity("archive", data_entries=50) + "/data"
+        entries = node.entries[url]
+        accumulate = Accumulate("local", transport=LocalTransport(node))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "entries.jsonl")
+            exporter = accumulate.data_set_exporter(url, path, page_size=5)
+            failures = 0
+            while True:
+                try:
+                    self.assertEqual(exporter.run(), 50)
+                    break
+                except ServerError:
+                    failures += 1
+                    self.assertTrue(os.path.exists(path + ".checkpoint"))
+            self.assertGreater(failures, 0)
+            self.assertFalse(os.path.exists(path + ".checkpoint"))
+            with open(path) as f:
+                records = [json.loads(line) for line in f]
+            self.assertEqual([r["index"] for r in records], list(range(50)))
+            self.assertEqual(records[7]["entryHash"], entries[7]["entryHash"])
+
+            node.error_rate = 0.0
+            path = os.path.join(directory, "entries.bin")
+            exporter = accumulate.data_set_exporter(
+                url, path, format="binary", page_size=4, workers=3
+            )
+            self.assertEqual(exporter.run(), 50)
+            records = list(iter_records(path))
+            self.assertEqual(len(records), 50)
+            entryHash, data, extIds = records[49]
+            self.assertEqual(entryHash, entries[49]["entryHash"])
+            self.assertEqual(data, bytes.fromhex(entries[49]["entry"]["data"]))
+            self.assertEqual(extIds, [b"49"])
+
+            with LocalNodeServer(node) as server:
+                argv = [server.url, url, path, "--format", "binary", "--restart"]
+                self.assertEqual(dataset.main(argv), 0)
+            self.assertEqual(len(list(iter_records(path))), 50)
+
+    def test_crawler(self):
+        adis = [self.node.add_identity("crawl%d" % i) for i in range(20)]
+        crawler = self.accumulate.crawler(max_workers=8)
+        results = list(crawler.crawl(adis + [self.ADI, "acc://missing"]))
+        self.assertEqual(len(results), 21 * 4 + 1)
+        by_url = {res.url: res for res in results}
+        self.assertIsInstance(by_url[self.ADI].data, Identity)
+        self.assertIsInstance(by_url[self.ADI + "/page"].data, KeyPage)
+        self.assertEqual(by_url[self.URL_data].depth, 1)
+        self.assertIsInstance(by_url["acc://missing"].error, ServerError)
+        # one Query and one directory page per ADI; entries come expanded
+        self.assertEqual(crawler.stats()["queries"], 21 * 2 + 1)
+
+        crawler = self.accumulate.crawler(max_depth=1, max_per_level=10)
+        results = list(crawler.crawl(adis))
+        self.assertEqual([res.depth for res in results].count(1), 10)
+        self.assertGreater(crawler.stats()["skipped"], 0)
+        # the same crawler starts over
+        self.assertEqual(len(list(crawler.crawl([self.ADI]))), 4)
+        self.assertEqual(crawler.stats()["skipped"], 0)
+
+    def test_metrics_sampler(self):
+        series = Series(tiers=((1, 60), (60, 10)))
+        for t in range(600):
+            series.add(t % 100, 1200 + t)
+        end = 1200 + 599
+        self.assertEqual(series.count(30, end), 30)
+        self.assertEqual(series.min(30, end), 70)
+        self.assertEqual(series.max(30, end), 99)
+        self.assertEqual(series.percentile(50, 30, end), 84.5)
+        # older than the 1s tier: read from the minute rollups
+        self.assertEqual(series.count(300, end), 300)
+        self.assertEqual(series.min(300, end), 0)
+        self.assertAlmostEqual(series.mean(600, end), 49.5)
+        self.assertIsNone(series.min(30, end + 3600))
+
+        self.node.latency = 0.001
+        with self.accumulate.metrics_sampler(
+            [("tps", "1h"), ("tps", "1m")], interval=0.01
+        ) as sampler:
+            time.sleep(0.2)
+        self.assertGreater(sampler.stats()["polls"], 5)
+        # both pairs every round
+        self.assertEqual(self.node.calls, 2 * sampler.stats()["polls"])
+        summary = sampler.series("tps", "1m").summary(60)
+        self.assertEqual(summary["count"], sampler.stats()["polls"])
+        self.assertGreaterEqual(summary["max"], summary["p50"])
+
+    def test_import_time(self):
+        # `python -X importtime` lists every module imported, with its cost
+        root = os.path.dirname(os.path.dirname(sys.modules["accumulate"].__file__))
+        heavy = ("requests", "asyncio", "concurrent.futures", "numpy", "orjson")
+
+        def imported(code):
+            proc = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", code],
+                cwd=root,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            lines = [line.split("|") for line in proc.stderr.splitlines()]
+            return {
+                line[2].strip(): int(line[1])
+                for line in lines
+                if len(line) == 3 and line[1].strip().isdigit()
+            }
+
+        modules = imported("import accumulate")
+        self.assertEqual([name for name in heavy if name in modules], [])
+        # cumulative microseconds; 150 ms when everything was imported eagerly
+        self.assertLess(modules["accumulate"], 50000)
+        modules = imported(
+            "from accumulate import Accumulate, transport;"
+            " Accumulate('local', transport=transport.Transport())"
+        )
+        self.assertNotIn("requests", modules)
+        self.assertNotIn("asyncio", modules)
+
+    def test_async(self):
+        async def query():
+            accumulate = AsyncAccumulate(
+                "local", transport=AsyncLocalTransport(self.node)
+            )
+            account, tx = await asyncio.gather(
+                accumulate.Query(self.URL_acc), accumulate.QueryTx(self.txId)
+            )
+            txs = [tx async for tx in accumulate.iter_tx_history(self.URL_acc, 10)]
+            many = await accumulate.query_many([self.URL_acc, "acc://missing"])
+            completed = [
+                index
+                async for index, res in accumulate.query_tx_many(
+                    self.node.histories[self.URL_acc], max_workers=4, as_completed=True
+                )
+            ]
+            return account, tx, txs, many, completed
+
+        account, tx, txs, many, completed = asyncio.run(query())
+        self.assertEqual(account.liteTokenAccount.url, self.URL_acc)
+        self.assertEqual(tx.txid, self.txId)
+        self.assertEqual(len(txs), 25)
+        self.assertEqual(many[0].liteTokenAccount.url, self.URL_acc)
+        self.assertIsInstance(many[1], ServerError)
+        self.assertEqual(sorted(completed), list(range(25)))
+        accumulate = AsyncAccumulate("local", transport=AsyncLocalTransport(self.node))
+        with self.assertRaises(TypeError):
+            accumulate.export_tx_history(self.URL_acc, format="columns")
+        with self.assertRaises(TypeError):
+            accumulate.tx_tracker()
+
+        async def query_raw():
+            accumulate = AsyncAccumulate(
+                "local", transport=AsyncLocalTransport(self.node), raw=True
+            )
+            return [tx async for tx in accumulate.iter_tx_history(self.URL_acc, 10)]
+
+        txs = asyncio.run(query_raw())
+        self.assertEqual([tx["txid"] for tx in txs], self.node.histories[self.URL_acc])
+
+    def test_server(self):
+        with LocalNodeServer(self.node) as server:
+            with Accumulate(server.url) as accumulate:
+                res = accumulate.Query(self.URL_acc)
+                self.assertEqual(res.liteTokenAccount.url, self.URL_acc)
+                res = accumulate.Faucet(self.URL_acc)
+                self.assertIsNotNone(res.txid)
+
+    def test_endpoint_pool(self):
+        slow_node = LocalNode(latency=0.02)
+        with LocalNodeServer(self.node) as fast, LocalNodeServer(slow_node) as slow:
+            pool = EndpointPool([slow.url, fast.url], probe_interval=0.05)
+            with Accumulate(pool) as accumulate:
+                for _ in range(20):
+                    accumulate.Version()
+                slow_stats, fast_stats = pool.stats()
+                self.assertGreater(fast_stats["calls"], slow_stats["calls"])
+                res = accumulate.Faucet(self.URL_acc)
+                self.assertIsNotNone(res.txid)
+
+                slow_node.drop_rate = 1.0
+                pool.endpoints[1].ewma = 1.0  # route reads to the slow node
+                for _ in range(5):
+                    try:
+                        accumulate.Version()
+                    except OSError:  # requests' ConnectionError
+                        pass
+                self.assertFalse(pool.endpoints[0].healthy)
+                self.assertTrue(accumulate.Version().version.version)
+
+                slow_node.drop_rate = 0.0
+                for _ in range(40):
+                    if pool.endpoints[0].healthy:
+                        break
+                    time.sleep(0.05)
+                self.assertTrue(pool.endpoints[0].healthy)